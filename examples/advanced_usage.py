@@ -95,19 +95,20 @@ async def streaming_example():
     ]
     
     print("模拟流式处理中...")
-    for i, sentence in enumerate(sentences):
-        # 生成语音
-        audio_data = await client.text_to_speech(sentence)
-        
-        # 在真实应用中，这里可以直接播放音频或发送到客户端
-        # 这里我们只是保存到文件作为示例
-        with open(f"stream_part_{i+1}.mp3", "wb") as f:
-            f.write(audio_data)
-        
-        print(f"已处理第 {i+1} 段文本: {sentence[:20]}...")
-        
-        # 模拟延迟
-        await asyncio.sleep(0.5)
+    # 播放会话在播放当前句时提前合成后面两句，句与句之间不用等待合成
+    async with client.playback_session(sentences, lookahead=2) as session:
+        for i in range(len(sentences)):
+            audio_data = await session.get(i)
+            
+            # 在真实应用中，这里可以直接播放音频或发送到客户端
+            # 这里我们只是保存到文件作为示例
+            with open(f"stream_part_{i+1}.mp3", "wb") as f:
+                f.write(audio_data)
+            
+            print(f"已处理第 {i+1} 段文本: {sentences[i][:20]}...")
+            
+            # 模拟播放时长
+            await asyncio.sleep(0.5)
     
     print("流式处理完成")
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+自动分段基准测试 - 在本地替身服务上比较 chunk_size/concurrency 为 "auto" 与固定参数的耗时
+
+替身服务模拟：固定首字节延迟 + 按字符线性增长的合成耗时 + 并发越高越慢，
+不需要访问外网。先用几组不同参数预热，让调优器积累观测，再逐个长度比较。
+
+    python examples/benchmark_autotune.py --lengths 1500 6000 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加父目录到路径，使示例代码可以导入SDK
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_edge_sdk import TTSClient, MetricsRegistry
+from tts_edge_sdk.pool import UpstreamPool
+from tts_edge_sdk.testing import FakeEdgeServer
+
+FIXED_SETTINGS = [(500, 3), (1000, 3), (2000, 5)]
+
+
+def make_text(length: int) -> str:
+    sentences = []
+    total = 0
+    i = 0
+    while total < length:
+        sentence = f"这是第{i}个测试句子，用来评估分段策略。"
+        sentences.append(sentence)
+        total += len(sentence)
+        i += 1
+    return "".join(sentences)[:length]
+
+
+async def timed(client: TTSClient, text: str, chunk_size, concurrency) -> float:
+    start = time.perf_counter()
+    await client.text_to_speech(text, enable_chunking=True, chunk_size=chunk_size, concurrency=concurrency)
+    return time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    async with FakeEdgeServer(
+        first_byte_delay=args.first_byte_delay,
+        seconds_per_char=args.seconds_per_char,
+        concurrency_penalty=args.concurrency_penalty,
+        frames_per_char=1
+    ) as server:
+        pool = UpstreamPool(max_size=args.pool_size, url=server.url, metrics_registry=MetricsRegistry())
+        client = TTSClient(connection_pool=pool, metrics_registry=MetricsRegistry())
+
+        print("预热中，积累延迟观测...")
+        for chunk_size, concurrency in [(500, 8), (2000, 2), (1000, 1), (700, 4), (1500, 6)]:
+            await timed(client, make_text(6000), chunk_size, concurrency)
+        a, b, d = client.autotuner.stats()["latency_coefficients"]
+        print(f"拟合的延迟模型: {a:.3f}秒 + {b * 1000:.3f}秒/千字符 + {d:.3f}秒/并发\n")
+
+        header = f"{'文本长度':>8} | " + " | ".join(f"{c}/{p:<2}".rjust(8) for c, p in FIXED_SETTINGS) + " |     auto | auto方案"
+        print(header)
+        print("-" * len(header.encode("gbk", "ignore")))
+        for length in args.lengths:
+            text = make_text(length)
+            results = [await timed(client, text, c, p) for c, p in FIXED_SETTINGS]
+            plan = client.autotuner.plan(len(text))
+            auto = await timed(client, text, "auto", "auto")
+            row = " | ".join(f"{r:7.2f}s" for r in results)
+            print(f"{length:>8} | {row} | {auto:7.2f}s | {plan.segments}段 x {plan.chunk_size}字, 并发{plan.concurrency}")
+
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较自动分段与固定分段参数的耗时")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1500, 6000, 20000], help="测试的文本长度")
+    parser.add_argument("--pool-size", type=int, default=8, help="连接池大小，也是并发上限")
+    parser.add_argument("--first-byte-delay", type=float, default=0.3, help="替身服务每段的首字节延迟")
+    parser.add_argument("--seconds-per-char", type=float, default=0.001, help="替身服务每字符的合成耗时")
+    parser.add_argument("--concurrency-penalty", type=float, default=0.1, help="每多一个并发请求的变慢比例")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
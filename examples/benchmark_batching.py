@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+微批处理基准测试 - 在本地替身服务上比较短文本逐个合成与合并合成的耗时和上游调用次数
+
+同时发起一批短请求，分别用普通客户端和启用 MicroBatcher 的客户端处理，
+并检查合并合成切回的每段音频帧数与单独合成的帧数是否一致（替身服务按字符生成帧，
+合并时补的句号和空格对应的帧会分给相邻请求，因此只比较词对应的部分）。
+
+    python examples/benchmark_batching.py --requests 200 --window 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加父目录到路径，使示例代码可以导入SDK
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_edge_sdk import TTSClient, MetricsRegistry
+from tts_edge_sdk.batching import MicroBatcher
+from tts_edge_sdk.mp3 import iter_frames
+from tts_edge_sdk.pool import UpstreamPool
+from tts_edge_sdk.testing import FakeEdgeServer
+
+
+def make_texts(count: int):
+    samples = ["你好", "好的，马上处理", "订单已发货", "请稍等", "今天有雨，记得带伞", "收到"]
+    return [f"{samples[i % len(samples)]}{i}" for i in range(count)]
+
+
+async def timed(client: TTSClient, texts, server: FakeEdgeServer):
+    turns = server.turns
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*(client.text_to_speech(text) for text in texts))
+    return time.perf_counter() - start, server.turns - turns, outputs
+
+
+async def run(args: argparse.Namespace) -> None:
+    async with FakeEdgeServer(
+        first_byte_delay=args.first_byte_delay,
+        seconds_per_char=args.seconds_per_char
+    ) as server:
+        pool = UpstreamPool(max_size=args.pool_size, url=server.url, metrics_registry=MetricsRegistry())
+        texts = make_texts(args.requests)
+
+        plain = TTSClient(connection_pool=pool, metrics_registry=MetricsRegistry())
+        registry = MetricsRegistry()
+        batcher = MicroBatcher(window=args.window, metrics_registry=registry)
+        batched = TTSClient(connection_pool=pool, metrics_registry=registry, micro_batcher=batcher)
+
+        plain_time, plain_turns, plain_outputs = await timed(plain, texts, server)
+        batch_time, batch_turns, batch_outputs = await timed(batched, texts, server)
+
+        frames_per_char = server.frames_per_char
+        mismatched = 0
+        for text, single, merged in zip(texts, plain_outputs, batch_outputs):
+            words = len(list(iter_frames(single))) // frames_per_char
+            # 合并后每段多出补齐的句号以及前后的空格
+            if len(list(iter_frames(merged))) // frames_per_char < words:
+                mismatched += 1
+
+        size = registry.get("tts_batch_size")
+        wait = registry.get("tts_batch_wait_seconds")
+        print(f"{args.requests} 个短请求，连接池大小 {args.pool_size}")
+        print(f"逐个合成: {plain_time:6.2f}秒, 上游调用 {plain_turns} 次")
+        print(f"合并合成: {batch_time:6.2f}秒, 上游调用 {batch_turns} 次, "
+              f"平均每批 {size.sum() / max(1, size.count()):.1f} 个请求, "
+              f"平均等待 {wait.sum() / max(1, wait.count()) * 1000:.1f}毫秒")
+        print(f"音频短于单独合成的请求: {mismatched}")
+
+        await batcher.close()
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较短文本逐个合成与微批合并合成")
+    parser.add_argument("--requests", type=int, default=200, help="同时发起的短请求数")
+    parser.add_argument("--window", type=float, default=0.02, help="合并等待窗口（秒）")
+    parser.add_argument("--pool-size", type=int, default=4, help="连接池大小")
+    parser.add_argument("--first-byte-delay", type=float, default=0.2, help="替身服务每轮请求的首字节延迟")
+    parser.add_argument("--seconds-per-char", type=float, default=0.001, help="替身服务每字符的合成耗时")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,41 @@
 from fastapi import FastAPI, HTTPException, Request, Depends, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.requests import ClientDisconnect
+from multipart.multipart import MultipartParser, parse_options_header
 import asyncio
+import codecs
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Union, AsyncIterator
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import base64
+import json
+import math
 import os
 from dotenv import load_dotenv
 import logging
 import time
 from tts_edge_sdk import TTSClient  # 导入新的SDK包
+from tts_edge_sdk.cache import DiskCache
+from tts_edge_sdk.pool import UpstreamPool
+from tts_edge_sdk.segmentation import SegmentRamp, segment_stream, split_sentences
+from tts_edge_sdk.batching import MicroBatcher
+from tts_edge_sdk.scheduler import FairScheduler, tenant_context, priority_context, priority_for_length, PRIORITIES
+from tts_edge_sdk.quota import TenantQuotas, QuotaExceeded
+from tts_edge_sdk.deadline import DeadlineExceeded
+from tts_edge_sdk.breaker import CircuitBreaker, CircuitOpenError
+from tts_edge_sdk.health import HealthMonitor, UpstreamProbe, EventLoopMonitor
+from tts_edge_sdk.mp3 import audio_info, audio_info_file
+from tts_edge_sdk.silence import SilenceTrimmer
+from tts_edge_sdk.script import parse as parse_script
+from tts_edge_sdk.session import SessionManager, SessionNotFound, SentenceCancelled
+from tts_edge_sdk.metrics import default_registry as metrics_registry, CONTENT_TYPE_LATEST
+from tts_edge_sdk.tracing import start_trace, span, OpenTelemetrySpanExporter
+from tts_edge_sdk.logging_utils import setup_logging
 
 # 加载环境变量
 load_dotenv()
@@ -23,21 +44,179 @@ load_dotenv()
 log_level_str = os.getenv("LOG_LEVEL", "INFO")
 log_level = getattr(logging, log_level_str.upper(), logging.INFO)
 
-logging.basicConfig(
+# 日志通过队列交给后台线程写入控制台和app.log，避免阻塞事件循环
+# LOG_FORMAT=json 输出JSON日志；TTS_CHUNK_LOG_SAMPLE/TTS_CHUNK_LOG_RATE 控制逐段日志的采样比例和每秒上限
+chunk_log_rate = os.getenv("TTS_CHUNK_LOG_RATE")
+setup_logging(
     level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
+    log_file=os.getenv("LOG_FILE", "app.log"),
+    json_format=os.getenv("LOG_FORMAT", "text").lower() == "json",
+    chunk_log_sample=int(os.getenv("TTS_CHUNK_LOG_SAMPLE", "1")),
+    chunk_log_rate=float(chunk_log_rate) if chunk_log_rate else None
 )
 logger = logging.getLogger("tts-api")
-logger.info(f"日志级别设置为: {log_level_str}")
+logger.info("日志级别设置为: %s", log_level_str)
 
 app = FastAPI(title="实时文字转语音引擎")
 
+# 追踪导出：设置 TTS_OTEL_EXPORT=true 时把每个请求的span树交给OpenTelemetry
+span_exporter = None
+if os.getenv("TTS_OTEL_EXPORT", "false").lower() == "true":
+    span_exporter = OpenTelemetrySpanExporter()
+
+# 磁盘音频缓存：同一主机上的所有worker指向同一个TTS_CACHE_DIR即可共享
+audio_cache = None
+if os.getenv("TTS_CACHE_DIR"):
+    audio_cache = DiskCache(
+        os.getenv("TTS_CACHE_DIR"),
+        max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    )
+
+# 上游连接池：TTS_UPSTREAM_POOL_SIZE大于0时复用保温的WebSocket连接，省去每段的TLS握手
+upstream_pool = None
+if int(os.getenv("TTS_UPSTREAM_POOL_SIZE", "0")) > 0:
+    upstream_pool = UpstreamPool(
+        max_size=int(os.getenv("TTS_UPSTREAM_POOL_SIZE")),
+        idle_timeout=float(os.getenv("TTS_UPSTREAM_IDLE_TIMEOUT", "30")),
+        metrics_registry=metrics_registry
+    )
+
+# 短文本微批处理：TTS_MICRO_BATCH_WINDOW_MS大于0时，窗口内参数相同的短文本合并成一次上游合成
+micro_batcher = None
+if float(os.getenv("TTS_MICRO_BATCH_WINDOW_MS", "0")) > 0:
+    micro_batcher = MicroBatcher(
+        window=float(os.getenv("TTS_MICRO_BATCH_WINDOW_MS")) / 1000,
+        max_text_chars=int(os.getenv("TTS_MICRO_BATCH_MAX_CHARS", "60")),
+        metrics_registry=metrics_registry
+    )
+
+# 租户：TTS_TENANTS_FILE 指向JSON文件，按租户配置API密钥、调度权重和配额，例如
+# {"acme": {"api_keys": ["..."], "weight": 2, "requests_per_minute": 120, "chars_per_minute": 200000}}
+tenants_config = {}
+if os.getenv("TTS_TENANTS_FILE"):
+    with open(os.getenv("TTS_TENANTS_FILE"), encoding="utf-8") as f:
+        tenants_config = json.load(f)
+api_key_tenants = {
+    key: name for name, conf in tenants_config.items() for key in conf.get("api_keys", [])
+}
+# 未登录也未携带API密钥的请求是否作为anonymous租户放行
+ALLOW_ANONYMOUS = os.getenv("TTS_ALLOW_ANONYMOUS", "false").lower() == "true"
+
+# 按租户加权公平分配上游槽位，槽位数默认等于连接池大小
+scheduler = FairScheduler(
+    slots=int(os.getenv("TTS_UPSTREAM_SLOTS", str(upstream_pool.max_size if upstream_pool else 8))),
+    weights={name: conf["weight"] for name, conf in tenants_config.items() if "weight" in conf},
+    aging=float(os.getenv("TTS_PRIORITY_AGING", "2")),
+    metrics_registry=metrics_registry
+)
+# 未指定优先级时，不超过TTS_INTERACTIVE_CHARS字符的请求为interactive，不少于TTS_BULK_CHARS字符的为bulk
+INTERACTIVE_CHARS = int(os.getenv("TTS_INTERACTIVE_CHARS", "200"))
+BULK_CHARS = int(os.getenv("TTS_BULK_CHARS", "5000"))
+
+# 请求未给出时间预算时使用的默认预算（秒），不设置则不限
+default_timeout = os.getenv("TTS_DEFAULT_TIMEOUT")
+DEFAULT_TIMEOUT = float(default_timeout) if default_timeout else None
+
+# /tts/upload 请求体大小上限
+UPLOAD_MAX_BYTES = int(float(os.getenv("TTS_UPLOAD_MAX_MB", "20")) * 1024 * 1024)
+
+# 按租户的请求数和字符数令牌桶配额，未单独配置的租户使用默认值（不设置则不限）
+default_rpm = os.getenv("TTS_DEFAULT_REQUESTS_PER_MINUTE")
+default_cpm = os.getenv("TTS_DEFAULT_CHARS_PER_MINUTE")
+quotas = TenantQuotas(
+    requests_per_minute=float(default_rpm) if default_rpm else None,
+    chars_per_minute=float(default_cpm) if default_cpm else None,
+    metrics_registry=metrics_registry
+)
+for name, conf in tenants_config.items():
+    if "requests_per_minute" in conf or "chars_per_minute" in conf:
+        quotas.configure(name, conf.get("requests_per_minute"), conf.get("chars_per_minute"))
+
+# 上游熔断：最近TTS_BREAKER_WINDOW秒内失败率或慢调用比例过高时，TTS_BREAKER_OPEN_SECONDS秒内直接返回503，
+# 缓存命中的请求照常返回；TTS_BREAKER_ENABLED=false 关闭
+upstream_breaker = None
+if os.getenv("TTS_BREAKER_ENABLED", "true").lower() == "true":
+    upstream_breaker = CircuitBreaker(
+        window=float(os.getenv("TTS_BREAKER_WINDOW", "30")),
+        min_calls=int(os.getenv("TTS_BREAKER_MIN_CALLS", "10")),
+        failure_rate=float(os.getenv("TTS_BREAKER_FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv("TTS_BREAKER_SLOW_SECONDS", "10")),
+        slow_call_rate=float(os.getenv("TTS_BREAKER_SLOW_RATE", "0.8")),
+        open_seconds=float(os.getenv("TTS_BREAKER_OPEN_SECONDS", "15")),
+        metrics_registry=metrics_registry
+    )
+
+# 段边界静音裁剪：设置TTS_SILENCE_GAP_MS后，分段合成和/tts/stream去掉相邻段之间多余的静音帧，
+# 段间只保留这么多毫秒的停顿
+silence_trimmer = None
+if os.getenv("TTS_SILENCE_GAP_MS"):
+    silence_trimmer = SilenceTrimmer(
+        gap=float(os.getenv("TTS_SILENCE_GAP_MS")) / 1000,
+        max_bits=int(os.getenv("TTS_SILENCE_MAX_BITS", "8")),
+        metrics_registry=metrics_registry
+    )
+
 # 创建TTS客户端实例
-tts_client = TTSClient()
+tts_client = TTSClient(
+    max_retries=int(os.getenv("TTS_MAX_RETRIES", "0")),
+    metrics_registry=metrics_registry,
+    cache=audio_cache,
+    connection_pool=upstream_pool,
+    micro_batcher=micro_batcher,
+    scheduler=scheduler,
+    breaker=upstream_breaker,
+    silence_trimmer=silence_trimmer,
+    # /tts/stream 的首段字符数和逐段增长倍数
+    segment_ramp=SegmentRamp(
+        first_chunk_size=int(os.getenv("TTS_STREAM_FIRST_CHUNK", "40")),
+        growth=float(os.getenv("TTS_STREAM_GROWTH", "2"))
+    )
+)
+
+
+def optional_env(name: str, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+# 就绪检查：排队深度、上游并发、事件循环延迟、后台上游探测和熔断器状态，任一超过阈值时/readyz返回503
+probe_interval = float(os.getenv("TTS_PROBE_INTERVAL", "30"))
+health_monitor = HealthMonitor(
+    tts_client,
+    probe=UpstreamProbe(
+        tts_client,
+        interval=probe_interval,
+        timeout=float(os.getenv("TTS_PROBE_TIMEOUT", "10")),
+        metrics_registry=metrics_registry
+    ) if probe_interval > 0 else None,
+    loop_monitor=EventLoopMonitor(metrics_registry=metrics_registry),
+    max_queue_depth=int(os.getenv("TTS_READY_MAX_QUEUE", "100")),
+    max_inflight=optional_env("TTS_READY_MAX_INFLIGHT", int),
+    max_loop_lag=float(os.getenv("TTS_READY_MAX_LOOP_LAG", "0.5")),
+    max_probe_latency=optional_env("TTS_READY_MAX_PROBE_SECONDS")
+)
+
+# 播放会话：登记全文后按播放位置提前合成后面TTS_SESSION_LOOKAHEAD句，TTS_SESSION_TTL秒没有访问的会话被关闭
+sessions = SessionManager(
+    tts_client,
+    ttl=float(os.getenv("TTS_SESSION_TTL", "300")),
+    max_sessions=int(os.getenv("TTS_SESSION_MAX", "1000")),
+    default_lookahead=int(os.getenv("TTS_SESSION_LOOKAHEAD", "2")),
+    metrics_registry=metrics_registry
+)
+
+@app.on_event("startup")
+async def start_health_monitor():
+    health_monitor.start()
+    sessions.start()
+
+@app.on_event("shutdown")
+async def close_upstream_pool():
+    await health_monitor.stop()
+    await sessions.close_all()
+    if micro_batcher is not None:
+        await micro_batcher.close()
+    if upstream_pool is not None:
+        await upstream_pool.close()
 
 # 配置CORS
 app.add_middleware(
@@ -46,6 +225,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 浏览器端需要读取耗时和音频元数据响应头
+    expose_headers=["Server-Timing", "X-Audio-Duration", "X-Audio-Frames", "X-Audio-Bitrate", "X-Sentence-Count"],
 )
 
 # 配置模板和静态文件
@@ -76,6 +257,40 @@ class TTSRequest(BaseModel):
     enable_chunking: Optional[bool] = False  # 是否启用分段处理
     chunk_size: Optional[int] = 1000  # 默认每段文本字符数
     concurrency: Optional[int] = 3  # 并发处理段数
+    debug: Optional[bool] = False  # 是否在响应中返回各阶段耗时明细
+    response_format: Optional[str] = "json"  # json: base64音频; audio: 直接返回audio/mpeg
+    priority: Optional[str] = None  # interactive / default / bulk，不指定时按文本长度推断
+    timeout: Optional[float] = None  # 时间预算（秒），也可以用X-Request-Timeout头传入
+
+class ScriptLineRequest(BaseModel):
+    text: str
+    speaker: Optional[str] = None  # speakers中声明的角色名或语音名称
+    voice: Optional[str] = None  # 覆盖角色的语音
+    rate: Optional[str] = None
+    volume: Optional[str] = None
+    pitch: Optional[str] = None
+    pause: Optional[float] = None  # 这一行之后的停顿秒数
+
+class ScriptRequest(BaseModel):
+    lines: Optional[List[ScriptLineRequest]] = None  # 台词列表
+    script: Optional[str] = None  # 或标记格式的脚本，二者取其一
+    speakers: Optional[Dict[str, Union[str, Dict[str, str]]]] = None  # 角色名 -> 语音名称或语音参数
+    pause: Optional[float] = 0.3  # 台词之间默认的停顿秒数
+    chunk_size: Optional[int] = 1000  # 超过该长度的台词按句切分
+    concurrency: Optional[int] = 3  # 同时合成的台词段数
+    debug: Optional[bool] = False
+    response_format: Optional[str] = "json"
+    priority: Optional[str] = None
+    timeout: Optional[float] = None
+
+class SessionRequest(BaseModel):
+    text: Optional[str] = None  # 全文，按句末标点切分
+    sentences: Optional[List[str]] = None  # 或直接给出句子列表，二者取其一
+    voice: str = "zh-CN-XiaoxiaoNeural"
+    rate: Optional[str] = "+0%"
+    volume: Optional[str] = "+0%"
+    pitch: Optional[str] = "+0Hz"
+    lookahead: Optional[int] = None  # 提前合成的句数，不指定时使用TTS_SESSION_LOOKAHEAD
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -106,6 +321,111 @@ async def get_current_user(request: Request):
     user = get_user(username)
     return user
 
+async def get_tenant(request: Request) -> str:
+    """识别/tts调用方的租户：API密钥（X-API-Key或Bearer），其次是登录令牌（Bearer或Cookie）"""
+    api_key = request.headers.get("x-api-key")
+    authorization = request.headers.get("authorization", "")
+    bearer = authorization[7:].strip() if authorization.lower().startswith("bearer ") else None
+    for key in (api_key, bearer):
+        if key and key in api_key_tenants:
+            return api_key_tenants[key]
+    if api_key:
+        raise HTTPException(status_code=401, detail="API密钥无效")
+    token = bearer or request.cookies.get("access_token")
+    if token:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="令牌无效或已过期", headers={"WWW-Authenticate": "Bearer"})
+        # 外部签发的令牌可以用tenant声明指定租户，否则以用户名作为租户
+        tenant = payload.get("tenant") or payload.get("sub")
+        if tenant:
+            return tenant
+    if ALLOW_ANONYMOUS:
+        return "anonymous"
+    raise HTTPException(status_code=401, detail="需要API密钥或登录令牌", headers={"WWW-Authenticate": "Bearer"})
+
+def resolve_priority(request, chars: Optional[int] = None) -> str:
+    if request.priority is None:
+        return priority_for_length(len(request.text) if chars is None else chars, INTERACTIVE_CHARS, BULK_CHARS)
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority 可选值为 {', '.join(PRIORITIES)}")
+    return request.priority
+
+client_disconnects = metrics_registry.counter(
+    "tts_client_disconnects_total", "客户端在响应完成前断开、合成被取消的请求数", ["endpoint"]
+)
+
+class ClientDisconnected(Exception):
+    """客户端在合成完成前断开了连接"""
+
+async def run_until_disconnect(http_request: Request, awaitable):
+    """
+    执行合成并同时监听客户端连接，客户端断开时取消合成任务
+    
+    取消会传递到SDK的各个文本段任务，排队的段不再发出，正在进行的上游WebSocket立即关闭。
+    任务在调用方的上下文中创建，租户、优先级和追踪信息随之传递。
+    """
+    task = asyncio.ensure_future(awaitable)
+
+    async def wait_disconnect():
+        while True:
+            message = await http_request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            if watcher.done() and not watcher.cancelled():
+                client_disconnects.inc(endpoint=http_request.url.path)
+                raise ClientDisconnected()
+    return task.result()
+
+def resolve_timeout(request, http_request: Request) -> Optional[float]:
+    """请求体timeout与X-Request-Timeout头中较小的一个，都没有时使用默认预算"""
+    budgets = []
+    if request.timeout is not None:
+        budgets.append(request.timeout)
+    header = http_request.headers.get("x-request-timeout")
+    if header:
+        try:
+            budgets.append(float(header))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout 必须是秒数")
+    if any(budget <= 0 for budget in budgets):
+        raise HTTPException(status_code=400, detail="时间预算必须大于0")
+    return min(budgets) if budgets else DEFAULT_TIMEOUT
+
+def audio_headers(info) -> dict:
+    """音频时长、帧数和码率响应头，客户端不需要解码即可设置缓冲区和进度条"""
+    if info is None:
+        return {}
+    return {
+        "X-Audio-Duration": f"{info.duration:.3f}",
+        "X-Audio-Frames": str(info.frames),
+        "X-Audio-Bitrate": str(info.bitrate),
+    }
+
+def check_quota(tenant: str, chars: int, requests: int = 1) -> None:
+    """扣减租户配额，超出时返回429"""
+    try:
+        quotas.check(tenant, chars, requests)
+    except QuotaExceeded as e:
+        logger.warning("租户 %s 超出%s配额", tenant, e.kind)
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after is not None else None
+        raise HTTPException(status_code=429, detail=str(e), headers=headers)
+
+def upstream_unavailable(e: CircuitOpenError) -> HTTPException:
+    """上游熔断时返回503，Retry-After给出熔断器进入半开状态前的秒数"""
+    logger.warning("上游熔断，直接拒绝请求: %s", e)
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     user = await get_current_user(request)
@@ -122,12 +442,12 @@ async def login_page(request: Request):
 async def login(response: Response, username: str = Form(...), password: str = Form(...)):
     user = get_user(username)
     if not user or not verify_password(password, user["hashed_password"]):
-        logger.warning(f"登录失败: 用户 {username} - 密码错误或用户不存在")
+        logger.warning("登录失败: 用户 %s - 密码错误或用户不存在", username)
         return templates.TemplateResponse(
             "login.html",
             {"request": Request, "error": "用户名或密码错误"}
         )
-    logger.info(f"用户 {username} 登录成功")
+    logger.info("用户 %s 登录成功", username)
     access_token = create_access_token(data={"sub": user["username"]})
     response = RedirectResponse(url="/", status_code=303)
     response.set_cookie(key="access_token", value=access_token)
@@ -140,108 +460,530 @@ async def logout(response: Response):
     response.delete_cookie(key="access_token")
     return response
 
-async def process_text_chunk(text: str, voice: str, rate: str, volume: str, pitch: str) -> bytes:
-    """处理单个文本段"""
-    return await tts_client.text_to_speech(
-        text=text,
-        voice=voice,
-        rate=rate,
-        volume=volume,
-        pitch=pitch
+@app.post("/tts")
+async def text_to_speech(request: TTSRequest, response: Response, http_request: Request, tenant: str = Depends(get_tenant)):
+    priority = resolve_priority(request)
+    timeout = resolve_timeout(request, http_request)
+    check_quota(tenant, len(request.text))
+    try:
+        logger.info("正在处理TTS请求: 文本长度 %d 字符, 语音 %s", len(request.text), request.voice)
+        
+        start_time = time.time()
+        # response_format=audio 或 Accept: audio/mpeg 时直接返回音频文件
+        want_audio = request.response_format == "audio" or "audio/mpeg" in http_request.headers.get("accept", "")
+        synth_kwargs = dict(
+            text=request.text,
+            voice=request.voice,
+            rate=request.rate,
+            volume=request.volume,
+            pitch=request.pitch,
+            enable_chunking=len(request.text) > 1000 and request.enable_chunking,
+            chunk_size=request.chunk_size,
+            concurrency=request.concurrency,
+            timeout=timeout
+        )
+        
+        with tenant_context(tenant), priority_context(priority), \
+                start_trace("POST /tts", span_exporter, chars=len(request.text), tenant=tenant, priority=priority) as trace:
+            if want_audio and tts_client.cache is not None:
+                # 从共享磁盘缓存直接发送文件，音频不经过Python内存
+                audio_path = await run_until_disconnect(http_request, tts_client.text_to_speech_path(**synth_kwargs))
+                with span("audio_info"):
+                    info = await asyncio.get_running_loop().run_in_executor(None, audio_info_file, audio_path)
+            else:
+                # 分段与并行处理统一交给SDK，便于在TTSClient内部统一埋点
+                audio_data = await run_until_disconnect(http_request, tts_client.text_to_speech(**synth_kwargs))
+                # 只扫描帧头得到精确时长，不解码
+                with span("audio_info"):
+                    info = audio_info(audio_data)
+                if not want_audio:
+                    with span("encode"):
+                        result = {"audio": base64.b64encode(audio_data).decode()}
+                    if info is not None:
+                        result.update(duration=round(info.duration, 3), frames=info.frames, bitrate=info.bitrate)
+        
+        headers = {"Server-Timing": trace.server_timing(), **audio_headers(info)}
+        elapsed = time.time() - start_time
+        if want_audio:
+            logger.info("TTS请求处理成功: 文本长度 %d 字符, 返回音频文件, 处理时间: %.2f秒", len(request.text), elapsed)
+            if tts_client.cache is not None:
+                return FileResponse(audio_path, media_type="audio/mpeg", headers=headers)
+            return Response(content=audio_data, media_type="audio/mpeg", headers=headers)
+        
+        response.headers.update(headers)
+        if request.debug:
+            result["timing"] = trace.to_dict()
+        logger.info("TTS请求处理成功: 文本长度 %d 字符, 生成音频大小 %d 字节, 处理时间: %.2f秒", len(request.text), len(audio_data), elapsed)
+        return result
+    except ClientDisconnected:
+        # 客户端已经收不到响应，499仅用于访问日志
+        logger.info("客户端已断开，取消TTS请求: 文本长度 %d 字符", len(request.text))
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        logger.error("TTS请求处理失败: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/tts/stream")
+async def text_to_speech_stream(request: TTSRequest, http_request: Request, tenant: str = Depends(get_tenant)):
+    """边合成边返回audio/mpeg，首段只含一个短句，尽快开始播放"""
+    priority = resolve_priority(request)
+    check_quota(tenant, len(request.text))
+    logger.info("正在处理流式TTS请求: 文本长度 %d 字符, 语音 %s", len(request.text), request.voice)
+    audio_stream = tts_client.stream(
+        text=request.text,
+        voice=request.voice,
+        rate=request.rate,
+        volume=request.volume,
+        pitch=request.pitch,
+        chunk_size=request.chunk_size,
+        concurrency=request.concurrency
     )
+    # 先等到第一段音频再发送响应头，首段失败时仍可以返回500
+    try:
+        with tenant_context(tenant), priority_context(priority):
+            first = await run_until_disconnect(http_request, audio_stream.__anext__())
+    except StopAsyncIteration:
+        first = b""
+    except ClientDisconnected:
+        await audio_stream.aclose()
+        logger.info("客户端已断开，取消流式TTS请求: 文本长度 %d 字符", len(request.text))
+        return Response(status_code=499)
+    except CircuitOpenError as e:
+        await audio_stream.aclose()
+        raise upstream_unavailable(e)
+    except Exception as e:
+        await audio_stream.aclose()
+        logger.error("流式TTS请求处理失败: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        try:
+            yield first
+            # 后续各段在响应发送时才开始合成，同样记在该租户名下
+            with tenant_context(tenant), priority_context(priority):
+                async for audio in audio_stream:
+                    yield audio
+        except asyncio.CancelledError:
+            # 客户端断开时StreamingResponse取消响应，关闭audio_stream会取消未完成的段
+            client_disconnects.inc(endpoint="/tts/stream")
+            logger.info("客户端已断开，停止流式TTS请求")
+            raise
+        except Exception as e:
+            # 响应头已发送，只能记录错误并截断音频
+            logger.error("流式TTS请求中途失败: %s", e, exc_info=True)
+        finally:
+            await audio_stream.aclose()
 
-async def process_long_text(text: str, voice: str, rate: str, volume: str, pitch: str, 
-                            chunk_size: int = 1000, concurrency: int = 3) -> bytes:
-    """分段并行处理长文本"""
-    # 按标点符号分段
-    chunks = []
-    current_chunk = ""
+    return StreamingResponse(body(), media_type="audio/mpeg")
+
+@app.post("/tts/script")
+async def text_to_speech_script(request: ScriptRequest, response: Response, http_request: Request, tenant: str = Depends(get_tenant)):
+    """多角色脚本：各条台词按自己的语音并行合成，按帧拼接成一段音频，台词之间插入停顿"""
+    if (request.lines is None) == (request.script is None):
+        raise HTTPException(status_code=400, detail="lines 和 script 需要且只能给出一个")
+    try:
+        if request.script is not None:
+            lines = parse_script(request.script, request.speakers)
+        else:
+            lines = parse_script([line.model_dump(exclude_none=True) for line in request.lines], request.speakers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not lines:
+        raise HTTPException(status_code=400, detail="脚本中没有可合成的台词")
+    if request.pause is not None and request.pause < 0:
+        raise HTTPException(status_code=400, detail="pause 不能为负数")
+    chars = sum(len(line.text) for line in lines)
+    priority = resolve_priority(request, chars)
+    timeout = resolve_timeout(request, http_request)
+    check_quota(tenant, chars)
+    try:
+        logger.info("正在处理多角色脚本请求: %d 条台词, %d 字符", len(lines), chars)
+        start_time = time.time()
+        want_audio = request.response_format == "audio" or "audio/mpeg" in http_request.headers.get("accept", "")
+        with tenant_context(tenant), priority_context(priority), \
+                start_trace("POST /tts/script", span_exporter, chars=chars, lines=len(lines), tenant=tenant, priority=priority) as trace:
+            audio_data = await run_until_disconnect(http_request, tts_client.synthesize_script(
+                lines,
+                pause=request.pause if request.pause is not None else 0.3,
+                concurrency=request.concurrency,
+                chunk_size=request.chunk_size,
+                timeout=timeout
+            ))
+            with span("audio_info"):
+                info = audio_info(audio_data)
+            if not want_audio:
+                with span("encode"):
+                    result = {"audio": base64.b64encode(audio_data).decode(), "lines": len(lines)}
+                if info is not None:
+                    result.update(duration=round(info.duration, 3), frames=info.frames, bitrate=info.bitrate)
+        
+        headers = {"Server-Timing": trace.server_timing(), **audio_headers(info)}
+        logger.info("多角色脚本请求处理成功: %d 条台词, 音频大小 %d 字节, 处理时间: %.2f秒", len(lines), len(audio_data), time.time() - start_time)
+        if want_audio:
+            return Response(content=audio_data, media_type="audio/mpeg", headers=headers)
+        response.headers.update(headers)
+        if request.debug:
+            result["timing"] = trace.to_dict()
+        return result
+    except ClientDisconnected:
+        logger.info("客户端已断开，取消多角色脚本请求: %d 条台词", len(lines))
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        logger.error("多角色脚本请求处理失败: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+MAX_SESSION_LOOKAHEAD = int(os.getenv("TTS_SESSION_MAX_LOOKAHEAD", "8"))
+
+def get_session(session_id: str, tenant: str):
+    """取该租户的会话，其他租户的会话同样返回404"""
+    try:
+        return sessions.get(session_id, owner=tenant)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="会话不存在或已过期")
+
+@app.post("/tts/sessions")
+async def create_session(request: SessionRequest, tenant: str = Depends(get_tenant)):
+    """登记全文创建播放会话，立即开始合成开头的几句"""
+    if (request.text is None) == (request.sentences is None):
+        raise HTTPException(status_code=400, detail="text 和 sentences 需要且只能给出一个")
+    if request.lookahead is not None and not 0 <= request.lookahead <= MAX_SESSION_LOOKAHEAD:
+        raise HTTPException(status_code=400, detail=f"lookahead 取值范围为 0-{MAX_SESSION_LOOKAHEAD}")
+    sentences = split_sentences(request.text) if request.text is not None else [s for s in request.sentences if s.strip()]
+    if not sentences:
+        raise HTTPException(status_code=400, detail="会话中没有可合成的句子")
+    chars = sum(len(s) for s in sentences)
+    # 配额按全文扣减，预取在后台进行，无法逐句拒绝
+    check_quota(tenant, chars)
+    try:
+        # 预取任务在创建时的上下文中运行，记在该租户名下
+        with tenant_context(tenant):
+            session = await sessions.create(
+                sentences=sentences,
+                owner=tenant,
+                lookahead=request.lookahead,
+                voice=request.voice,
+                rate=request.rate,
+                volume=request.volume,
+                pitch=request.pitch
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("创建播放会话 %s: %d 句, %d 字符, 预取 %d 句", session.id, len(session), chars, session.lookahead)
+    return {"session_id": session.id, "count": len(session), "sentences": session.sentences, "lookahead": session.lookahead}
+
+@app.get("/tts/sessions/{session_id}")
+async def session_status(session_id: str, tenant: str = Depends(get_tenant)):
+    """会话的播放位置以及已合成、合成中的句子"""
+    return get_session(session_id, tenant).stats()
+
+@app.get("/tts/sessions/{session_id}/sentences/{index}")
+async def session_sentence(session_id: str, index: int, http_request: Request, tenant: str = Depends(get_tenant)):
+    """取第index句的音频，并在后台合成后面的句子；客户端断开时该句的合成继续，留给下一次请求"""
+    session = get_session(session_id, tenant)
+    if not 0 <= index < len(session):
+        raise HTTPException(status_code=404, detail=f"句子序号超出范围 [0, {len(session)})")
+    start_time = time.time()
+    try:
+        with tenant_context(tenant), start_trace(
+            "GET /tts/sessions/{id}/sentences/{index}", span_exporter, session=session_id, index=index, tenant=tenant
+        ) as trace:
+            # 句子的合成任务属于会话，不挂在本次请求的追踪上，这里只记录等待时间
+            with span("session_wait"):
+                audio_data = await run_until_disconnect(http_request, session.get(index))
+            with span("audio_info"):
+                info = audio_info(audio_data)
+    except ClientDisconnected:
+        logger.info("客户端已断开，会话 %s 第 %d 句继续在后台合成", session_id, index)
+        return Response(status_code=499)
+    except SentenceCancelled as e:
+        # 请求期间会话被关闭，或另一个请求跳转到了别处
+        raise HTTPException(status_code=404 if session.closed else 409, detail=str(e))
+    except CircuitOpenError as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        if session.closed:
+            raise HTTPException(status_code=404, detail="会话已关闭")
+        logger.error("会话 %s 第 %d 句合成失败: %s", session_id, index, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    logger.info("会话 %s 第 %d 句: 音频大小 %d 字节, 处理时间: %.2f秒", session_id, index, len(audio_data), time.time() - start_time)
+    headers = {"Server-Timing": trace.server_timing(), "X-Sentence-Count": str(len(session)), **audio_headers(info)}
+    return Response(content=audio_data, media_type="audio/mpeg", headers=headers)
+
+@app.post("/tts/sessions/{session_id}/seek")
+async def session_seek(session_id: str, index: int, tenant: str = Depends(get_tenant)):
+    """把播放位置移到第index句：取消预取窗口外的合成，开始合成新位置之后的句子"""
+    session = get_session(session_id, tenant)
+    try:
+        with tenant_context(tenant):
+            session.seek(index)
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.stats()
+
+@app.delete("/tts/sessions/{session_id}")
+async def close_session(session_id: str, tenant: str = Depends(get_tenant)):
+    """结束会话，取消所有还没完成的预取"""
+    get_session(session_id, tenant)
+    await sessions.close(session_id, owner=tenant)
+    return {"session_id": session_id, "closed": True}
+
+upload_bytes = metrics_registry.counter("tts_upload_bytes_total", "/tts/upload 接收的请求体字节数")
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    请求体还没读完就开始发送的流式响应
     
-    # 常见中文和英文标点符号
-    sentence_end_marks = ["。", "！", "？", "；", ".", "!", "?", ";"]
+    StreamingResponse 监听客户端断开时会读走还没读取的请求体消息。请求体读完之前不监听，
+    这期间客户端断开由读取请求体的一方收到（request.stream() 抛出 ClientDisconnect）。
+    """
     
-    for char in text:
-        current_chunk += char
-        
-        # 如果遇到句末标点并且当前段长度超过最小段落大小，则考虑是否分段
-        if char in sentence_end_marks and len(current_chunk) >= min(200, chunk_size//5):
-            # 如果当前段落长度超过了chunk_size或接近chunk_size的80%，则分段
-            if len(current_chunk) >= chunk_size * 0.8:
-                chunks.append(current_chunk)
-                current_chunk = ""
+    def __init__(self, content, body_done: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_done = body_done
     
-    # 添加最后一段
-    if current_chunk:
-        chunks.append(current_chunk)
+    async def listen_for_disconnect(self, receive) -> None:
+        await self.body_done.wait()
+        await super().listen_for_disconnect(receive)
+
+class MultipartTextField:
+    """流式解析multipart/form-data请求体，只取出第一个file或text字段的内容"""
     
-    logger.info(f"长文本被分为 {len(chunks)} 段进行处理，平均段长: {sum(len(c) for c in chunks)/len(chunks):.1f} 字符")
+    FIELD_NAMES = (b"file", b"text")
     
-    # 创建一个信号量来限制并发任务数
-    semaphore = asyncio.Semaphore(concurrency)
+    def __init__(self, boundary: bytes):
+        self.found = False
+        self._active = False
+        self._pieces: List[bytes] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
     
-    async def process_with_semaphore(chunk: str) -> bytes:
-        async with semaphore:
-            return await process_text_chunk(chunk, voice, rate, volume, pitch)
+    def _on_part_begin(self):
+        self._disposition = b""
     
-    # 并行处理所有文本段
-    start_time = time.time()
-    tasks = [process_with_semaphore(chunk) for chunk in chunks]
-    results = await asyncio.gather(*tasks)
-    elapsed = time.time() - start_time
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+    
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = self._header_value = b""
+    
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._active = not self.found and options.get(b"name") in self.FIELD_NAMES
+        self.found = self.found or self._active
     
-    logger.info(f"并行处理完成: {len(chunks)} 段文本, 总时间: {elapsed:.2f}秒, 平均每段: {elapsed/len(chunks):.2f}秒")
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._active:
+            self._pieces.append(data[start:end])
     
-    # 合并所有音频段落
-    combined_audio = b''.join(results)
-    return combined_audio
+    def _on_part_end(self):
+        self._active = False
+    
+    async def iter(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            self._parser.write(chunk)
+            if self._pieces:
+                pieces, self._pieces = self._pieces, []
+                yield b"".join(pieces)
+        self._parser.finalize()
+        if not self.found:
+            raise HTTPException(status_code=400, detail="multipart请求体中缺少 file 或 text 字段")
 
-@app.post("/tts")
-async def text_to_speech(request: TTSRequest):
+async def read_upload(http_request: Request, body_done: asyncio.Event) -> AsyncIterator[bytes]:
+    """按块读取请求体，超过大小上限时返回413，读完或出错后设置body_done"""
+    received = 0
     try:
-        logger.info(f"正在处理TTS请求: 文本长度 {len(request.text)} 字符, 语音 {request.voice}")
-        
-        start_time = time.time()
-        
-        # 根据文本长度和用户选项决定是否使用分段处理
-        if len(request.text) > 1000 and request.enable_chunking:
-            # 使用分段并行处理
-            audio_data = await process_long_text(
-                text=request.text,
-                voice=request.voice,
-                rate=request.rate,
-                volume=request.volume,
-                pitch=request.pitch,
-                chunk_size=request.chunk_size,
-                concurrency=request.concurrency
-            )
-        else:
-            # 使用普通处理方式
-            audio_data = await tts_client.text_to_speech(
-                text=request.text,
-                voice=request.voice,
-                rate=request.rate,
-                volume=request.volume,
-                pitch=request.pitch
-            )
-        
-        elapsed = time.time() - start_time
-        logger.info(f"TTS请求处理成功: 文本长度 {len(request.text)} 字符, 生成音频大小 {len(audio_data)} 字节, 处理时间: {elapsed:.2f}秒")
-        return {"audio": base64.b64encode(audio_data).decode()}
+        async for chunk in http_request.stream():
+            received += len(chunk)
+            if received > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"上传的文本超过 {UPLOAD_MAX_BYTES} 字节上限")
+            upload_bytes.inc(len(chunk))
+            yield chunk
+    finally:
+        body_done.set()
+
+@app.post("/tts/upload")
+async def text_to_speech_upload(
+    http_request: Request,
+    voice: str = "zh-CN-XiaoxiaoNeural",
+    rate: str = "+0%",
+    volume: str = "+0%",
+    pitch: str = "+0Hz",
+    chunk_size: int = 1000,
+    concurrency: int = 3,
+    priority: Optional[str] = None,
+    tenant: str = Depends(get_tenant)
+):
+    """
+    上传长文本并边合成边返回audio/mpeg
+    
+    请求体为 text/plain（按charset解码，默认UTF-8）或 multipart/form-data（file或text字段），
+    语音参数通过查询字符串传入。文本边接收边分段，上传还没结束就开始合成前面的段；
+    并发合成的段都还没完成时暂停读取请求体，内存占用与文本总长度无关。
+    """
+    content_type, options = parse_options_header(http_request.headers.get("content-type", ""))
+    content_length = http_request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"上传的文本超过 {UPLOAD_MAX_BYTES} 字节上限")
+    if priority is None:
+        # 事先不知道字符数，按请求体字节数推断，分块上传的按bulk处理
+        priority = priority_for_length(int(content_length) if content_length.isdigit() else BULK_CHARS,
+                                       INTERACTIVE_CHARS, BULK_CHARS)
+    elif priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority 可选值为 {', '.join(PRIORITIES)}")
+    
+    body_done = asyncio.Event()
+    body = read_upload(http_request, body_done)
+    encoding = "utf-8"
+    if content_type == b"multipart/form-data":
+        if not options.get(b"boundary"):
+            raise HTTPException(status_code=400, detail="multipart请求缺少boundary")
+        body = MultipartTextField(options[b"boundary"]).iter(body)
+    elif content_type in (b"text/plain", b""):
+        encoding = options.get(b"charset", b"utf-8").decode("latin-1")
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise HTTPException(status_code=400, detail=f"不支持的字符集: {encoding}")
+    else:
+        raise HTTPException(status_code=415, detail="请求体须为 text/plain 或 multipart/form-data")
+    # UTF-8按utf-8-sig解码，去掉开头的BOM
+    decode_as = "utf-8-sig" if codecs.lookup(encoding).name == "utf-8" else encoding
+    # 先按请求数检查配额，字符数在每切出一段时扣减
+    check_quota(tenant, 0)
+    logger.info("正在处理上传TTS请求: 请求体 %s 字节, 语音 %s", content_length or "未知", voice)
+    
+    async def charged_segments() -> AsyncIterator[str]:
+        segments = segment_stream(body, tts_client.segment_ramp, chunk_size, decode_as)
+        try:
+            async for segment in segments:
+                check_quota(tenant, len(segment), requests=0)
+                yield segment
+        finally:
+            await segments.aclose()
+    
+    audio_stream = tts_client.stream_segments(charged_segments(), voice, rate, volume, pitch, concurrency)
+    # 先等到第一段音频再发送响应头，请求体格式错误、配额不足或首段失败时仍可以返回对应的状态码
+    try:
+        with tenant_context(tenant), priority_context(priority):
+            first = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="上传的文本为空")
+    except ClientDisconnect:
+        await audio_stream.aclose()
+        client_disconnects.inc(endpoint="/tts/upload")
+        logger.info("客户端在上传过程中断开，取消上传TTS请求")
+        return Response(status_code=499)
+    except HTTPException:
+        await audio_stream.aclose()
+        raise
+    except UnicodeDecodeError as e:
+        await audio_stream.aclose()
+        raise HTTPException(status_code=400, detail=f"文本无法按 {encoding} 解码: {e}")
+    except CircuitOpenError as e:
+        await audio_stream.aclose()
+        raise upstream_unavailable(e)
     except Exception as e:
-        logger.error(f"TTS请求处理失败: {str(e)}", exc_info=True)
+        await audio_stream.aclose()
+        logger.error("上传TTS请求处理失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def audio_body():
+        try:
+            yield first
+            with tenant_context(tenant), priority_context(priority):
+                async for audio in audio_stream:
+                    yield audio
+        except asyncio.CancelledError:
+            client_disconnects.inc(endpoint="/tts/upload")
+            logger.info("客户端已断开，停止上传TTS请求")
+            raise
+        except ClientDisconnect:
+            # 还在上传时客户端断开
+            client_disconnects.inc(endpoint="/tts/upload")
+            logger.info("客户端在上传过程中断开，停止上传TTS请求")
+        except Exception as e:
+            # 响应头已发送，只能记录错误并截断音频
+            logger.error("上传TTS请求中途失败: %s", e, exc_info=True)
+        finally:
+            await audio_stream.aclose()
+    
+    return UploadStreamingResponse(audio_body(), body_done, media_type="audio/mpeg")
 
 @app.get("/voices")
 async def get_available_voices():
-    """获取所有可用的语音列表"""
-    voices = await tts_client.get_voices()  # 使用SDK获取语音列表
+    """获取所有可用的语音列表，上游不可用时返回最近一次获取的列表"""
+    try:
+        voices = await tts_client.get_voices()  # 使用SDK获取语音列表
+    except CircuitOpenError as e:
+        raise upstream_unavailable(e)
     return {"voices": voices}
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """记录所有HTTP请求的中间件"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    logger.info(f"{request.method} {request.url.path} - 处理时间: {process_time:.2f}s - 状态码: {response.status_code}")
-    return response 
\ No newline at end of file
+@app.get("/healthz")
+async def healthz():
+    """存活检查：进程和事件循环能响应即可，不检查上游"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """就绪检查：未就绪时返回503，响应体给出各项指标和阈值"""
+    report = health_monitor.readiness()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content=report)
+    return report
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式的指标"""
+    return Response(content=metrics_registry.render(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+class RequestLogMiddleware:
+    """
+    记录所有HTTP请求的中间件
+    
+    直接实现ASGI接口，不包装receive：/tts/upload 在响应开始后还要继续读取请求体，
+    @app.middleware("http") 转发响应时会同时读取receive监听断开，与之争抢请求体消息。
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start_time = time.time()
+        
+        async def send_with_log(message):
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                # 编排系统频繁调用的健康检查只在DEBUG级别记录
+                level = logging.DEBUG if scope["path"] in ("/healthz", "/readyz") else logging.INFO
+                logger.log(level, "%s %s - 处理时间: %.2fs - 状态码: %d", scope["method"], scope["path"], process_time, message["status"])
+            await send(message)
+        
+        await self.app(scope, receive, send_with_log)
+
+app.add_middleware(RequestLogMiddleware) 
\ No newline at end of file
@@ -23,4 +23,9 @@ setup(
         "edge-tts>=6.1.9",
         "pydub>=0.25.1",
     ],
+    entry_points={
+        "console_scripts": [
+            "tts-edge=tts_edge_sdk.cli:main",
+        ],
+    },
 ) 
\ No newline at end of file
@@ -21,6 +21,7 @@ if 'tts_edge_sdk' in sys.modules:
 # 导入SDK
 from tts_edge_sdk import TTSClient
 import tts_edge_sdk.tts_sdk as sdk
+from tts_edge_sdk.mp3 import audio_info
 import inspect
 import functools
 import threading
@@ -171,9 +172,9 @@ async def test_tts(text: str = None, enable_chunking: bool = False, chunk_size:
     merge_timer = MergeTimeMeasurement()
     merge_timer.reset()
     
-    # 注册事件处理器，并确认已注册
-    sdk.on_merge_start(merge_timer.on_merge_start)
-    sdk.on_merge_end(merge_timer.on_merge_end)
+    # 在本次测试的客户端上注册事件处理器，测试结束后取消订阅，避免监听器累积
+    merge_start_sub = client.on("merge_start", merge_timer.on_merge_start)
+    merge_end_sub = client.on("merge_end", merge_timer.on_merge_end)
     logger.info(f"已注册音频合并事件处理器，准备开始测试")
     
     logger.info(f"开始测试: enable_chunking={enable_chunking}, 文本长度={len(text)}字符, chunk_size={chunk_size}, concurrency={concurrency}")
@@ -226,9 +227,9 @@ async def test_tts(text: str = None, enable_chunking: bool = False, chunk_size:
             logger.error("错误: 生成的音频数据为空!")
             return 0, 0, 0, 0, 0, 0
         
-        # 计算音频时长与文本比例（粗略估计）
-        # 16kHz采样率，16位深度，单声道
-        approx_duration = audio_size / 32000  # 字节数 / (采样率 * 位深度/8)
+        # 从MP3帧头计算精确的音频时长，不需要解码
+        info = audio_info(audio_data)
+        approx_duration = info.duration if info is not None else 0
         chars_per_second = len(text) / approx_duration if approx_duration > 0 else 0
         
         # 保存音频文件
@@ -259,7 +260,7 @@ async def test_tts(text: str = None, enable_chunking: bool = False, chunk_size:
         else:
             logger.info(f'处理时间: {processing_time:.2f}秒')
             
-        logger.info(f'音频大小: {audio_size}字节, 估计音频时长: {approx_duration:.2f}秒')
+        logger.info(f'音频大小: {audio_size}字节, 音频时长: {approx_duration:.2f}秒')
         logger.info(f'文本/音频比例: {chars_per_second:.2f}字符/秒')
         logger.info(f'音频已保存至: {os.path.abspath(filename)}')
         
@@ -268,6 +269,9 @@ async def test_tts(text: str = None, enable_chunking: bool = False, chunk_size:
         logger.error(f"TTS处理错误: {str(e)}", exc_info=True)
         # 捕获后重新抛出，以便上层处理
         raise
+    finally:
+        merge_start_sub.unsubscribe()
+        merge_end_sub.unsubscribe()
 
 async def main():
     """命令行模式主函数"""
@@ -844,8 +848,9 @@ class TTSUI:
                 self._log(f"合并的音频段数: {self.merge_timer.segments_count}")
             
             self._log(f"音频大小: {audio_size}字节")
-            self._log(f"估计音频时长: {approx_duration:.2f}秒")
-            self._log(f"文本/音频比例: {text_len/approx_duration:.2f}字符/秒")
+            self._log(f"音频时长: {approx_duration:.2f}秒")
+            if approx_duration > 0:
+                self._log(f"文本/音频比例: {text_len/approx_duration:.2f}字符/秒")
             self._log("=" * 40)
             
             self.status_var.set(f"语音生成完成! 用时: {total_time:.2f}秒")
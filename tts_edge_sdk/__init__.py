@@ -8,6 +8,19 @@ from .tts_sdk import (
     text_to_speech,
     async_text_to_speech
 )
+from .metrics import MetricsRegistry, default_registry
+from .events import EventEmitter, Subscription
+from .bulk import BulkResult, BulkItemResult
+from .segmentation import SegmentRamp
+from .mp3 import AudioInfo, audio_info
+from .silence import SilenceTrimmer
+from .script import ScriptLine, parse_script
+from .session import PlaybackSession
 
 __version__ = "0.1.0"
-__all__ = ["TTSClient", "SyncTTSClient", "text_to_speech", "async_text_to_speech"] 
\ No newline at end of file
+__all__ = [
+    "TTSClient", "SyncTTSClient", "text_to_speech", "async_text_to_speech",
+    "MetricsRegistry", "default_registry", "EventEmitter", "Subscription",
+    "BulkResult", "BulkItemResult", "SegmentRamp", "AudioInfo", "audio_info",
+    "SilenceTrimmer", "ScriptLine", "parse_script", "PlaybackSession"
+] 
\ No newline at end of file
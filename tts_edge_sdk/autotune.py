@@ -0,0 +1,250 @@
+"""
+分段参数自动调优
+
+根据最近的上游调用记录在线拟合延迟模型：
+
+    单段耗时 ≈ a + b × 段长(字符) + d × 同时进行的上游调用数
+
+首字节时间用同样的特征单独拟合。每个请求按文本长度枚举分段数，预测
+"批次数 × 单段耗时" 的总墙钟时间（流式场景同时比较首字节时间），选出最优的
+chunk_size 和 concurrency。观测不足时使用先验值，先验同时作为岭回归的
+正则项，避免少量离群观测把模型带偏。
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Sequence, Tuple
+
+# 传入 chunk_size 或 concurrency 时表示自动调优
+AUTO = "auto"
+
+# _split_text 的最小段长，分段数不会超过 文本长度 / MIN_CHUNK_SIZE
+MIN_CHUNK_SIZE = 500
+
+# 自动选择的段长上限。段越长，一段失败时重试的文本越多，检查点的粒度也越粗
+MAX_CHUNK_SIZE = 2000
+
+# 自动选择的段长不超过观测到的最长段的这么多倍，避免把线性模型外推到远超观测范围的段长
+OBSERVED_CHUNK_MULTIPLE = 2
+
+OBJECTIVE_WALL = "wall"
+OBJECTIVE_TTFB = "ttfb"
+
+# ttfb 目标下，总耗时最多比最优方案长这么多比例
+TTFB_WALL_SLACK = 0.25
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> Optional[List[float]]:
+    """高斯消元求解小规模线性方程组，奇异时返回None"""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(n):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                for c in range(col, n + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+class LinearLatencyModel:
+    """以 [1, 段长, 并发数] 为特征的岭回归模型，系数向先验收缩"""
+
+    def __init__(self, prior: Sequence[float], prior_weight: float = 0.05, window: int = 256):
+        """
+        Args:
+            prior: 先验系数 (a秒, b秒/字符, d秒/并发)
+            prior_weight: 先验的权重（相当于多少条观测）。只需很小的值：观测足以确定的系数
+                几乎不受先验影响，观测无法区分的方向（例如所有段长都相同）则保持先验
+            window: 只使用最近这么多条观测
+        """
+        self.prior = tuple(float(p) for p in prior)
+        self.prior_weight = prior_weight
+        self._observations: Deque[Tuple[float, float, float]] = deque(maxlen=window)
+        self._coefficients = self.prior
+        self._dirty = False
+
+    def observe(self, chars: float, concurrency: float, seconds: float) -> None:
+        self._observations.append((float(chars), float(concurrency), float(seconds)))
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._observations)
+
+    def max_chars(self) -> float:
+        """观测中最长的段长，没有观测时为0"""
+        return max((chars for chars, _, _ in self._observations), default=0.0)
+
+    def coefficients(self) -> Tuple[float, float, float]:
+        if self._dirty:
+            self._dirty = False
+            self._coefficients = self._fit()
+        return self._coefficients
+
+    def _fit(self) -> Tuple[float, float, float]:
+        # 特征尺度差异很大（段长是几百到几千），按先验系数缩放后再做岭回归
+        scale = [1.0, 1000.0, 10.0]
+        prior = [p * s for p, s in zip(self.prior, scale)]
+        xtx = [[0.0] * 3 for _ in range(3)]
+        xty = [0.0] * 3
+        for chars, concurrency, seconds in self._observations:
+            x = (1.0, chars / scale[1], concurrency / scale[2])
+            for i in range(3):
+                xty[i] += x[i] * seconds
+                for j in range(3):
+                    xtx[i][j] += x[i] * x[j]
+        for i in range(3):
+            xtx[i][i] += self.prior_weight
+            xty[i] += self.prior_weight * prior[i]
+        solution = _solve(xtx, xty)
+        if solution is None:
+            return self.prior
+        # 耗时不会随段长或并发数减少，负系数按0处理
+        a, b, d = solution[0], max(0.0, solution[1]), max(0.0, solution[2])
+        return max(0.0, a), b / scale[1], d / scale[2]
+
+    def predict(self, chars: float, concurrency: float) -> float:
+        a, b, d = self.coefficients()
+        return a + b * chars + d * concurrency
+
+
+class TuningPlan(NamedTuple):
+    """一次请求的分段方案，concurrency为执行时的并发上限"""
+    enable_chunking: bool
+    chunk_size: int
+    concurrency: int
+    segments: int
+    predicted_seconds: float
+    predicted_ttfb: float
+
+
+class Autotuner:
+    """根据在线延迟模型为每个请求选择 chunk_size 和 concurrency"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        min_chunk_size: int = MIN_CHUNK_SIZE,
+        max_chunk_size: int = MAX_CHUNK_SIZE,
+        latency_prior: Sequence[float] = (0.6, 0.004, 0.02),
+        ttfb_prior: Sequence[float] = (0.4, 0.0005, 0.02),
+        window: int = 256
+    ):
+        """
+        Args:
+            max_concurrency: 并发上限，使用连接池时不应超过池大小
+            min_chunk_size: 最小段长
+            max_chunk_size: 自动选择的最大段长，同时不超过观测到的最长段的 OBSERVED_CHUNK_MULTIPLE 倍
+            latency_prior: 单段总耗时模型的先验系数 (a, b, d)
+            ttfb_prior: 首字节时间模型的先验系数 (a, b, d)
+            window: 拟合使用的最近观测条数
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_chunk_size = max(1, min_chunk_size)
+        self.max_chunk_size = max(self.min_chunk_size, max_chunk_size)
+        self.latency = LinearLatencyModel(latency_prior, window=window)
+        self.ttfb = LinearLatencyModel(ttfb_prior, window=window)
+        self._lock = threading.Lock()
+
+    def observe(self, chars: int, concurrency: int, seconds: float, ttfb: Optional[float] = None) -> None:
+        """记录一次上游调用：段长、调用开始时的并发数、总耗时和首字节时间"""
+        with self._lock:
+            self.latency.observe(chars, concurrency, seconds)
+            if ttfb is not None:
+                self.ttfb.observe(chars, concurrency, ttfb)
+
+    def _chunk_limit(self) -> int:
+        """当前允许自动选择的最大段长"""
+        observed = self.latency.max_chars()
+        if not observed:
+            return self.max_chunk_size
+        return int(min(self.max_chunk_size, max(self.min_chunk_size * 1.5, observed * OBSERVED_CHUNK_MULTIPLE)))
+
+    def _evaluate(self, text_length: int, segments: int, concurrency: int) -> Tuple[float, float]:
+        chunk_chars = text_length / segments
+        waves = math.ceil(segments / concurrency)
+        per_chunk = self.latency.predict(chunk_chars, concurrency)
+        return waves * per_chunk, self.ttfb.predict(chunk_chars, concurrency)
+
+    def plan(
+        self,
+        text_length: int,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        objective: str = OBJECTIVE_WALL
+    ) -> TuningPlan:
+        """
+        为给定长度的文本选择分段方案
+
+        Args:
+            text_length: 文本字符数
+            chunk_size: 调用方固定的段长，None表示自动选择
+            concurrency: 调用方固定的并发数，None表示自动选择
+            objective: wall 最小化总耗时，ttfb 在总耗时接近最优的方案中最小化首字节时间
+
+        Returns:
+            TuningPlan: 分段方案
+        """
+        with self._lock:
+            # _split_text 在文本短于1.5倍段长时不分段
+            max_segments = 1
+            if text_length >= self.min_chunk_size * 1.5:
+                max_segments = max(1, text_length // self.min_chunk_size)
+            if chunk_size is not None:
+                size = max(chunk_size, self.min_chunk_size)
+                candidates = [1 if text_length < size * 1.5 else max(1, round(text_length / size))]
+            else:
+                # 段长不超过上限，长文本的段数可以多于并发数，分多批完成
+                min_segments = min(max_segments, max(1, math.ceil(text_length / self._chunk_limit())))
+                # 线性模型下段数越多每批的固定开销越多，只需枚举到最少段数之后若干批
+                candidates = range(min_segments, min(max_segments, min_segments * 2 + 4 * self.max_concurrency) + 1)
+
+            options = []
+            for segments in candidates:
+                if concurrency is not None:
+                    parallel_options = [max(1, concurrency)]
+                else:
+                    parallel_options = range(1, min(segments, self.max_concurrency) + 1)
+                for parallel in parallel_options:
+                    wall, ttfb = self._evaluate(text_length, segments, parallel)
+                    options.append((wall, ttfb, segments, parallel))
+
+        if objective == OBJECTIVE_TTFB:
+            # 只在总耗时不超过最优方案 TTFB_WALL_SLACK 的方案中比较首字节时间，
+            # 避免为了几十毫秒的首字节把并发降到1、后面的段赶不上播放
+            limit = min(option[0] for option in options) * (1 + TTFB_WALL_SLACK) + 0.01
+            options = [option for option in options if option[0] <= limit]
+            # 首字节时间相差不到10毫秒时按总耗时选择
+            key = lambda option: (round(option[1], 2), round(option[0], 2), option[2], option[3])
+        else:
+            # 预测总耗时相差不到10毫秒时选择更少的段和更低的并发
+            key = lambda option: (round(option[0], 2), option[2], option[3])
+        best = min(options, key=key)
+        wall, ttfb, segments, parallel = best
+        if segments <= 1:
+            return TuningPlan(False, chunk_size or text_length or 1, 1, 1, wall, ttfb)
+        size = chunk_size or math.ceil(text_length / segments)
+        if concurrency is None and parallel >= segments:
+            # 按标点切分的实际段数可能略多于计划，一批完成的方案允许用到并发上限，避免多出一批
+            parallel = self.max_concurrency
+        return TuningPlan(True, size, parallel, segments, wall, ttfb)
+
+    def estimate(self, chars: int, concurrency: int, min_observations: int = 8) -> Optional[float]:
+        """预测一次上游调用的耗时，观测少于min_observations条时只有先验、不足为据，返回None"""
+        with self._lock:
+            if len(self.latency) < min_observations:
+                return None
+            return self.latency.predict(chars, concurrency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "observations": len(self.latency),
+                "latency_coefficients": self.latency.coefficients(),
+                "ttfb_coefficients": self.ttfb.coefficients(),
+            }
@@ -0,0 +1,292 @@
+"""
+短文本微批处理
+
+大部分请求只有十几到几十个字符，每次上游调用的固定开销（握手、speech.config、
+SSML封装、首字节延迟）远大于合成本身。MicroBatcher把短时间窗口内到达的、租户、
+优先级、语音和语速/音量/音调都相同的短文本拼成一次上游合成，再按WordBoundary时间偏移
+把音频在帧边界处切回各个请求：
+
+    请求i的音频 = [请求i-1最后一个词结束与请求i第一个词开始的中点, 请求i与请求i+1的中点)
+
+第一个请求从音频开头开始，最后一个请求到音频结尾结束。词边界无法对应到每个请求时
+退回逐个单独合成，不会返回错位的音频。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import tracing
+from .deadline import no_deadline
+from .metrics import MetricsRegistry, default_registry
+from .mp3 import iter_frames
+from .scheduler import current_priority, current_tenant
+
+logger = logging.getLogger("tts-sdk")
+
+# (offset, duration, text)，时间单位为100纳秒
+WordBoundary = Tuple[int, int, str]
+
+# 合成函数：synthesize(text, voice, rate, volume, pitch, boundaries) -> 音频，
+# boundaries不为None时把WordBoundary追加到其中
+Synthesize = Callable[[str, str, str, str, str, Optional[List[WordBoundary]]], Awaitable[bytes]]
+
+_SENTENCE_END_MARKS = ("。", "！", "？", "；", ".", "!", "?", ";")
+
+_TICKS_PER_SECOND = 10_000_000
+
+
+class BatchSplitError(Exception):
+    """合并合成的词边界无法对应到各个请求"""
+
+
+def join_texts(texts: Sequence[str]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    把多段文本拼成一次合成的文本
+
+    没有句末标点的文本补一个句号，保证各段之间有停顿、不会连读。
+
+    Returns:
+        Tuple[str, List[Tuple[int, int]]]: (合并后的文本, 每段原文在其中的 [start, end) 位置)
+    """
+    parts = []
+    spans = []
+    position = 0
+    for text in texts:
+        stripped = text.strip()
+        piece = stripped if stripped.endswith(_SENTENCE_END_MARKS) else stripped + "。"
+        spans.append((position, position + len(piece)))
+        parts.append(piece)
+        position += len(piece) + 1
+    return " ".join(parts), spans
+
+
+def assign_boundaries(
+    combined: str,
+    spans: Sequence[Tuple[int, int]],
+    boundaries: Sequence[WordBoundary]
+) -> List[List[WordBoundary]]:
+    """按词在合并文本中的位置把WordBoundary分配给各段，每段至少要有一个词"""
+    assigned: List[List[WordBoundary]] = [[] for _ in spans]
+    cursor = 0
+    segment = 0
+    for boundary in boundaries:
+        word = boundary[2].strip()
+        if not word:
+            continue
+        found = combined.find(word, cursor)
+        if found < 0:
+            # 上游可能对文本做了规范化（如数字、符号读法），找不到的词跳过
+            continue
+        cursor = found + len(word)
+        while segment < len(spans) - 1 and found >= spans[segment][1]:
+            segment += 1
+        assigned[segment].append(boundary)
+    if any(not words for words in assigned):
+        raise BatchSplitError("部分请求没有对应的词边界")
+    return assigned
+
+
+def split_audio(audio: bytes, assigned: Sequence[Sequence[WordBoundary]]) -> List[bytes]:
+    """按词边界把合并合成的MP3音频在帧边界处切成各段"""
+    frames = list(iter_frames(audio))
+    if not frames:
+        raise BatchSplitError("合并合成没有返回有效的音频帧")
+    # 各段之间的切分时间：前一段最后一个词结束与后一段第一个词开始的中点
+    cuts = []
+    for previous, following in zip(assigned, assigned[1:]):
+        end = previous[-1][0] + previous[-1][1]
+        start = following[0][0]
+        if start < end:
+            raise BatchSplitError("词边界时间偏移不是递增的")
+        cuts.append((end + start) / 2)
+
+    pieces = []
+    piece_start = 0
+    elapsed = 0.0
+    cut_index = 0
+    for offset, header in frames:
+        # 帧的起始时间越过切分点时在这一帧之前切开
+        while cut_index < len(cuts) and elapsed >= cuts[cut_index]:
+            pieces.append(audio[piece_start:offset])
+            piece_start = offset
+            cut_index += 1
+        elapsed += header.duration * _TICKS_PER_SECOND
+    end = frames[-1][0] + frames[-1][1].frame_length
+    while len(pieces) < len(assigned):
+        pieces.append(audio[piece_start:end])
+        piece_start = end
+    if any(not piece for piece in pieces):
+        raise BatchSplitError("切分后有请求没有音频")
+    return pieces
+
+
+class _Batch:
+    """一个正在收集请求的批次"""
+
+    __slots__ = ("key", "synthesize", "items", "chars", "timer", "task")
+
+    def __init__(self, key: Tuple[str, str, str, str, str, str], synthesize: Synthesize):
+        self.key = key
+        self.synthesize = synthesize
+        # (文本, 等待结果的future, 加入时间)
+        self.items: List[Tuple[str, asyncio.Future, float]] = []
+        self.chars = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class MicroBatcher:
+    """把短时间窗口内参数相同的短文本合并成一次上游合成"""
+
+    def __init__(
+        self,
+        window: float = 0.02,
+        max_text_chars: int = 60,
+        max_batch_chars: int = 400,
+        max_batch_size: int = 16,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            window: 第一个请求到达后最多等待这么多秒收集同批请求
+            max_text_chars: 不超过这么多字符的文本才参与合并
+            max_batch_chars: 一批合并后的最大字符数，达到后立即发出
+            max_batch_size: 一批最多合并的请求数，达到后立即发出
+            metrics_registry: 指标注册表
+        """
+        self.window = window
+        self.max_text_chars = max_text_chars
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_size = max(1, max_batch_size)
+        # (租户, 优先级, 语音, 语速, 音量, 音调) -> 正在收集的批次
+        self._open: Dict[Tuple[str, str, str, str, str, str], _Batch] = {}
+        self._tasks: set = set()
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._batch_size = registry.histogram(
+            "tts_batch_size", "每次合并上游合成包含的请求数",
+            buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+        )
+        self._batch_wait = registry.histogram(
+            "tts_batch_wait_seconds", "请求为等待同批请求额外增加的延迟",
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+        )
+        self._fallbacks = registry.counter(
+            "tts_batch_fallbacks_total", "词边界无法切分、退回逐个合成的批次数"
+        )
+
+    def accepts(self, text: str) -> bool:
+        """文本是否足够短、可以参与合并"""
+        return 0 < len(text.strip()) <= self.max_text_chars
+
+    async def submit(
+        self,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        synthesize: Synthesize
+    ) -> bytes:
+        """
+        提交一个短文本，返回它自己的那一段音频
+
+        Args:
+            text: 要合成的文本
+            voice: 语音名称
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            synthesize: 执行一次上游合成的函数，同一批使用第一个请求的函数
+        """
+        loop = asyncio.get_running_loop()
+        # 只合并同一租户、同一优先级的请求：合并合成在调度器中按该租户和优先级排队、计费
+        key = (current_tenant(), current_priority(), voice, rate, volume, pitch)
+        batch = self._open.get(key)
+        if batch is not None and (
+            batch.chars + len(text) > self.max_batch_chars or len(batch.items) >= self.max_batch_size
+        ):
+            self._flush(batch)
+            batch = None
+        if batch is None:
+            batch = _Batch(key, synthesize)
+            self._open[key] = batch
+            batch.timer = loop.call_later(self.window, self._flush, batch)
+        future = loop.create_future()
+        batch.items.append((text, future, time.perf_counter()))
+        batch.chars += len(text)
+        if len(batch.items) >= self.max_batch_size or batch.chars >= self.max_batch_chars:
+            self._flush(batch)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # 同批的调用方都已取消时中止合并合成，不再占用上游
+            if batch.task is not None and all(item[1].cancelled() for item in batch.items):
+                batch.task.cancel()
+            raise
+
+    def _flush(self, batch: _Batch) -> None:
+        if self._open.get(batch.key) is batch:
+            del self._open[batch.key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        now = time.perf_counter()
+        for _, _, queued_at in batch.items:
+            self._batch_wait.observe(now - queued_at)
+        # 合并合成由多个请求共享，不受其中某一个请求的截止时间限制，各调用方仍在自己的预算内等待；
+        # 也不挂在其中某一个请求的追踪上
+        with no_deadline(), tracing.detached():
+            task = batch.task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _Batch) -> None:
+        # 调用方已取消的请求不再合成
+        items = [(text, future) for text, future, _ in batch.items if not future.done()]
+        if not items:
+            return
+        self._batch_size.observe(len(items))
+        voice, rate, volume, pitch = batch.key[2:]
+        if len(items) == 1:
+            await self._run_single(batch, *items[0])
+            return
+        try:
+            combined, spans = join_texts([text for text, _ in items])
+            boundaries: List[WordBoundary] = []
+            audio = await batch.synthesize(combined, voice, rate, volume, pitch, boundaries)
+            pieces = split_audio(audio, assign_boundaries(combined, spans, boundaries))
+        except BatchSplitError as e:
+            self._fallbacks.inc()
+            logger.warning("合并合成无法按词边界切分，逐个合成 %d 个请求: %s", len(items), e)
+            await asyncio.gather(*(self._run_single(batch, text, future) for text, future in items))
+            return
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.debug("合并合成 %d 个请求，共 %d 字符", len(items), len(combined))
+        for (_, future), piece in zip(items, pieces):
+            if not future.done():
+                future.set_result(piece)
+
+    async def _run_single(self, batch: _Batch, text: str, future: asyncio.Future) -> None:
+        voice, rate, volume, pitch = batch.key[2:]
+        try:
+            audio = await batch.synthesize(text, voice, rate, volume, pitch, None)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(audio)
+
+    async def close(self) -> None:
+        """立即发出所有正在收集的批次并等待完成"""
+        for batch in list(self._open.values()):
+            self._flush(batch)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
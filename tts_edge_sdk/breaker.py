@@ -0,0 +1,216 @@
+"""
+上游熔断器
+
+上游服务降级时，每个请求都要等到WebSocket超时才失败，worker被占满后整个API随之不可用。
+CircuitBreaker 统计最近一段时间内上游调用的失败率和慢调用比例：
+
+- closed：正常放行，窗口内调用数达到 min_calls 且失败率或慢调用比例超过阈值时熔断
+- open：直接拒绝，抛出 CircuitOpenError，调用方可以立即失败或改用缓存
+- half_open：熔断 open_seconds 秒后放行少量探测调用，连续成功则恢复，任一失败则重新熔断
+
+调用方取消、超出自身截止时间以及参数错误不代表上游故障，不计为失败。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple, Type
+
+from .deadline import DeadlineExceeded
+from .metrics import MetricsRegistry, default_registry
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+# tts_breaker_state 指标的取值
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"上游服务暂时不可用（熔断器 {name} 已打开），请在 {math.ceil(retry_after)} 秒后重试")
+
+
+class CircuitBreaker:
+    """按失败率和慢调用比例熔断，熔断后半开探测恢复"""
+
+    def __init__(
+        self,
+        name: str = "upstream",
+        window: float = 30.0,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 2,
+        excluded_exceptions: Tuple[Type[BaseException], ...] = (ValueError, DeadlineExceeded),
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            name: 熔断器名称，用作指标标签
+            window: 统计最近这么多秒内的调用
+            min_calls: 窗口内调用数达到这么多才判断是否熔断，避免少量调用误判
+            failure_rate: 失败率超过该值时熔断
+            slow_call_seconds: 耗时超过这么多秒的调用记为慢调用
+            slow_call_rate: 慢调用比例超过该值时熔断
+            open_seconds: 熔断后经过这么多秒进入半开状态
+            half_open_probes: 半开状态下放行的探测调用数，全部成功后恢复
+            excluded_exceptions: 不计为失败的异常类型
+            metrics_registry: 指标注册表
+        """
+        self.name = name
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.excluded_exceptions = excluded_exceptions
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        # (完成时间, 是否失败, 是否慢调用)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self._lock = threading.Lock()
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._state_gauge = registry.gauge(
+            "tts_breaker_state", "熔断器状态：0为closed，1为half_open，2为open", ["breaker"]
+        )
+        self._transitions = registry.counter(
+            "tts_breaker_transitions_total", "熔断器进入各状态的次数", ["breaker", "state"]
+        )
+        self._rejected = registry.counter("tts_breaker_rejected_total", "熔断期间被直接拒绝的调用数", ["breaker"])
+        self._state_gauge.set(_STATE_VALUES[STATE_CLOSED], breaker=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def retry_after(self) -> float:
+        """距离进入半开状态的秒数，未熔断时为0"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def _transition(self, state: str, now: float) -> None:
+        self._state = state
+        if state == STATE_OPEN:
+            self._opened_at = now
+        if state == STATE_HALF_OPEN:
+            self._probes_started = 0
+            self._probes_succeeded = 0
+        if state == STATE_CLOSED:
+            self._calls.clear()
+        self._state_gauge.set(_STATE_VALUES[state], breaker=self.name)
+        self._transitions.inc(breaker=self.name, state=state)
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == STATE_OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(STATE_HALF_OPEN, now)
+
+    def before_call(self) -> None:
+        """调用上游之前检查是否放行，熔断时抛出CircuitOpenError"""
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            if self._state == STATE_CLOSED:
+                return
+            if self._state == STATE_HALF_OPEN and self._probes_started < self.half_open_probes:
+                self._probes_started += 1
+                return
+            retry_after = max(0.0, self._opened_at + self.open_seconds - now) if self._state == STATE_OPEN else 1.0
+        self._rejected.inc(breaker=self.name)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        """记录一次调用的耗时和结果"""
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_HALF_OPEN:
+                if failed or slow:
+                    self._transition(STATE_OPEN, now)
+                else:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_probes:
+                        self._transition(STATE_CLOSED, now)
+                return
+            if self._state == STATE_OPEN:
+                # 熔断前已经发出的调用，结果不再影响状态
+                return
+            self._calls.append((now, failed, slow))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slows = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate or slows / total >= self.slow_call_rate:
+                self._transition(STATE_OPEN, now)
+
+    def release_probe(self) -> None:
+        """半开状态下放行的调用没有产生结果（例如被取消）时归还探测名额"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes_started > self._probes_succeeded:
+                self._probes_started -= 1
+
+    @asynccontextmanager
+    async def observe(self) -> AsyncIterator[None]:
+        """按代码块的耗时和异常记录一次调用的结果，调用方需要先通过before_call"""
+        start = time.perf_counter()
+        try:
+            yield
+        except self.excluded_exceptions:
+            self.release_probe()
+            raise
+        except asyncio.CancelledError:
+            self.release_probe()
+            raise
+        except Exception:
+            self.record(time.perf_counter() - start, failed=True)
+            raise
+        self.record(time.perf_counter() - start, failed=False)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """在熔断器保护下执行代码块：熔断时直接抛出CircuitOpenError，否则记录代码块的结果"""
+        self.before_call()
+        async with self.observe():
+            yield
+
+    def reset(self) -> None:
+        """手动恢复到closed状态"""
+        with self._lock:
+            self._transition(STATE_CLOSED, time.monotonic())
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            total = len(self._calls)
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slows = sum(1 for _, _, s in self._calls if s)
+            return {
+                "state": self._state,
+                "calls": total,
+                "failure_rate": failures / total if total else 0.0,
+                "slow_call_rate": slows / total if total else 0.0,
+                "retry_after": max(0.0, self._opened_at + self.open_seconds - now) if self._state == STATE_OPEN else 0.0,
+            }
@@ -0,0 +1,192 @@
+"""
+批量离线生成 - save_many/map 使用的结果类型和文件工具
+
+输入是 (text, output_path) 或 (text, output_path, params) 元组，也可以是包含
+text、output_path 以及语音参数的字典；params中的键与 TTSClient.text_to_speech
+的参数相同（voice、rate、volume、pitch、enable_chunking、chunk_size、concurrency）。
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 结果状态
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+def parse_item(item: Any) -> Tuple[str, str, Dict[str, Any]]:
+    """把一个批量任务项解析为 (text, output_path, params)"""
+    if isinstance(item, dict):
+        params = dict(item)
+        try:
+            text = params.pop("text")
+            output_path = params.pop("output_path")
+        except KeyError as e:
+            raise ValueError(f"批量任务项缺少字段: {e.args[0]}") from None
+        return text, output_path, params
+    if isinstance(item, (tuple, list)):
+        if len(item) == 2:
+            return item[0], item[1], {}
+        if len(item) == 3:
+            return item[0], item[1], dict(item[2] or {})
+    raise ValueError("批量任务项应为 (text, output_path[, params]) 或包含text和output_path的字典")
+
+
+def is_valid_audio_file(path: str) -> bool:
+    """判断输出文件是否已存在且是完整写入的MP3（以ID3标签或MPEG帧同步字开头）"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(4)
+    except OSError:
+        return False
+    if len(head) < 4:
+        return False
+    return head[:3] == b"ID3" or (head[0] == 0xFF and (head[1] & 0xE0) == 0xE0)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """先写临时文件再替换，中断时不会留下写了一半的输出文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_copy(source: str, path: str) -> None:
+    """原子地把source复制到path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BulkItemResult:
+    """单个任务项的处理结果"""
+
+    __slots__ = ("index", "output_path", "status", "chars", "audio_bytes", "elapsed", "error")
+
+    def __init__(
+        self,
+        index: int,
+        output_path: Optional[str],
+        status: str,
+        chars: int = 0,
+        audio_bytes: int = 0,
+        elapsed: float = 0.0,
+        error: Optional[BaseException] = None
+    ):
+        self.index = index
+        self.output_path = output_path
+        self.status = status
+        self.chars = chars
+        self.audio_bytes = audio_bytes
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status != STATUS_FAILED
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "output_path": self.output_path,
+            "status": self.status,
+            "chars": self.chars,
+            "audio_bytes": self.audio_bytes,
+            "elapsed": round(self.elapsed, 3),
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+    def __repr__(self) -> str:
+        return f"BulkItemResult(index={self.index}, status={self.status!r}, output_path={self.output_path!r})"
+
+
+class BulkResult:
+    """批量任务的汇总结果"""
+
+    def __init__(self):
+        self.items: List[BulkItemResult] = []
+        self.succeeded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.chars = 0
+        self.audio_bytes = 0
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+
+    def add(self, result: BulkItemResult) -> None:
+        self.items.append(result)
+        if result.status == STATUS_OK:
+            self.succeeded += 1
+            self.chars += result.chars
+            self.audio_bytes += result.audio_bytes
+        elif result.status == STATUS_SKIPPED:
+            self.skipped += 1
+        else:
+            self.failed += 1
+
+    def finish(self) -> None:
+        if self._end is None:
+            self._end = time.perf_counter()
+        self.items.sort(key=lambda r: r.index)
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def elapsed(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    @property
+    def items_per_second(self) -> float:
+        """实际合成的任务项每秒处理数（不含跳过的项）"""
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def chars_per_second(self) -> float:
+        return self.chars / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def failures(self) -> List[BulkItemResult]:
+        return [r for r in self.items if r.status == STATUS_FAILED]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "chars": self.chars,
+            "audio_bytes": self.audio_bytes,
+            "elapsed": round(self.elapsed, 3),
+            "items_per_second": round(self.items_per_second, 3),
+            "chars_per_second": round(self.chars_per_second, 1),
+        }
+
+    def __repr__(self) -> str:
+        return f"BulkResult({self.summary()})"
@@ -0,0 +1,256 @@
+"""
+跨进程共享的磁盘音频缓存
+
+同一台机器上的多个uvicorn worker共用一个缓存目录：
+- 音频文件以内容哈希命名，按前两位分目录存放
+- 先写临时文件再os.replace，读者永远看不到写了一半的文件
+- SQLite索引（WAL模式）记录大小和最近访问时间，用于LRU淘汰和总容量限制
+- 命中时可以只拿文件路径交给FileResponse，或用mmap读取，不经过额外的缓冲区拷贝
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("tts-sdk")
+
+# 缓存格式版本，音频输出格式变化时递增以避免读到旧数据
+CACHE_VERSION = 1
+
+
+class DiskCache:
+    """跨进程共享的磁盘音频缓存"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        min_evict_age: float = 60.0
+    ):
+        """
+        初始化磁盘缓存
+
+        Args:
+            directory: 缓存目录，多个进程使用同一目录即可共享缓存
+            max_bytes: 缓存总容量上限（字节），超出后按最近访问时间淘汰
+            min_evict_age: 最近这么多秒内被访问过的条目不会被淘汰，
+                保证刚返回给调用方的文件路径在发送期间仍然有效
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.min_evict_age = min_evict_age
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, "index.sqlite3")
+        self._local = threading.local()
+        self._init_db()
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str, volume: str, pitch: str) -> str:
+        """根据文本和语音参数计算缓存键"""
+        payload = json.dumps(
+            [CACHE_VERSION, voice, rate, volume, pitch, text],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO stats (id, total) VALUES (0, 0)")
+
+    def path_for(self, key: str) -> str:
+        """返回缓存键对应的文件路径（文件不一定存在）"""
+        return os.path.join(self.directory, key[:2], key + ".mp3")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        查找缓存条目并刷新访问时间
+
+        Returns:
+            Optional[str]: 命中时返回音频文件路径，否则返回None
+        """
+        path = self.path_for(key)
+        conn = self._connect()
+        cur = conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        if cur.rowcount == 0:
+            return None
+        if not os.path.exists(path):
+            # 文件被外部删除，修正索引
+            self._forget(key)
+            return None
+        return path
+
+    def read(self, key: str) -> Optional[bytes]:
+        """命中时通过mmap读取音频数据，否则返回None"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            return self.read_path(path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def read_path(path: str) -> bytes:
+        """用mmap把缓存文件读成bytes，避免read()的中间缓冲"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def put(self, key: str, data: bytes) -> str:
+        """原子地写入缓存条目，返回文件路径"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._index(key, len(data))
+        return path
+
+    def put_file(self, key: str, source_path: str) -> str:
+        """把已写好的音频文件复制进缓存，不需要把整个文件读入内存"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._index(key, os.path.getsize(path))
+        return path
+
+    def _index(self, key: str, size: int) -> None:
+        """记录新写入的条目并在超出容量时淘汰"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            old_size = row[0] if row else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, size, now, now)
+            )
+            conn.execute("UPDATE stats SET total = total + ? WHERE id = 0", (size - old_size,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._evict()
+
+    def _forget(self, key: str) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.execute("UPDATE stats SET total = total - ? WHERE id = 0", (row[0],))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self) -> None:
+        """总容量超限时按最近访问时间淘汰旧条目"""
+        conn = self._connect()
+        total = conn.execute("SELECT total FROM stats WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cutoff = time.time() - self.min_evict_age
+        removed = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute("SELECT total FROM stats WHERE id = 0").fetchone()[0]
+            rows = conn.execute(
+                "SELECT key, size FROM entries WHERE last_access < ? ORDER BY last_access",
+                (cutoff,)
+            )
+            for key, size in rows.fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed.append((key, size))
+            conn.execute(
+                "UPDATE stats SET total = total - ? WHERE id = 0",
+                (sum(size for _, size in removed),)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for key, _ in removed:
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info("磁盘缓存淘汰 %d 个条目，当前占用 %d 字节", len(removed), total)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存条目数和占用字节数"""
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = conn.execute("SELECT total FROM stats WHERE id = 0").fetchone()[0]
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        """清空缓存"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            keys = [row[0] for row in conn.execute("SELECT key FROM entries").fetchall()]
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE stats SET total = 0 WHERE id = 0")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for key in keys:
+            try:
+                os.unlink(self.path_for(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,130 @@
+"""
+长文本分段合成的磁盘检查点
+
+分段合成时每完成一段就原子地写入检查点目录，目录名由全文哈希和语音参数决定，
+其中的 manifest.json 记录分段列表和完成情况。同一请求失败后重新执行时，只合成
+缺失的分段再合并；整个请求成功后检查点目录会被删除。
+
+    <checkpoint_dir>/<job_key>/manifest.json
+    <checkpoint_dir>/<job_key>/00012-<segment_hash>.mp3
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List
+
+from .bulk import atomic_write
+
+logger = logging.getLogger("tts-sdk")
+
+# 检查点格式版本，分段或音频格式变化时递增
+CHECKPOINT_VERSION = 1
+
+
+def _sha256(payload: Any) -> str:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ChunkCheckpoint:
+    """一次长文本合成的分段检查点"""
+
+    def __init__(
+        self,
+        root: str,
+        text: str,
+        chunks: List[str],
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str
+    ):
+        """
+        Args:
+            root: 检查点根目录
+            text: 完整文本
+            chunks: 切分后的文本段
+            voice: 语音名称
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+        """
+        params = {"voice": voice, "rate": rate, "volume": volume, "pitch": pitch}
+        self.key = _sha256([CHECKPOINT_VERSION, params, text])
+        self.directory = os.path.join(os.path.abspath(root), self.key)
+        self.chunks = chunks
+        # 分段哈希包含参数和段文本，切分方式变化时旧分段不会被误用
+        self._segment_hashes = [_sha256([CHECKPOINT_VERSION, params, chunk])[:16] for chunk in chunks]
+        self._manifest_path = os.path.join(self.directory, "manifest.json")
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Any] = {
+            "version": CHECKPOINT_VERSION,
+            "params": params,
+            "chars": len(text),
+            "created": time.time(),
+            "segments": [
+                {"index": i, "hash": h, "chars": len(chunk), "bytes": None}
+                for i, (chunk, h) in enumerate(zip(chunks, self._segment_hashes))
+            ],
+        }
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{index:05d}-{self._segment_hashes[index]}.mp3")
+
+    def load(self) -> Dict[int, str]:
+        """
+        创建检查点目录并找出已完成的分段
+
+        Returns:
+            Dict[int, str]: 已完成分段的序号到音频文件路径的映射
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            self._manifest["created"] = previous.get("created", self._manifest["created"])
+        except (OSError, ValueError):
+            previous = None
+
+        done = {}
+        for index in range(len(self.chunks)):
+            path = self._segment_path(index)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size > 0:
+                done[index] = path
+                self._manifest["segments"][index]["bytes"] = size
+        self._write_manifest()
+        if done:
+            logger.info("从检查点 %s 恢复 %d/%d 段", self.key[:12], len(done), len(self.chunks))
+        return done
+
+    @staticmethod
+    def read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def save(self, index: int, data: bytes) -> None:
+        """原子地保存一个已完成的分段并更新清单"""
+        atomic_write(self._segment_path(index), data)
+        with self._lock:
+            self._manifest["segments"][index]["bytes"] = len(data)
+            self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        self._manifest["updated"] = time.time()
+        atomic_write(self._manifest_path, json.dumps(self._manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    def completed(self) -> int:
+        return sum(1 for segment in self._manifest["segments"] if segment["bytes"])
+
+    def discard(self) -> None:
+        """请求成功后删除检查点目录"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,342 @@
+"""
+tts-edge 命令行工具 - 批量把文本/Markdown文件转换为MP3
+
+    tts-edge chapters/*.md -o audio/ --workers 8 --voice zh-CN-YunxiNeural
+    cat article.txt | tts-edge - > article.mp3
+
+已完成的文件记录在清单文件（默认 <输出目录>/tts-edge-manifest.jsonl）中，
+中断后重新运行会跳过文本和参数都没有变化的文件。
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .tts_sdk import TTSClient
+from .segmentation import SegmentRamp
+
+logger = logging.getLogger("tts-sdk")
+
+DEFAULT_MANIFEST = "tts-edge-manifest.jsonl"
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown")
+
+_MD_PATTERNS = [
+    (re.compile(r"```.*?```", re.S), ""),                 # 代码块
+    (re.compile(r"`([^`]*)`"), r"\1"),                    # 行内代码
+    (re.compile(r"!\[[^\]]*\]\([^)]*\)"), ""),             # 图片
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),         # 链接
+    (re.compile(r"^\s{0,3}#{1,6}\s*", re.M), ""),          # 标题
+    (re.compile(r"^\s{0,3}>\s?", re.M), ""),               # 引用
+    (re.compile(r"^\s*([-*+]|\d+\.)\s+", re.M), ""),       # 列表标记
+    (re.compile(r"^\s*([-*_]\s*){3,}$", re.M), ""),        # 分隔线
+    (re.compile(r"(\*\*|__|\*|_|~~)(\S.*?\S|\S)\1"), r"\2"),  # 强调
+    (re.compile(r"<[^>]+>"), ""),                          # HTML标签
+]
+
+
+def markdown_to_text(markdown: str) -> str:
+    """去掉Markdown标记，只保留需要朗读的文字"""
+    text = markdown
+    for pattern, replacement in _MD_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def read_source(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.lower().endswith((".md", ".markdown")):
+        return markdown_to_text(content)
+    return content.strip()
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """展开文件、目录和通配符，目录按扩展名递归查找文本文件"""
+    files: List[str] = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [
+                os.path.join(root, name)
+                for root, _, names in os.walk(pattern)
+                for name in names if name.lower().endswith(TEXT_EXTENSIONS)
+            ]
+        else:
+            matches = glob.glob(pattern, recursive=True) or ([pattern] if os.path.exists(pattern) else [])
+            if not matches:
+                logger.warning("没有匹配的文件: %s", pattern)
+        for path in sorted(matches):
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def output_path_for(source: str, output_dir: Optional[str], base_dir: Optional[str]) -> str:
+    stem = os.path.splitext(source)[0] + ".mp3"
+    if output_dir is None:
+        return stem
+    relative = os.path.relpath(stem, base_dir) if base_dir else os.path.basename(stem)
+    return os.path.join(output_dir, relative)
+
+
+def job_hash(text: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([params, text], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """记录已完成文件的追加式清单，每行一条JSON"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.done[entry["output"]] = entry["hash"]
+                    except (ValueError, KeyError):
+                        # 中断时可能留下不完整的最后一行
+                        continue
+        self._file = None
+
+    def is_done(self, output: str, digest: str) -> bool:
+        return self.done.get(output) == digest and os.path.exists(output)
+
+    def record(self, source: str, output: str, digest: str, audio_bytes: int) -> None:
+        if not self.path:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        entry = {"source": source, "output": output, "hash": digest, "bytes": audio_bytes, "time": time.time()}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.done[output] = digest
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Progress:
+    """在stderr上显示进度、字符速率和预计剩余时间"""
+
+    def __init__(self, total_items: int, total_chars: int, enabled: bool, stream=None):
+        self.total_items = total_items
+        self.total_chars = total_chars
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.items = 0
+        self.chars = 0
+        self.synthesized_chars = 0
+        self.failed = 0
+        self._start = time.perf_counter()
+        self._last_render = 0.0
+
+    def update(self, chars: int, synthesized: bool, failed: bool = False) -> None:
+        self.items += 1
+        self.chars += chars
+        if synthesized:
+            self.synthesized_chars += chars
+        if failed:
+            self.failed += 1
+        now = time.perf_counter()
+        if now - self._last_render >= 0.2 or self.items == self.total_items:
+            self._last_render = now
+            self.render()
+
+    @staticmethod
+    def _format_eta(seconds: float) -> str:
+        seconds = int(seconds)
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def render(self) -> None:
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - self._start
+        rate = self.synthesized_chars / elapsed if elapsed > 0 else 0.0
+        remaining = self.total_chars - self.chars
+        eta = self._format_eta(remaining / rate) if rate > 0 else "--:--:--"
+        percent = self.chars / self.total_chars * 100 if self.total_chars else 100.0
+        self.stream.write(
+            f"\r[{self.items}/{self.total_items}] {percent:5.1f}% "
+            f"{rate:8.1f} 字符/秒  剩余 {eta}  失败 {self.failed}"
+        )
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self.enabled:
+            self.render()
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tts-edge",
+        description="使用Edge TTS把文本或Markdown文件批量转换为MP3"
+    )
+    parser.add_argument("inputs", nargs="+", help="输入文件、目录或通配符；使用 - 从标准输入读取并把音频写到标准输出")
+    parser.add_argument("-o", "--output-dir", help="输出目录，默认与源文件放在同一目录")
+    parser.add_argument("--voice", default="zh-CN-XiaoxiaoNeural", help="语音名称")
+    parser.add_argument("--rate", default="+0%", help="语速，如 +10%%")
+    parser.add_argument("--volume", default="+0%", help="音量，如 -20%%")
+    parser.add_argument("--pitch", default="+0Hz", help="音调，如 +5Hz")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="同时转换的文件数")
+    parser.add_argument("--chunk-size", type=int, default=500, help="长文本分段的目标字符数")
+    parser.add_argument("--first-chunk-size", type=int, default=40,
+                        help="从标准输入读取时首段的字符数，后续段逐段翻倍到 --chunk-size；0表示不使用")
+    parser.add_argument("--concurrency", type=int, default=3, help="单个文件内并发合成的段数")
+    parser.add_argument("--max-retries", type=int, default=1, help="单段合成失败后的重试次数")
+    parser.add_argument("--checkpoint-dir", help="长文本分段检查点目录，中断后重跑只合成缺失的段")
+    parser.add_argument("--manifest", help=f"完成记录清单路径，默认为输出目录下的 {DEFAULT_MANIFEST}")
+    parser.add_argument("--no-manifest", action="store_true", help="不读写清单，总是重新转换")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不显示进度")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    return parser
+
+
+def _plan_jobs(
+    files: List[str],
+    args: argparse.Namespace,
+    params: Dict[str, Any],
+    manifest: Manifest
+) -> Tuple[List[Tuple[str, str, str, int]], int, int]:
+    """读取每个源文件计算哈希，返回待转换任务以及已完成的文件数和字符数"""
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files]) if files else None
+    jobs = []
+    skipped = skipped_chars = 0
+    for source in files:
+        text = read_source(source)
+        if not text:
+            logger.warning("跳过空文件: %s", source)
+            continue
+        output = output_path_for(os.path.abspath(source), args.output_dir, base_dir)
+        digest = job_hash(text, params)
+        if manifest.is_done(output, digest):
+            skipped += 1
+            skipped_chars += len(text)
+            continue
+        jobs.append((source, output, digest, len(text)))
+    return jobs, skipped, skipped_chars
+
+
+async def convert_files(args: argparse.Namespace) -> int:
+    files = expand_inputs(args.inputs)
+    if not files:
+        logger.error("没有找到任何输入文件")
+        return 1
+    params = {"voice": args.voice, "rate": args.rate, "volume": args.volume, "pitch": args.pitch}
+    manifest_path = None
+    if not args.no_manifest:
+        manifest_path = args.manifest or os.path.join(args.output_dir or os.getcwd(), DEFAULT_MANIFEST)
+    manifest = Manifest(manifest_path)
+
+    jobs, skipped, skipped_chars = _plan_jobs(files, args, params, manifest)
+    total_chars = skipped_chars + sum(job[3] for job in jobs)
+    progress = Progress(skipped + len(jobs), total_chars, enabled=not args.quiet)
+    progress.items = skipped
+    progress.chars = skipped_chars
+
+    def items() -> Iterator[Tuple[str, str]]:
+        # 源文件在真正转换时再读取，内存中只保留路径和哈希
+        for source, output, _, _ in jobs:
+            yield read_source(source), output
+
+    client = TTSClient(args.voice, max_retries=args.max_retries, checkpoint_dir=args.checkpoint_dir)
+    try:
+        async for result in client.map(
+            items(),
+            workers=args.workers,
+            skip_existing=False,
+            enable_chunking=True,
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            **params
+        ):
+            source, output, digest, chars = jobs[result.index]
+            if result.ok:
+                manifest.record(source, output, digest, result.audio_bytes)
+            else:
+                if not args.quiet:
+                    sys.stderr.write("\n")
+                logger.error("转换失败 %s: %s", source, result.error)
+            progress.update(chars, synthesized=result.ok, failed=not result.ok)
+    finally:
+        progress.close()
+        manifest.close()
+    return 1 if progress.failed else 0
+
+
+async def _read_stdin_segments(chunk_size: int, first_chunk_size: int = 0):
+    """从标准输入逐行读取，按空行或长度把文本聚合成段，首段可以更短以便尽快输出音频"""
+    loop = asyncio.get_running_loop()
+    if first_chunk_size > 0:
+        sizes = SegmentRamp(first_chunk_size, max_chunk_size=chunk_size).sizes()
+    else:
+        sizes = iter(lambda: chunk_size, None)
+    target = next(sizes)
+    buffer: List[str] = []
+    size = 0
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        if line.strip():
+            buffer.append(line.strip())
+            size += len(line)
+        if buffer and (not line.strip() or size >= target):
+            yield "\n".join(buffer)
+            buffer, size = [], 0
+            target = next(sizes)
+    if buffer:
+        yield "\n".join(buffer)
+
+
+async def convert_stdin(args: argparse.Namespace) -> int:
+    client = TTSClient(args.voice, max_retries=args.max_retries)
+    out = sys.stdout.buffer
+    try:
+        async for audio in client.stream_segments(
+            _read_stdin_segments(args.chunk_size, args.first_chunk_size),
+            rate=args.rate,
+            volume=args.volume,
+            pitch=args.pitch,
+            concurrency=args.concurrency
+        ):
+            out.write(audio)
+            out.flush()
+    except BrokenPipeError:
+        # 下游提前退出（如 | head），不算错误
+        return 0
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING), stream=sys.stderr)
+    if args.inputs == ["-"]:
+        return asyncio.run(convert_stdin(args))
+    if "-" in args.inputs:
+        build_parser().error("标准输入 - 不能与文件一起使用")
+    try:
+        return asyncio.run(convert_files(args))
+    except KeyboardInterrupt:
+        sys.stderr.write("\n已中断，重新运行同一命令即可从清单继续\n")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
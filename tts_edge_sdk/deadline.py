@@ -0,0 +1,121 @@
+"""
+请求截止时间传递
+
+调用方（例如IVR提示音）往往有硬性的截止时间，超过后结果已经没有用处。截止时间以
+time.monotonic() 的绝对值写入上下文，随asyncio任务传递给各文本段：
+
+- 每次分发文本段和每次重试前检查剩余预算，预计来不及完成时立即失败，不再发出上游调用
+- 上游建连和合成的超时取剩余预算与自身超时中较小的一个
+- 到达截止时间时取消整个请求，抛出 DeadlineExceeded
+
+嵌套设置时取较早的截止时间，内层代码无法延长外层的预算。
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("tts_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求无法在截止时间前完成"""
+
+    def __init__(self, stage: str, remaining: Optional[float] = None, needed: Optional[float] = None):
+        """
+        Args:
+            stage: 发现超时的阶段，如 dispatch、retry、upstream
+            remaining: 当时剩余的预算秒数
+            needed: 预计还需要的秒数，预测来不及完成时提供
+        """
+        self.stage = stage
+        self.remaining = remaining
+        self.needed = needed
+        if needed is not None and remaining is not None and remaining > 0:
+            message = f"请求在{stage}阶段剩余 {remaining:.3f} 秒，预计需要 {needed:.3f} 秒，无法在截止时间前完成"
+        else:
+            message = f"请求在{stage}阶段超出截止时间"
+        super().__init__(message)
+
+
+def current_deadline() -> Optional[float]:
+    """当前上下文的截止时间（time.monotonic() 值），没有时返回None"""
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """距离截止时间的剩余秒数，可能为负；没有截止时间时返回None"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_context(timeout: Optional[float] = None, deadline: Optional[float] = None) -> Iterator[None]:
+    """
+    在代码块内设置截止时间，已有更早的截止时间时保持不变
+
+    Args:
+        timeout: 从现在起的预算秒数
+        deadline: 绝对截止时间（time.monotonic() 值），与timeout同时给出时取较早者
+    """
+    candidates = [value for value in (
+        _current_deadline.get(),
+        deadline,
+        time.monotonic() + timeout if timeout is not None else None,
+    ) if value is not None]
+    token = _current_deadline.set(min(candidates) if candidates else None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """在代码块内清除截止时间，用于创建由多个请求共享、不应受某一个请求预算限制的任务"""
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def check(stage: str, needed: float = 0.0) -> None:
+    """剩余预算不足needed秒时抛出DeadlineExceeded，没有截止时间时不做检查"""
+    left = remaining()
+    if left is None:
+        return
+    if left <= 0:
+        raise DeadlineExceeded(stage, left)
+    if needed > left:
+        raise DeadlineExceeded(stage, left, needed)
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """把超时时间限制在剩余预算之内"""
+    left = remaining()
+    if left is None:
+        return timeout
+    left = max(0.0, left)
+    return left if timeout is None else min(timeout, left)
+
+
+async def wait_for(awaitable: Awaitable[T], stage: str) -> T:
+    """在剩余预算内等待awaitable完成，超时时取消它并抛出DeadlineExceeded"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage, left)
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage, remaining()) from None
@@ -0,0 +1,154 @@
+"""
+事件通知系统 - 通知外部监听器SDK内部事件
+
+每个TTSClient拥有独立的EventEmitter，注册监听器会返回Subscription句柄，
+可以显式取消订阅或作为上下文管理器使用。异步监听器以后台任务方式调度，
+不会阻塞合成流程。
+
+SDK发出的事件：
+    merge_start(segments_count)
+    merge_end(duration, success, output_size=0)
+    chunk_start(request_id, index, chars)
+    chunk_end(request_id, index, audio_bytes, elapsed)
+    retry(request_id, index, attempt, error)
+    cache_hit(request_id, key)
+"""
+
+import asyncio
+import inspect
+import logging
+from typing import Callable, Dict, Set, Tuple
+
+logger = logging.getLogger("tts-sdk")
+
+# 单个事件默认最多保留的监听器数量
+DEFAULT_MAX_LISTENERS = 32
+
+
+class Subscription:
+    """事件订阅句柄"""
+
+    def __init__(self, emitter: "EventEmitter", event: str, callback: Callable):
+        self._emitter = emitter
+        self.event = event
+        self.callback = callback
+        self._active = True
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def unsubscribe(self) -> None:
+        """取消订阅，可重复调用"""
+        if self._active:
+            self._active = False
+            self._emitter._remove(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.unsubscribe()
+
+
+class EventEmitter:
+    """简单的事件发射器，用于通知外部监听器SDK内部事件"""
+
+    def __init__(self, max_listeners: int = DEFAULT_MAX_LISTENERS):
+        """
+        Args:
+            max_listeners: 单个事件最多保留的监听器数量，超出时丢弃最早注册的监听器
+        """
+        self.max_listeners = max_listeners
+        # 使用元组保存监听器，emit时无需复制列表
+        self._listeners: Dict[str, Tuple[Subscription, ...]] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    def on(self, event: str, callback: Callable) -> Subscription:
+        """注册事件监听器，返回可用于取消订阅的句柄"""
+        subscription = Subscription(self, event, callback)
+        listeners = self._listeners.get(event, ())
+        if self.max_listeners and len(listeners) >= self.max_listeners:
+            dropped = listeners[0]
+            dropped._active = False
+            listeners = listeners[1:]
+            logger.warning(
+                "事件 %s 的监听器数量超过上限 %d，已移除最早注册的监听器，请检查是否忘记取消订阅",
+                event, self.max_listeners
+            )
+        self._listeners[event] = listeners + (subscription,)
+        return subscription
+
+    def once(self, event: str, callback: Callable) -> Subscription:
+        """注册只触发一次的监听器"""
+        subscription = None
+
+        def wrapper(*args, **kwargs):
+            subscription.unsubscribe()
+            return callback(*args, **kwargs)
+
+        subscription = self.on(event, wrapper)
+        return subscription
+
+    def off(self, event: str, callback: Callable) -> bool:
+        """按回调函数取消订阅，返回是否找到该监听器"""
+        for subscription in self._listeners.get(event, ()):
+            if subscription.callback == callback:
+                subscription.unsubscribe()
+                return True
+        return False
+
+    def _remove(self, subscription: Subscription) -> None:
+        listeners = tuple(s for s in self._listeners.get(subscription.event, ()) if s is not subscription)
+        if listeners:
+            self._listeners[subscription.event] = listeners
+        else:
+            self._listeners.pop(subscription.event, None)
+
+    def remove_all_listeners(self, event: str = None) -> None:
+        """移除指定事件（不指定则为全部事件）的监听器"""
+        events = [event] if event is not None else list(self._listeners)
+        for name in events:
+            for subscription in self._listeners.pop(name, ()):
+                subscription._active = False
+
+    def listener_count(self, event: str) -> int:
+        return len(self._listeners.get(event, ()))
+
+    def has_listeners(self, event: str) -> bool:
+        return event in self._listeners
+
+    def emit(self, event: str, *args, **kwargs) -> None:
+        """触发事件，同步监听器直接调用，异步监听器在后台任务中执行"""
+        listeners = self._listeners.get(event)
+        if not listeners:
+            return
+        for subscription in listeners:
+            try:
+                result = subscription.callback(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    self._schedule(event, result)
+            except Exception as e:
+                logger.error("事件回调执行错误: %s", e)
+
+    def _schedule(self, event: str, awaitable) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("事件 %s 的异步监听器需要在事件循环中触发，已忽略", event)
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+            return
+        task = loop.create_task(awaitable)
+        self._pending.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("异步事件回调执行错误: %s", task.exception())
+
+    async def drain(self) -> None:
+        """等待所有已调度的异步监听器执行完毕"""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
@@ -0,0 +1,243 @@
+"""
+健康检查与就绪检查
+
+存活检查只说明进程还能响应；就绪检查回答"现在还应不应该把流量发到这个实例"：
+
+- 排队深度：等待并发槽位和上游槽位的文本段数
+- 正在进行的上游调用数
+- 事件循环延迟：定时sleep实际醒来比预期晚了多少，反映CPU饱和或阻塞调用
+- 上游探测：后台定期合成一小段文本，记录结果和耗时，就绪检查只读取最近一次的结果
+- 熔断器状态
+
+任一指标超过阈值即为未就绪，负载均衡据此把流量从饱和或上游异常的实例上移走。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .breaker import STATE_OPEN
+from .metrics import MetricsRegistry, default_registry
+
+logger = logging.getLogger("tts-sdk")
+
+
+class EventLoopMonitor:
+    """定时测量事件循环延迟"""
+
+    def __init__(self, interval: float = 0.5, samples: int = 10, metrics_registry: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            interval: 测量间隔秒数
+            samples: lag 取最近这么多次测量的最大值
+            metrics_registry: 指标注册表
+        """
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=max(1, samples))
+        self._task: Optional[asyncio.Task] = None
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._lag_gauge = registry.gauge("tts_event_loop_lag_seconds", "事件循环定时器比预期晚醒来的秒数")
+
+    @property
+    def lag(self) -> float:
+        """最近若干次测量中的最大延迟"""
+        return max(self._samples) if self._samples else 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._samples.append(lag)
+            self._lag_gauge.set(lag)
+
+
+class UpstreamProbe:
+    """后台定期探测上游，缓存最近一次结果"""
+
+    def __init__(
+        self,
+        client: Any,
+        interval: float = 30.0,
+        timeout: float = 10.0,
+        text: str = "你好",
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            client: TTSClient，使用其 probe 方法直接调用上游
+            interval: 探测间隔秒数
+            timeout: 单次探测的超时秒数
+            text: 探测合成的文本
+            metrics_registry: 指标注册表
+        """
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.text = text
+        self.ok: Optional[bool] = None
+        self.latency: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._latency_gauge = registry.gauge("tts_upstream_probe_seconds", "最近一次上游探测的耗时")
+        self._ok_gauge = registry.gauge("tts_upstream_probe_success", "最近一次上游探测是否成功，1为成功")
+
+    @property
+    def age(self) -> Optional[float]:
+        """距离最近一次探测完成的秒数，还没有探测过时为None"""
+        return time.monotonic() - self.checked_at if self.checked_at is not None else None
+
+    async def run_once(self) -> bool:
+        """执行一次探测并记录结果"""
+        try:
+            self.latency = await self.client.probe(self.text, timeout=self.timeout)
+            self.ok = True
+            self.error = None
+            self._latency_gauge.set(self.latency)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.ok = False
+            self.error = str(e) or type(e).__name__
+            logger.warning("上游探测失败: %s", self.error)
+        self.checked_at = time.monotonic()
+        self._ok_gauge.set(1 if self.ok else 0)
+        return self.ok
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+
+class HealthMonitor:
+    """汇总各项指标判断实例是否就绪"""
+
+    def __init__(
+        self,
+        client: Any,
+        probe: Optional[UpstreamProbe] = None,
+        loop_monitor: Optional[EventLoopMonitor] = None,
+        max_queue_depth: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        max_loop_lag: Optional[float] = 0.5,
+        max_probe_latency: Optional[float] = None,
+        max_probe_age: Optional[float] = None
+    ):
+        """
+        Args:
+            client: TTSClient
+            probe: 上游探测，不指定则不检查上游
+            loop_monitor: 事件循环延迟监测，不指定则不检查
+            max_queue_depth: 排队的文本段数上限，None表示不检查
+            max_inflight: 正在进行的上游调用数上限，None表示不检查
+            max_loop_lag: 事件循环延迟上限（秒），None表示不检查
+            max_probe_latency: 上游探测耗时上限（秒），None表示只检查成功与否
+            max_probe_age: 探测结果的最长有效期（秒），默认为3个探测间隔加一次探测超时
+        """
+        self.client = client
+        self.probe = probe
+        self.loop_monitor = loop_monitor
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight = max_inflight
+        self.max_loop_lag = max_loop_lag
+        self.max_probe_latency = max_probe_latency
+        if max_probe_age is None and probe is not None:
+            max_probe_age = probe.interval * 3 + probe.timeout
+        self.max_probe_age = max_probe_age
+
+    def start(self) -> None:
+        """启动后台测量，需要在事件循环中调用"""
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+        if self.probe is not None:
+            self.probe.start()
+
+    async def stop(self) -> None:
+        if self.loop_monitor is not None:
+            await self.loop_monitor.stop()
+        if self.probe is not None:
+            await self.probe.stop()
+
+    def queue_depth(self) -> int:
+        """等待分段并发槽位和上游槽位的文本段总数"""
+        depth = self.client.metrics.queue_depth.value()
+        if self.client.scheduler is not None:
+            depth += sum(self.client.scheduler.stats()["queued"].values())
+        return int(depth)
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        检查各项指标
+
+        Returns:
+            Dict[str, Any]: ready 为是否就绪，checks 为各项的当前值和阈值，failed 为未通过的项
+        """
+        checks: Dict[str, Dict[str, Any]] = {}
+        failed = []
+
+        def check(name: str, value: Any, limit: Any, ok: bool) -> None:
+            checks[name] = {"value": value, "limit": limit, "ok": ok}
+            if not ok:
+                failed.append(name)
+
+        depth = self.queue_depth()
+        check("queue_depth", depth, self.max_queue_depth,
+              self.max_queue_depth is None or depth <= self.max_queue_depth)
+        inflight = int(self.client.metrics.upstream_inflight.value())
+        check("upstream_inflight", inflight, self.max_inflight,
+              self.max_inflight is None or inflight <= self.max_inflight)
+        if self.loop_monitor is not None:
+            lag = round(self.loop_monitor.lag, 4)
+            check("event_loop_lag", lag, self.max_loop_lag, self.max_loop_lag is None or lag <= self.max_loop_lag)
+        if self.probe is not None:
+            age = self.probe.age
+            fresh = age is not None and (self.max_probe_age is None or age <= self.max_probe_age)
+            fast = self.max_probe_latency is None or (self.probe.latency or 0.0) <= self.max_probe_latency
+            checks["upstream_probe"] = {
+                "ok": bool(self.probe.ok) and fresh and fast,
+                "latency": round(self.probe.latency, 4) if self.probe.latency is not None else None,
+                "latency_limit": self.max_probe_latency,
+                "age": round(age, 1) if age is not None else None,
+                "error": self._probe_error(age, fresh),
+            }
+            if not checks["upstream_probe"]["ok"]:
+                failed.append("upstream_probe")
+        if self.client.breaker is not None:
+            stats = self.client.breaker.stats()
+            check("breaker", stats["state"], None, stats["state"] != STATE_OPEN)
+        return {"ready": not failed, "checks": checks, "failed": failed}
+
+    def _probe_error(self, age: Optional[float], fresh: bool) -> Optional[str]:
+        if age is None:
+            return "尚未完成首次探测"
+        if self.probe.ok is False:
+            return self.probe.error
+        if not fresh:
+            return "探测结果已过期"
+        return None
@@ -0,0 +1,201 @@
+"""
+日志配置工具 - 基于队列的非阻塞日志
+
+业务线程只把LogRecord放进内存队列，格式化和磁盘写入都在QueueListener的
+后台线程中完成；逐段日志（tts-sdk.chunk）可以按比例采样或限速，避免长文本
+在高并发下刷屏。
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import List, Optional
+
+# 逐段日志使用的logger名称，采样和限速只作用于它
+CHUNK_LOGGER_NAME = "tts-sdk.chunk"
+
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# 这些类型的参数在后台线程格式化时不会被调用方改动
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    日志采样与限速过滤器
+
+    Args:
+        sample_every: 每N条记录只保留1条，1表示不采样
+        max_per_second: 每秒最多输出的记录数，None表示不限速
+    """
+
+    def __init__(self, sample_every: int = 1, max_per_second: Optional[float] = None):
+        super().__init__()
+        self.sample_every = max(1, int(sample_every))
+        self.max_per_second = max_per_second
+        self._counter = 0
+        self._tokens = max_per_second or 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 警告及以上级别的逐段日志总是保留
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            self._counter += 1
+            if self._counter % self.sample_every != 0:
+                return False
+            if self.max_per_second is None:
+                return True
+            now = time.monotonic()
+            self._tokens = min(
+                self.max_per_second,
+                self._tokens + (now - self._last) * self.max_per_second
+            )
+            self._last = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    不在调用线程里格式化日志的QueueHandler
+
+    标准QueueHandler.prepare会先格式化消息以便跨进程传递；这里的队列只在
+    进程内使用，参数都是不可变类型时直接把原始记录交给后台线程。参数中有列表、
+    字典等可变对象，或者带有异常信息时，在调用线程里先生成消息和异常文本，
+    避免调用方在后台线程格式化之前改动参数或异常已被处理。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not record.exc_info and _all_immutable(record.args):
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _all_immutable(args) -> bool:
+    if not args:
+        return True
+    if isinstance(args, dict):
+        args = args.values()
+    for arg in args:
+        if isinstance(arg, tuple):
+            if not _all_immutable(arg):
+                return False
+        elif not isinstance(arg, _IMMUTABLE_ARGS):
+            return False
+    return True
+
+
+def configure_chunk_log_sampling(sample_every: int = 1, max_per_second: Optional[float] = None) -> None:
+    """为逐段日志设置采样比例和限速"""
+    chunk_logger = logging.getLogger(CHUNK_LOGGER_NAME)
+    for existing in [f for f in chunk_logger.filters if isinstance(f, SamplingFilter)]:
+        chunk_logger.removeFilter(existing)
+    if sample_every > 1 or max_per_second is not None:
+        chunk_logger.addFilter(SamplingFilter(sample_every, max_per_second))
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    log_file: Optional[str] = None,
+    json_format: bool = False,
+    chunk_log_sample: int = 1,
+    chunk_log_rate: Optional[float] = None,
+    fmt: str = DEFAULT_FORMAT
+) -> logging.handlers.QueueListener:
+    """
+    配置根logger使用队列异步输出日志
+
+    Args:
+        level: 日志级别
+        log_file: 日志文件路径，不指定则只输出到控制台
+        json_format: 是否输出JSON格式日志
+        chunk_log_sample: 逐段日志每N条保留1条
+        chunk_log_rate: 逐段日志每秒最多输出条数
+        fmt: 文本格式日志的格式字符串
+
+    Returns:
+        QueueListener: 后台日志线程，进程退出时会自动停止
+    """
+    global _listener, _queue_handler
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(fmt)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    with _lock:
+        root = logging.getLogger()
+        if _listener is not None:
+            _listener.stop()
+            root.removeHandler(_queue_handler)
+            _close_handlers(_listener)
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _queue_handler = _LazyQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+        _listener.start()
+
+    configure_chunk_log_sampling(chunk_log_sample, chunk_log_rate)
+    return _listener
+
+
+def _close_handlers(listener: logging.handlers.QueueListener) -> None:
+    """关闭已停止的后台线程使用的handler，释放日志文件"""
+    for handler in listener.handlers:
+        handler.close()
+
+
+def shutdown_logging() -> None:
+    """停止后台日志线程并刷新剩余日志"""
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger().removeHandler(_queue_handler)
+            _close_handlers(_listener)
+            _listener = None
+            _queue_handler = None
+
+
+atexit.register(shutdown_logging)
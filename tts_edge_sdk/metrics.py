@@ -0,0 +1,296 @@
+"""
+轻量级指标模块 - 输出Prometheus文本格式
+
+不依赖prometheus_client，SDK内部的所有埋点都写入MetricsRegistry，
+API服务通过 /metrics 暴露，单独使用SDK时也可以传入自己的注册表后自行导出。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认延迟桶（秒），覆盖从首字节到长文本整段合成的范围
+DEFAULT_LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+
+def _escape_label_value(value: str) -> str:
+    """按照Prometheus文本格式转义标签值"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return f"{int(value)}.0"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = [f'{n}="{_escape_label_value(str(v))}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    """指标基类，按标签值组合保存样本"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labelnames:
+            # 无标签指标从0开始导出，避免出现空序列
+            self._values[()] = 0.0
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"指标 {self.name} 不支持的标签: {sorted(unknown)}")
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def value(self, **labels: str) -> float:
+        """读取当前值（主要用于测试和健康检查）"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """返回 (样本名, 标签名, 标签值, 数值) 列表"""
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self.labelnames, key, value) for key, value in items]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """在代码块执行期间将值加一"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        # 每个标签组合: [各桶计数..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        if not self.labelnames:
+            self._series[()] = [0.0] * (len(self.buckets) + 2)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """统计代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> float:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0.0
+
+    def sum(self, **labels: str) -> float:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-2] if series else 0.0
+
+    def value(self, **labels: str) -> float:
+        return self.count(**labels)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        result = []
+        for key, series in items:
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                result.append((
+                    f"{self.name}_bucket",
+                    self.labelnames + ("le",),
+                    key + (_format_value(bound),),
+                    cumulative
+                ))
+            result.append((f"{self.name}_sum", self.labelnames, key, series[-2]))
+            result.append((f"{self.name}_count", self.labelnames, key, series[-1]))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次，可被多个客户端共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同的类型或标签注册")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def register_collector(self, callback: Callable[[], None]) -> None:
+        """注册采集回调，在每次collect/render之前调用，用于刷新按需计算的gauge"""
+        with self._lock:
+            self._collectors.append(callback)
+
+    def collect(self) -> List[_Metric]:
+        """返回所有指标对象，可用于桥接到其他监控系统"""
+        with self._lock:
+            collectors = list(self._collectors)
+        for callback in collectors:
+            callback()
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """渲染为Prometheus文本格式（0.0.4）"""
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample_name, names, values, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认注册表，未显式传入注册表的客户端共享它
+default_registry = MetricsRegistry()
+
+
+class TTSMetrics:
+    """SDK内部使用的指标集合"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry if registry is not None else default_registry
+        r = self.registry
+        self.request_latency = r.histogram(
+            "tts_request_duration_seconds", "文字转语音请求总耗时", ["mode"]
+        )
+        self.priority_latency = r.histogram(
+            "tts_request_priority_duration_seconds", "按优先级统计的请求总耗时", ["priority"]
+        )
+        self.upstream_latency = r.histogram(
+            "tts_upstream_chunk_duration_seconds", "单个文本段上游合成耗时"
+        )
+        self.upstream_ttfb = r.histogram(
+            "tts_upstream_ttfb_seconds", "上游合成首个音频字节到达耗时"
+        )
+        self.chunks = r.counter("tts_chunks_total", "完成合成的文本段数")
+        self.retries = r.counter("tts_retries_total", "上游合成重试次数")
+        self.cache_hits = r.counter("tts_cache_hits_total", "音频缓存命中次数")
+        self.cache_misses = r.counter("tts_cache_misses_total", "音频缓存未命中次数")
+        self.audio_bytes = r.counter("tts_audio_bytes_total", "生成的音频字节数")
+        self.errors = r.counter("tts_errors_total", "按异常类型统计的错误数", ["type"])
+        self.upstream_inflight = r.gauge("tts_upstream_inflight", "正在进行的上游合成调用数")
+        self.queue_depth = r.gauge("tts_queue_depth", "等待并发槽位的文本段数")
+        self.first_audio = r.histogram(
+            "tts_stream_first_audio_seconds", "流式请求开始到第一段音频可以输出的耗时"
+        )
+        self.stream_segments = r.histogram(
+            "tts_stream_segments", "流式请求切分的段数", buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+        )
+        self.script_lines = r.histogram(
+            "tts_script_lines", "多角色脚本请求的台词数", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+        )
+        self.checkpoint_restored = r.counter("tts_checkpoint_segments_restored_total", "从磁盘检查点恢复、无需重新合成的文本段数")
+        self.cancelled_requests = r.counter("tts_cancelled_requests_total", "合成完成前被取消的请求数", ["mode"])
+        self.cancelled_chunks = r.counter("tts_cancelled_chunks_total", "合成完成前被取消的文本段数")
+        self.deadline_exceeded = r.counter("tts_deadline_exceeded_total", "无法在截止时间前完成的请求数", ["stage"])
@@ -0,0 +1,359 @@
+"""
+MP3帧级工具
+
+Edge返回的是无标签的CBR MPEG Layer III数据（默认 24kHz/48kbps/单声道），
+各段音频按帧拼接即可得到合法的文件，不需要重新编码。这里提供：
+
+- 帧头解析与逐帧遍历（只处理Layer III）
+- 去掉ID3v2标签和Xing/Info帧，得到可以直接拼接的纯音频帧
+- 生成Xing/Info帧，写在文件开头供播放器读取总帧数和时长
+- audio_info：只读帧头（有Xing/VBRI头时直接读取）得到精确的时长、帧数和码率，不需要解码
+- Mp3StreamWriter：按顺序把各段音频追加到磁盘，结束时回填头部
+"""
+
+import asyncio
+import functools
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple, Union
+
+# [MPEG-1, MPEG-2/2.5] 的Layer III码率表（kbps）
+_BITRATES = (
+    (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+)
+# 版本位 -> 采样率表
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+XING_FLAG_FRAMES = 0x1
+XING_FLAG_BYTES = 0x2
+
+
+class FrameHeader(NamedTuple):
+    """MPEG Layer III帧头"""
+    version: int          # 3=MPEG-1, 2=MPEG-2, 0=MPEG-2.5
+    bitrate: int          # bit/s
+    sample_rate: int
+    padding: int
+    channel_mode: int     # 3为单声道
+    frame_length: int
+    raw: bytes
+
+    @property
+    def samples(self) -> int:
+        return 1152 if self.version == 3 else 576
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+    @property
+    def side_info_length(self) -> int:
+        mono = self.channel_mode == 3
+        if self.version == 3:
+            return 17 if mono else 32
+        return 9 if mono else 17
+
+
+def parse_frame_header(data: bytes, offset: int = 0) -> Optional[FrameHeader]:
+    """解析offset处的帧头，不是合法的Layer III帧头时返回None"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x3
+    layer = (b1 >> 1) & 0x3
+    bitrate_index = (b2 >> 4) & 0xF
+    sample_rate_index = (b2 >> 2) & 0x3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = _BITRATES[0 if version == 3 else 1][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x1
+    coefficient = 144 if version == 3 else 72
+    frame_length = coefficient * bitrate // sample_rate + padding
+    return FrameHeader(version, bitrate, sample_rate, padding, (b3 >> 6) & 0x3, frame_length,
+                       bytes(data[offset:offset + 4]))
+
+
+def id3v2_size(data: bytes) -> int:
+    """返回开头ID3v2标签的总长度，没有标签时返回0"""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def is_xing_frame(data: bytes, offset: int, header: FrameHeader) -> bool:
+    tag_offset = offset + 4 + header.side_info_length
+    return data[tag_offset:tag_offset + 4] in (b"Xing", b"Info") or data[offset + 36:offset + 40] == b"VBRI"
+
+
+def iter_frames(data: bytes) -> Iterator[Tuple[int, FrameHeader]]:
+    """逐帧遍历音频数据，跳过开头的ID3v2标签和帧之间的无效字节"""
+    offset = id3v2_size(data)
+    length = len(data)
+    while offset + 4 <= length:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header.frame_length > length:
+            if header is not None:
+                # 末尾不完整的帧
+                break
+            offset += 1
+            continue
+        yield offset, header
+        offset += header.frame_length
+
+
+def audio_frames(data: bytes) -> Tuple[bytes, Optional[FrameHeader], int]:
+    """
+    提取可直接拼接的音频帧
+
+    Returns:
+        Tuple[bytes, Optional[FrameHeader], int]: (去掉标签和Xing帧后的帧数据, 第一个音频帧的帧头, 帧数)
+    """
+    first: Optional[FrameHeader] = None
+    count = 0
+    start = end = None
+    pieces = []
+    for offset, header in iter_frames(data):
+        if count == 0 and first is None and is_xing_frame(data, offset, header):
+            continue
+        if first is None:
+            first = header
+        if end is not None and offset != end:
+            # 帧之间有无效字节，分段收集
+            pieces.append(data[start:end])
+            start = None
+        if start is None:
+            start = offset
+        end = offset + header.frame_length
+        count += 1
+    if start is not None:
+        pieces.append(data[start:end])
+    if len(pieces) == 1 and start == 0 and end == len(data):
+        return data, first, count
+    return b"".join(pieces), first, count
+
+
+class AudioInfo(NamedTuple):
+    """从帧头得到的音频信息"""
+    duration: float       # 秒
+    frames: int           # 音频帧数，不含Xing/Info帧
+    bitrate: int          # 平均码率，bit/s
+    sample_rate: int
+    channels: int
+    vbr: bool             # 各帧码率是否不同
+    audio_bytes: int      # 音频帧的总字节数
+    source: str           # frames: 逐帧扫描；xing / vbri: 读取头部帧中的总帧数
+
+
+def _read_vbr_header(data: memoryview, offset: int, header: FrameHeader) -> Optional[Tuple[str, bool, int, Optional[int]]]:
+    """读取Xing/Info或VBRI头中的 (类型, 是否可变码率, 帧数, 字节数)，没有总帧数时返回None"""
+    tag_offset = offset + 4 + header.side_info_length
+    tag = bytes(data[tag_offset:tag_offset + 4])
+    if tag in (b"Xing", b"Info") and tag_offset + 8 <= len(data):
+        flags = struct.unpack(">I", data[tag_offset + 4:tag_offset + 8])[0]
+        position = tag_offset + 8
+        frames = audio_bytes = None
+        if flags & XING_FLAG_FRAMES and position + 4 <= len(data):
+            frames = struct.unpack(">I", data[position:position + 4])[0]
+            position += 4
+        if flags & XING_FLAG_BYTES and position + 4 <= len(data):
+            audio_bytes = struct.unpack(">I", data[position:position + 4])[0]
+        return ("xing", tag == b"Xing", frames, audio_bytes) if frames else None
+    if bytes(data[offset + 36:offset + 40]) == b"VBRI" and offset + 54 <= len(data):
+        # VBRI: 标记(4) 版本(2) 延迟(2) 质量(2) 字节数(4) 帧数(4)
+        audio_bytes, frames = struct.unpack(">II", data[offset + 46:offset + 54])
+        return ("vbri", True, frames, audio_bytes) if frames else None
+    return None
+
+
+def audio_info(data: Union[bytes, bytearray, memoryview, mmap.mmap], use_vbr_header: bool = True) -> Optional[AudioInfo]:
+    """
+    计算MP3音频的精确时长、帧数和码率，只读取帧头，不解码
+
+    开头有带总帧数的Xing/Info或VBRI头时直接使用其中的帧数（use_vbr_header=False时忽略），
+    否则在memoryview上逐帧扫描一遍，同一种帧头只解析一次。
+
+    Returns:
+        Optional[AudioInfo]: 音频信息，没有任何有效帧时返回None
+    """
+    view = memoryview(data)
+    length = len(view)
+    offset = id3v2_size(view)
+    first: Optional[FrameHeader] = None
+    # 找到第一个有效帧
+    while offset + 4 <= length:
+        first = parse_frame_header(view, offset)
+        if first is not None and offset + first.frame_length <= length:
+            break
+        first = None
+        offset += 1
+    if first is None:
+        return None
+    channels = 1 if first.channel_mode == 3 else 2
+    if is_xing_frame(view, offset, first):
+        vbr_header = _read_vbr_header(view, offset, first) if use_vbr_header else None
+        if vbr_header is not None:
+            source, vbr, frames, audio_bytes = vbr_header
+            # 头部记录的字节数按惯例包含头部帧本身
+            audio_bytes = (audio_bytes or length - offset) - first.frame_length
+            duration = frames * first.duration
+            return AudioInfo(duration, frames, round(audio_bytes * 8 / duration), first.sample_rate, channels,
+                             vbr, audio_bytes, source)
+        offset += first.frame_length
+
+    # 帧头后三个字节相同的帧，帧长和时长也相同，每种帧头只解析一次
+    cache: Dict[int, FrameHeader] = {}
+    frames = 0
+    samples = 0
+    audio_bytes = 0
+    bitrates = set()
+    while offset + 4 <= length:
+        if view[offset] != 0xFF:
+            offset += 1
+            continue
+        key = view[offset + 1] << 16 | view[offset + 2] << 8 | view[offset + 3]
+        header = cache.get(key)
+        if header is None:
+            header = parse_frame_header(view, offset)
+            if header is None:
+                offset += 1
+                continue
+            cache[key] = header
+        if offset + header.frame_length > length:
+            # 末尾不完整的帧
+            break
+        frames += 1
+        samples += header.samples
+        audio_bytes += header.frame_length
+        bitrates.add(header.bitrate)
+        offset += header.frame_length
+    if not frames:
+        return None
+    duration = samples / first.sample_rate
+    return AudioInfo(duration, frames, round(audio_bytes * 8 / duration), first.sample_rate, channels,
+                     len(bitrates) > 1, audio_bytes, "frames")
+
+
+def audio_info_file(path: str, use_vbr_header: bool = True) -> Optional[AudioInfo]:
+    """读取MP3文件的时长、帧数和码率，通过mmap扫描，不把文件读入内存"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return audio_info(view, use_vbr_header)
+            finally:
+                view.release()
+
+
+def build_info_frame(header: FrameHeader, frames: int, audio_bytes: int, vbr: bool = False) -> bytes:
+    """
+    生成与header格式相同的Xing/Info帧
+
+    Args:
+        header: 音频帧的帧头，Info帧使用相同的版本、采样率和码率
+        frames: 音频帧数（不含Info帧本身）
+        audio_bytes: 文件总字节数（含Info帧）
+        vbr: 可变码率时使用Xing标记，否则使用Info标记
+    """
+    raw = bytearray(header.raw)
+    raw[2] &= 0xFD  # 清除padding位，帧长保持固定
+    frame_length = header.frame_length - header.padding
+    frame = bytearray(frame_length)
+    frame[:4] = raw
+    tag_offset = 4 + header.side_info_length
+    payload = (b"Xing" if vbr else b"Info") + struct.pack(">III", XING_FLAG_FRAMES | XING_FLAG_BYTES, frames, audio_bytes)
+    frame[tag_offset:tag_offset + len(payload)] = payload
+    return bytes(frame)
+
+
+class Mp3StreamWriter:
+    """
+    把按顺序到达的MP3分段流式写入文件
+
+    数据先写入同目录的临时文件，文件I/O在线程池中执行不阻塞事件循环；
+    开头预留一个Info帧，close时回填总帧数和字节数，再原子地替换目标文件。
+    内存中只保留当前正在写入的一段。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = 0
+        self.bytes_written = 0
+        self.segments = 0
+        self._header: Optional[FrameHeader] = None
+        self._vbr = False
+        self._file = None
+        self._temp_path: Optional[str] = None
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    def _open(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    async def write(self, data: bytes) -> None:
+        """追加一段音频，自动去掉该段自带的标签和Xing帧"""
+        frames, header, count = audio_frames(data)
+        if header is None:
+            return
+        if self._file is None:
+            await self._call(self._open)
+            self._header = header
+            # 预留Info帧的位置，close时回填
+            placeholder = build_info_frame(header, 0, 0)
+            await self._call(self._file.write, placeholder)
+            self.bytes_written += len(placeholder)
+        elif header.bitrate != self._header.bitrate:
+            self._vbr = True
+        await self._call(self._file.write, frames)
+        self.frames += count
+        self.bytes_written += len(frames)
+        self.segments += 1
+
+    def _finish(self) -> None:
+        self._file.seek(0)
+        self._file.write(build_info_frame(self._header, self.frames, self.bytes_written, self._vbr))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    async def close(self) -> int:
+        """回填头部并把临时文件替换为目标文件，返回文件大小；没有写入任何音频时抛出异常"""
+        if self._file is None:
+            raise RuntimeError("没有写入任何有效的音频数据")
+        await self._call(self._finish)
+        self._file = None
+        return self.bytes_written
+
+    def _discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path and os.path.exists(self._temp_path):
+            os.unlink(self._temp_path)
+
+    async def abort(self) -> None:
+        """放弃写入并删除临时文件，目标文件保持不变"""
+        await self._call(self._discard)
+
+    @property
+    def duration(self) -> float:
+        return self.frames * self._header.duration if self._header else 0.0
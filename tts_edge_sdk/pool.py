@@ -0,0 +1,445 @@
+"""
+上游WebSocket连接池
+
+edge_tts.Communicate 每个文本段都会新建一条TLS WebSocket。Edge朗读服务允许
+在同一条连接上顺序发送多轮 speech.config + ssml 请求（每轮以 turn.end 结束），
+因此这里按相同的帧格式自行实现请求，把连接保温后在文本段和请求之间复用。
+
+- 池大小上限同时也是上游并发上限
+- 空闲连接在复用前做健康检查，空闲过久的直接关闭
+- 握手耗时与合成耗时分别记录，便于判断连接复用的收益
+"""
+
+import asyncio
+import json
+import logging
+import re
+import ssl
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, Optional
+from xml.sax.saxutils import escape
+
+import aiohttp
+
+from . import tracing
+from .metrics import MetricsRegistry, default_registry
+
+logger = logging.getLogger("tts-sdk")
+
+try:
+    from edge_tts.constants import WSS_URL as DEFAULT_WSS_URL
+except ImportError:  # pragma: no cover - edge_tts是必需依赖，这里只是兜底
+    DEFAULT_WSS_URL = (
+        "wss://speech.platform.bing.com/consumer/speech/synthesize/"
+        "readaloud/edge/v1?TrustedClientToken=6A5AA1D4EAFF4E9FB37E23D68491D6F4"
+    )
+
+# 与Edge浏览器一致的请求头
+_WS_HEADERS = {
+    "Pragma": "no-cache",
+    "Cache-Control": "no-cache",
+    "Origin": "chrome-extension://jdiccldimpdaibmpdkjnbmckianbfold",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    " (KHTML, like Gecko) Chrome/91.0.4472.77 Safari/537.36 Edg/91.0.864.41",
+}
+
+# 单条WebSocket消息的上限，超出的文本按字节切分成多轮请求
+_MAX_MESSAGE_BYTES = 2 ** 16 - 1024
+
+
+class UpstreamError(Exception):
+    """上游服务返回了无法识别或不完整的响应"""
+
+
+def _connect_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _date_to_string() -> str:
+    return time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+
+
+def normalize_voice(voice: str) -> str:
+    """把 zh-CN-XiaoxiaoNeural 形式的语音名转换为服务端使用的完整名称"""
+    match = re.match(r"^([a-z]{2,})-([A-Z]{2,})-(.+Neural)$", voice)
+    if match is not None:
+        lang, region, name = match.group(1), match.group(2), match.group(3)
+        if "-" in name:
+            region = region + "-" + name[:name.find("-")]
+            name = name[name.find("-") + 1:]
+        voice = f"Microsoft Server Speech Text to Speech Voice ({lang}-{region}, {name})"
+    if re.match(r"^Microsoft Server Speech Text to Speech Voice \(.+,.+\)$", voice) is None:
+        raise ValueError(f"Invalid voice '{voice}'.")
+    return voice
+
+
+def _validate_prosody(rate: str, volume: str, pitch: str) -> None:
+    if re.match(r"^[+-]\d+%$", rate) is None:
+        raise ValueError(f"Invalid rate '{rate}'.")
+    if re.match(r"^[+-]\d+%$", volume) is None:
+        raise ValueError(f"Invalid volume '{volume}'.")
+    if re.match(r"^[+-]\d+Hz$", pitch) is None:
+        raise ValueError(f"Invalid pitch '{pitch}'.")
+
+
+def _clean_text(text: str) -> str:
+    """替换服务端不支持的控制字符（常见于OCR得到的文本）"""
+    return "".join(
+        " " if (0 <= ord(c) <= 8 or 11 <= ord(c) <= 12 or 14 <= ord(c) <= 31) else c
+        for c in text
+    )
+
+
+def _split_by_bytes(text: str, max_bytes: int):
+    """按UTF-8字节长度切分已转义的文本，尽量在空格处断开且不拆开XML实体"""
+    data = text.encode("utf-8")
+    while len(data) > max_bytes:
+        split_at = data.rfind(b" ", 0, max_bytes)
+        if split_at <= 0:
+            split_at = max_bytes
+            # 不切断多字节字符
+            while split_at > 0 and (data[split_at] & 0xC0) == 0x80:
+                split_at -= 1
+        amp = data.rfind(b"&", 0, split_at)
+        if amp != -1 and data.find(b";", amp, split_at) == -1:
+            split_at = amp
+        part = data[:split_at].strip()
+        if part:
+            yield part.decode("utf-8")
+        data = data[max(split_at, 1):]
+    part = data.strip()
+    if part:
+        yield part.decode("utf-8")
+
+
+def build_ssml(text: str, voice: str, rate: str, volume: str, pitch: str) -> str:
+    return (
+        "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+        f"<voice name='{voice}'><prosody pitch='{pitch}' rate='{rate}' volume='{volume}'>"
+        f"{text}</prosody></voice></speak>"
+    )
+
+
+def speech_config_message() -> str:
+    return (
+        f"X-Timestamp:{_date_to_string()}\r\n"
+        "Content-Type:application/json; charset=utf-8\r\n"
+        "Path:speech.config\r\n\r\n"
+        '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+        '"sentenceBoundaryEnabled":false,"wordBoundaryEnabled":true},'
+        '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"'
+        "}}}}\r\n"
+    )
+
+
+def ssml_message(request_id: str, ssml: str) -> str:
+    return (
+        f"X-RequestId:{request_id}\r\n"
+        "Content-Type:application/ssml+xml\r\n"
+        f"X-Timestamp:{_date_to_string()}Z\r\n"
+        "Path:ssml\r\n\r\n"
+        f"{ssml}"
+    )
+
+
+def parse_headers(data: bytes) -> Dict[bytes, bytes]:
+    headers = {}
+    for line in data.split(b"\r\n"):
+        if b":" in line:
+            key, value = line.split(b":", 1)
+            headers[key] = value
+    return headers
+
+
+class UpstreamConnection:
+    """一条可复用的上游WebSocket连接"""
+
+    def __init__(self, ws: aiohttp.ClientWebSocketResponse, handshake_time: float):
+        self.ws = ws
+        self.handshake_time = handshake_time
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.turns = 0
+        self.broken = False
+        self._configured = False
+
+    @property
+    def closed(self) -> bool:
+        return self.broken or self.ws.closed
+
+    async def close(self) -> None:
+        self.broken = True
+        if not self.ws.closed:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+
+    async def ping(self) -> bool:
+        """发送ping检查连接是否仍然可写"""
+        if self.closed:
+            return False
+        try:
+            await self.ws.ping()
+            return not self.ws.closed
+        except Exception:
+            self.broken = True
+            return False
+
+    async def synthesize(self, text: str, voice: str, rate: str, volume: str, pitch: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        在此连接上合成一段文本，产出与edge_tts.Communicate.stream相同格式的消息
+
+        消息被中途放弃（取消或提前退出）时连接上还有未读的帧，因此会被标记为不可复用。
+        """
+        completed = False
+        try:
+            if not self._configured:
+                await self.ws.send_str(speech_config_message())
+                self._configured = True
+            escaped = escape(_clean_text(text))
+            offset_shift = 0
+            for part in _split_by_bytes(escaped, _MAX_MESSAGE_BYTES):
+                last_end = 0
+                async for message in self._run_turn(part, voice, rate, volume, pitch):
+                    if message["type"] == "WordBoundary":
+                        message["offset"] += offset_shift
+                        last_end = message["offset"] + message["duration"]
+                    yield message
+                # 与edge_tts一致，多轮之间按平均静音补齐偏移
+                offset_shift = last_end + 8_750_000 if last_end else offset_shift
+            completed = True
+        finally:
+            self.last_used = time.monotonic()
+            if not completed:
+                self.broken = True
+
+    async def _run_turn(self, text: str, voice: str, rate: str, volume: str, pitch: str) -> AsyncGenerator[Dict[str, Any], None]:
+        request_id = _connect_id()
+        await self.ws.send_str(ssml_message(request_id, build_ssml(text, voice, rate, volume, pitch)))
+        self.turns += 1
+        expected_id = request_id.encode()
+        download_audio = False
+        audio_received = False
+        async for received in self.ws:
+            if received.type == aiohttp.WSMsgType.TEXT:
+                raw = received.data.encode("utf-8")
+                sep = raw.find(b"\r\n\r\n")
+                headers = parse_headers(raw[:sep])
+                if headers.get(b"X-RequestId", expected_id) != expected_id:
+                    # 上一轮遗留的消息
+                    continue
+                path = headers.get(b"Path")
+                if path == b"turn.start":
+                    download_audio = True
+                elif path == b"turn.end":
+                    if not audio_received:
+                        raise UpstreamError("No audio was received. Please verify that your parameters are correct.")
+                    return
+                elif path == b"audio.metadata":
+                    for meta in json.loads(raw[sep + 4:])["Metadata"]:
+                        if meta["Type"] == "WordBoundary":
+                            yield {
+                                "type": "WordBoundary",
+                                "offset": meta["Data"]["Offset"],
+                                "duration": meta["Data"]["Duration"],
+                                "text": meta["Data"]["text"]["Text"],
+                            }
+                elif path in (b"response",):
+                    pass
+            elif received.type == aiohttp.WSMsgType.BINARY:
+                data = received.data
+                if len(data) < 2:
+                    raise UpstreamError("We received a binary message, but it is missing the header length.")
+                header_length = int.from_bytes(data[:2], "big")
+                headers = parse_headers(data[2:2 + header_length])
+                if headers.get(b"X-RequestId", expected_id) != expected_id:
+                    continue
+                if not download_audio:
+                    raise UpstreamError("We received a binary message, but we are not expecting one.")
+                audio_received = True
+                yield {"type": "audio", "data": data[header_length + 2:]}
+            elif received.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING):
+                break
+            elif received.type == aiohttp.WSMsgType.ERROR:
+                raise UpstreamError(str(self.ws.exception() or "Unknown error"))
+        raise UpstreamError("上游连接在合成完成前被关闭")
+
+
+class UpstreamPool:
+    """上游WebSocket连接池"""
+
+    def __init__(
+        self,
+        max_size: int = 4,
+        idle_timeout: float = 30.0,
+        health_check_after: float = 5.0,
+        connect_timeout: float = 10.0,
+        url: Optional[str] = None,
+        proxy: Optional[str] = None,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        初始化连接池
+
+        Args:
+            max_size: 最多同时打开的连接数，也是上游并发上限
+            idle_timeout: 空闲超过这么多秒的连接直接关闭，不再复用
+            health_check_after: 空闲超过这么多秒的连接在复用前先做健康检查
+            connect_timeout: 建立连接（含TLS握手）的超时时间
+            url: 上游WebSocket地址，默认为Edge朗读服务，测试时可指向本地替身服务
+            proxy: HTTP代理地址
+            metrics_registry: 指标注册表
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_timeout = connect_timeout
+        self.url = url or DEFAULT_WSS_URL
+        self.proxy = proxy
+        self._idle: Deque[UpstreamConnection] = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ssl_ctx: Optional[ssl.SSLContext] = None
+        self._open = 0
+        self._closed = False
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._handshake_latency = registry.histogram(
+            "tts_upstream_handshake_seconds", "上游WebSocket建连（含TLS握手）耗时"
+        )
+        self._connects = registry.counter("tts_pool_connects_total", "连接池新建连接次数")
+        self._reuses = registry.counter("tts_pool_reuses_total", "连接池复用连接次数")
+        self._discards = registry.counter("tts_pool_discards_total", "因空闲超时或健康检查失败丢弃的连接数")
+        self._connections = registry.gauge("tts_pool_connections", "连接池中的连接数", ["state"])
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+
+    def _update_gauges(self) -> None:
+        self._connections.set(len(self._idle), state="idle")
+        self._connections.set(self._open - len(self._idle), state="busy")
+
+    async def _connect(self) -> UpstreamConnection:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(trust_env=True)
+        if self.url.startswith("wss://") and self._ssl_ctx is None:
+            try:
+                import certifi
+                self._ssl_ctx = ssl.create_default_context(cafile=certifi.where())
+            except ImportError:
+                self._ssl_ctx = ssl.create_default_context()
+        separator = "&" if "?" in self.url else "?"
+        span = tracing.start_span("upstream_handshake")
+        start = time.perf_counter()
+        try:
+            ws = await self._session.ws_connect(
+                f"{self.url}{separator}ConnectionId={_connect_id()}",
+                compress=15,
+                autoclose=True,
+                autoping=True,
+                proxy=self.proxy,
+                headers=_WS_HEADERS,
+                ssl=self._ssl_ctx if self.url.startswith("wss://") else None,
+                timeout=self.connect_timeout
+            )
+        finally:
+            if span is not None:
+                span.finish()
+        elapsed = time.perf_counter() - start
+        self._handshake_latency.observe(elapsed)
+        self._connects.inc()
+        return UpstreamConnection(ws, elapsed)
+
+    async def _take_idle(self) -> Optional[UpstreamConnection]:
+        """取出一条健康的空闲连接，没有则返回None"""
+        while self._idle:
+            conn = self._idle.pop()
+            idle_for = time.monotonic() - conn.last_used
+            healthy = not conn.closed and idle_for < self.idle_timeout
+            if healthy and idle_for >= self.health_check_after:
+                healthy = await conn.ping()
+            if healthy:
+                return conn
+            self._discards.inc()
+            self._open -= 1
+            await conn.close()
+        return None
+
+    @asynccontextmanager
+    async def connection(self, fresh: bool = False) -> AsyncIterator[UpstreamConnection]:
+        """借出一条连接，用完后健康的连接放回池中"""
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        conn = None
+        try:
+            if not fresh:
+                conn = await self._take_idle()
+            if conn is not None:
+                self._reuses.inc()
+            else:
+                conn = await self._connect()
+                self._open += 1
+            self._update_gauges()
+            yield conn
+        finally:
+            if conn is not None:
+                if conn.closed or self._closed:
+                    self._open -= 1
+                    await conn.close()
+                else:
+                    self._idle.append(conn)
+            semaphore.release()
+            self._update_gauges()
+
+    async def stream(self, text: str, voice: str, rate: str = "+0%", volume: str = "+0%", pitch: str = "+0Hz") -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        通过池中的连接合成文本，消息格式与edge_tts.Communicate.stream相同
+
+        复用的连接可能已被服务端静默关闭，如果在收到任何数据之前失败，
+        会换一条新连接透明重试一次。
+        """
+        full_voice = normalize_voice(voice)
+        _validate_prosody(rate, volume, pitch)
+        fresh = False
+        while True:
+            received_any = False
+            async with self.connection(fresh=fresh) as conn:
+                reused = conn.turns > 0
+                messages = conn.synthesize(text, full_voice, rate, volume, pitch)
+                try:
+                    async for message in messages:
+                        received_any = True
+                        yield message
+                    return
+                except (aiohttp.ClientError, UpstreamError, ConnectionError) as e:
+                    if received_any or not reused or fresh:
+                        raise
+                    logger.info("复用的上游连接已失效，改用新连接重试: %s", e)
+                    fresh = True
+                finally:
+                    # 调用方提前关闭时，在归还连接之前关闭synthesize，把还有未读帧的连接标记为不可复用
+                    await messages.aclose()
+
+    async def close(self) -> None:
+        """关闭所有空闲连接和HTTP会话"""
+        self._closed = True
+        while self._idle:
+            conn = self._idle.pop()
+            self._open -= 1
+            await conn.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._update_gauges()
+
+    def stats(self) -> Dict[str, int]:
+        return {"open": self._open, "idle": len(self._idle), "max_size": self.max_size}
@@ -0,0 +1,151 @@
+"""
+租户配额 - 基于令牌桶的请求数和字符数限制
+
+每个租户两个令牌桶：每分钟请求数和每分钟字符数。桶按速率连续补充，容量即允许的突发量。
+一次请求要两个桶都有足够的令牌才会放行（先检查后扣减，被拒绝的请求不消耗额度），
+否则抛出 QuotaExceeded，其中带有需要等待的秒数，API据此返回429和Retry-After。
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .metrics import MetricsRegistry, default_registry
+
+
+class QuotaExceeded(Exception):
+    """租户超出配额"""
+
+    def __init__(self, tenant: str, kind: str, retry_after: Optional[float]):
+        """
+        Args:
+            tenant: 租户
+            kind: 超出的配额，requests 或 chars
+            retry_after: 需要等待的秒数；单次请求超过桶容量、等待也无法满足时为None
+        """
+        self.tenant = tenant
+        self.kind = kind
+        self.retry_after = retry_after
+        if retry_after is None:
+            message = f"租户 {tenant} 的单次请求超过{kind}配额上限"
+        else:
+            message = f"租户 {tenant} 超出{kind}配额，请在 {math.ceil(retry_after)} 秒后重试"
+        super().__init__(message)
+
+
+class TokenBucket:
+    """令牌桶，rate为每秒补充的令牌数，capacity为桶容量"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> Optional[float]:
+        """取出amount个令牌需要等待的秒数，0表示现在就可以；超过容量时返回None"""
+        if amount > self.capacity:
+            return None
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                return 0.0
+            return (amount - self._tokens) / self.rate if self.rate > 0 else None
+
+    def consume(self, amount: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class TenantQuotas:
+    """按租户维护请求数和字符数令牌桶"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        chars_per_minute: Optional[float] = None,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            requests_per_minute: 未单独配置的租户每分钟的请求数上限，None表示不限
+            chars_per_minute: 未单独配置的租户每分钟的字符数上限，None表示不限，
+                也是单次请求的字符数上限
+            metrics_registry: 指标注册表
+        """
+        self.default_limits = (requests_per_minute, chars_per_minute)
+        self._limits: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._lock = threading.RLock()
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._requests = registry.counter("tts_tenant_requests_total", "各租户通过配额检查的请求数", ["tenant"])
+        self._chars = registry.counter("tts_tenant_chars_total", "各租户通过配额检查的请求字符数", ["tenant"])
+        self._rejected = registry.counter("tts_tenant_rejected_total", "各租户因超出配额被拒绝的请求数", ["tenant", "kind"])
+
+    def configure(
+        self,
+        tenant: str,
+        requests_per_minute: Optional[float] = None,
+        chars_per_minute: Optional[float] = None
+    ) -> None:
+        """为租户单独设置配额，已有的令牌桶会按新配额重建"""
+        with self._lock:
+            self._limits[tenant] = (requests_per_minute, chars_per_minute)
+            self._buckets.pop(tenant, None)
+
+    def _get_buckets(self, tenant: str) -> Dict[str, TokenBucket]:
+        with self._lock:
+            buckets = self._buckets.get(tenant)
+            if buckets is None:
+                requests, chars = self._limits.get(tenant, self.default_limits)
+                buckets = {}
+                if requests:
+                    buckets["requests"] = TokenBucket(requests / 60.0, requests)
+                if chars:
+                    buckets["chars"] = TokenBucket(chars / 60.0, chars)
+                self._buckets[tenant] = buckets
+            return buckets
+
+    def check(self, tenant: str, chars: int, requests: int = 1) -> None:
+        """
+        检查并扣减配额，超出时抛出QuotaExceeded且不扣减
+
+        Args:
+            tenant: 租户
+            chars: 字符数
+            requests: 请求数；上传等事先不知道总字符数的请求先按 (1, 0) 检查，
+                之后每得到一段文本再按 (0, 段长) 扣减
+        """
+        costs = {"requests": requests, "chars": chars}
+        with self._lock:
+            buckets = self._get_buckets(tenant)
+            for kind, bucket in buckets.items():
+                wait = bucket.wait_time(costs[kind])
+                if wait is None or wait > 0:
+                    self._rejected.inc(tenant=tenant, kind=kind)
+                    raise QuotaExceeded(tenant, kind, wait)
+            for kind, bucket in buckets.items():
+                bucket.consume(costs[kind])
+        if requests:
+            self._requests.inc(requests, tenant=tenant)
+        if chars:
+            self._chars.inc(chars, tenant=tenant)
+
+    def remaining(self, tenant: str) -> Dict[str, float]:
+        """各配额当前剩余的令牌数"""
+        return {kind: bucket.tokens for kind, bucket in self._get_buckets(tenant).items()}
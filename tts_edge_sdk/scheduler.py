@@ -0,0 +1,260 @@
+"""
+按租户公平调度上游合成
+
+同一个进程里的所有请求共享有限的上游并发（通常等于连接池大小）。没有调度时，
+一个提交几十万字符、高并发的租户会占满全部上游槽位，其他租户的短请求只能排队。
+FairScheduler 在上游调用之前按加权公平队列（start-time fair queueing）分配槽位：
+
+    请求的开始标签 S = max(虚拟时间V, 该租户上一个请求的结束标签)
+    结束标签      F = S + 字符数 / 租户权重
+
+槽位空出时发给开始标签最小的请求，V 随之推进。各租户按权重分享上游的字符吞吐，
+空闲租户不会积攒额度，新来的短请求只需等一个槽位空出。
+
+租户通过 tenant_context 写入上下文，随asyncio任务自动传递给各文本段。
+
+每个请求还有一个优先级（interactive / default / bulk）。槽位空出时先发给优先级最高的
+等待者，同一优先级内再按上面的公平标签排序。为防止低优先级饿死，等待者每排队
+aging 秒就提升一级，批量任务的文本段最迟排队 2×aging 秒后与交互请求同等对待。
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import MetricsRegistry, default_registry
+
+DEFAULT_TENANT = "default"
+
+# 优先级，按从高到低排列
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_DEFAULT = "default"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BULK)
+
+_current_tenant: contextvars.ContextVar = contextvars.ContextVar("tts_tenant", default=DEFAULT_TENANT)
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("tts_priority", default=PRIORITY_DEFAULT)
+
+
+def current_tenant() -> str:
+    """当前上下文的租户"""
+    return _current_tenant.get()
+
+
+@contextmanager
+def tenant_context(tenant: str) -> Iterator[None]:
+    """在代码块内把租户写入上下文，代码块内创建的任务都归属该租户"""
+    token = _current_tenant.set(tenant or DEFAULT_TENANT)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_priority() -> str:
+    """当前上下文的优先级"""
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_context(priority: str) -> Iterator[None]:
+    """在代码块内设置请求优先级，代码块内发起的上游调用都按该优先级排队"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"未知的优先级: {priority}，可选值为 {', '.join(PRIORITIES)}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def priority_for_length(chars: int, interactive_chars: int = 200, bulk_chars: int = 5000) -> str:
+    """按文本长度推断优先级：短文本为交互请求，超长文本为批量任务"""
+    if chars <= interactive_chars:
+        return PRIORITY_INTERACTIVE
+    if chars >= bulk_chars:
+        return PRIORITY_BULK
+    return PRIORITY_DEFAULT
+
+
+class _Waiter:
+    """排队等待槽位的请求"""
+
+    __slots__ = ("start_tag", "seq", "tenant", "priority", "future", "queued_at")
+
+    def __init__(self, start_tag: float, seq: int, tenant: str, priority: str, future: asyncio.Future):
+        self.start_tag = start_tag
+        self.seq = seq
+        self.tenant = tenant
+        self.priority = priority
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.start_tag, self.seq) < (other.start_tag, other.seq)
+
+
+class FairScheduler:
+    """按优先级和租户加权公平分配上游并发槽位"""
+
+    def __init__(
+        self,
+        slots: int = 8,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        aging: float = 2.0,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            slots: 同时进行的上游调用数上限，使用连接池时应等于池大小
+            weights: 租户权重，权重越大分到的上游吞吐越多
+            default_weight: 未配置权重的租户使用的权重
+            aging: 等待者每排队这么多秒提升一级优先级，防止低优先级饿死
+            metrics_registry: 指标注册表
+        """
+        self.slots = max(1, slots)
+        self.default_weight = default_weight
+        self.aging = aging
+        self._weights: Dict[str, float] = dict(weights or {})
+        self._finish_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._busy = 0
+        # 每个优先级一个按公平标签排序的堆
+        self._queues: Dict[str, List[_Waiter]] = {priority: [] for priority in PRIORITIES}
+        self._queued: Dict[Tuple[str, str], int] = {}
+        self._seq = itertools.count()
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._wait = registry.histogram(
+            "tts_scheduler_wait_seconds", "文本段等待上游槽位的耗时", ["tenant", "priority"]
+        )
+        self._queued_gauge = registry.gauge(
+            "tts_scheduler_queued", "排队等待上游槽位的文本段数", ["tenant", "priority"]
+        )
+        self._busy_gauge = registry.gauge("tts_scheduler_busy_slots", "正在使用的上游槽位数")
+        self._chars = registry.counter("tts_tenant_upstream_chars_total", "各租户提交给上游合成的字符数", ["tenant"])
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        if weight <= 0:
+            raise ValueError("租户权重必须大于0")
+        self._weights[tenant] = weight
+
+    def weight(self, tenant: str) -> float:
+        return self._weights.get(tenant, self.default_weight)
+
+    def _tag(self, tenant: str, cost: int) -> float:
+        start = max(self._virtual_time, self._finish_tags.get(tenant, 0.0))
+        self._finish_tags[tenant] = start + max(1, cost) / self.weight(tenant)
+        return start
+
+    def _set_queued(self, tenant: str, priority: str, delta: int) -> None:
+        key = (tenant, priority)
+        count = self._queued.get(key, 0) + delta
+        if count:
+            self._queued[key] = count
+        else:
+            self._queued.pop(key, None)
+        self._queued_gauge.set(count, tenant=tenant, priority=priority)
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """取出下一个应当拿到槽位的等待者：先比较计入等待时间后的优先级，再比较排队先后"""
+        now = time.perf_counter()
+        best_key = None
+        best_queue = None
+        for rank, priority in enumerate(PRIORITIES):
+            queue = self._queues[priority]
+            # 丢弃排队期间已被取消的等待者
+            while queue and queue[0].future.done():
+                waiter = heapq.heappop(queue)
+                self._set_queued(waiter.tenant, waiter.priority, -1)
+            if not queue:
+                continue
+            head = queue[0]
+            promoted = int((now - head.queued_at) / self.aging) if self.aging > 0 else 0
+            key = (max(0, rank - promoted), head.queued_at)
+            if best_key is None or key < best_key:
+                best_key, best_queue = key, queue
+        if best_queue is None:
+            return None
+        waiter = heapq.heappop(best_queue)
+        self._set_queued(waiter.tenant, waiter.priority, -1)
+        return waiter
+
+    def _dispatch(self) -> None:
+        """把空闲槽位依次发给下一个等待者"""
+        while self._busy < self.slots:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self._busy += 1
+            waiter.future.set_result(None)
+        self._busy_gauge.set(self._busy)
+
+    def release(self) -> None:
+        """归还acquire拿到的槽位"""
+        self._busy -= 1
+        self._dispatch()
+
+    async def acquire(self, cost: int = 1, tenant: Optional[str] = None, priority: Optional[str] = None) -> None:
+        """
+        等待并占用一个上游槽位，用完后必须调用release
+
+        Args:
+            cost: 本次调用的代价，通常为文本字符数
+            tenant: 租户，不指定则使用上下文中的租户
+            priority: 优先级，不指定则使用上下文中的优先级
+        """
+        tenant = tenant or current_tenant()
+        priority = priority or current_priority()
+        start_tag = self._tag(tenant, cost)
+        self._chars.inc(max(0, cost), tenant=tenant)
+        start = time.perf_counter()
+        if self._busy < self.slots and not self._has_waiters():
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self._busy += 1
+            self._busy_gauge.set(self._busy)
+        else:
+            waiter = _Waiter(start_tag, next(self._seq), tenant, priority, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._queues[priority], waiter)
+            self._set_queued(tenant, priority, 1)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # 已分到槽位但调用方被取消，把槽位交给下一个
+                    self.release()
+                else:
+                    waiter.future.cancel()
+                raise
+        self._wait.observe(time.perf_counter() - start, tenant=tenant, priority=priority)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        cost: int = 1,
+        tenant: Optional[str] = None,
+        priority: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """占用一个上游槽位直到代码块结束，参数同acquire"""
+        await self.acquire(cost, tenant, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "slots": self.slots,
+            "busy": self._busy,
+            "queued": {f"{tenant}/{priority}": count for (tenant, priority), count in self._queued.items()},
+            "virtual_time": self._virtual_time,
+        }
@@ -0,0 +1,184 @@
+"""
+多角色脚本 - synthesize_script 使用的台词格式和解析
+
+脚本是若干条台词，每条台词有自己的语音和韵律参数，可以直接给出台词列表：
+
+    [
+        {"speaker": "主持人", "text": "欢迎收听本期节目。"},
+        {"voice": "zh-CN-YunxiNeural", "text": "大家好。", "rate": "+10%", "pause": 1.0},
+        ("嘉宾", "很高兴来到这里。"),
+    ]
+
+也可以使用简单的标记格式，每行一条台词：
+
+    # 注释行
+    @speaker 主持人 voice=zh-CN-XiaoxiaoNeural
+    @speaker 嘉宾 voice=zh-CN-YunxiNeural rate=+5%
+    主持人: 欢迎收听本期节目。
+    嘉宾[pitch=+2Hz, pause=1.2]: 大家好，很高兴来到这里。
+    这一行没有角色前缀，沿用上一行的角色。
+    @pause 2
+
+角色名可以是 speakers 中声明的名称，也可以直接写语音名称（如 zh-CN-YunxiNeural）。
+只有声明过的角色名或语音名称才被当作前缀，台词里普通的冒号不受影响。
+pause 是这一行之后的停顿秒数，不指定时使用请求的默认停顿；@pause 设置上一行之后的停顿。
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Union
+
+# 台词和角色可以设置的参数
+PROSODY_FIELDS = ("voice", "rate", "volume", "pitch")
+LINE_FIELDS = PROSODY_FIELDS + ("pause",)
+
+# 角色名[参数]: 台词
+_LINE_PATTERN = re.compile(r"^\s*([^\[\]:：]+?)\s*(?:\[([^\]]*)\])?\s*[:：]\s*(.*)$")
+_VOICE_PATTERN = re.compile(r"^[a-z]{2,3}-[A-Za-z]{2,4}(-[A-Za-z]+)?-\w+Neural$")
+
+
+class ScriptLine(NamedTuple):
+    """一条台词"""
+    text: str
+    voice: Optional[str] = None       # None表示使用客户端默认语音
+    rate: str = "+0%"
+    volume: str = "+0%"
+    pitch: str = "+0Hz"
+    pause: Optional[float] = None     # 这一行之后的停顿秒数，None表示使用默认停顿
+    speaker: Optional[str] = None
+
+
+def is_voice_name(name: str) -> bool:
+    """是否为Edge语音名称，如 zh-CN-XiaoxiaoNeural"""
+    return bool(_VOICE_PATTERN.match(name))
+
+
+def _speaker_profile(name: Optional[str], speakers: Mapping[str, Any]) -> Dict[str, Any]:
+    """角色对应的语音参数；未声明的角色名按语音名称处理"""
+    if name is None:
+        return {}
+    if name in speakers:
+        profile = speakers[name]
+        if isinstance(profile, str):
+            return {"voice": profile}
+        unknown = set(profile) - set(PROSODY_FIELDS)
+        if unknown:
+            raise ValueError(f"角色 {name} 的参数无效: {', '.join(sorted(unknown))}")
+        return dict(profile)
+    if is_voice_name(name):
+        return {"voice": name}
+    raise ValueError(f"未声明的角色: {name}")
+
+
+def make_line(text: str, speaker: Optional[str], speakers: Mapping[str, Any], **params: Any) -> ScriptLine:
+    """按角色的默认参数和这一行的参数生成台词，这一行的参数优先"""
+    unknown = set(params) - set(LINE_FIELDS)
+    if unknown:
+        raise ValueError(f"台词参数无效: {', '.join(sorted(unknown))}")
+    fields = _speaker_profile(speaker, speakers)
+    fields.update((key, value) for key, value in params.items() if value is not None)
+    pause = fields.pop("pause", None)
+    if pause is not None:
+        pause = float(pause)
+        if pause < 0:
+            raise ValueError("pause 不能为负数")
+    return ScriptLine(text=text, pause=pause, speaker=speaker, **fields)
+
+
+def parse_lines(items: Iterable[Any], speakers: Optional[Mapping[str, Any]] = None) -> List[ScriptLine]:
+    """
+    解析台词列表
+
+    每一项可以是ScriptLine、(角色或语音, 台词[, 参数])元组，或包含text以及
+    speaker、voice、rate、volume、pitch、pause的字典。空白台词被跳过。
+    """
+    speakers = speakers or {}
+    lines = []
+    for item in items:
+        if isinstance(item, ScriptLine):
+            line = item
+        elif isinstance(item, dict):
+            params = dict(item)
+            try:
+                text = params.pop("text")
+            except KeyError:
+                raise ValueError("台词缺少 text 字段") from None
+            speaker = params.pop("speaker", None)
+            line = make_line(text, speaker, speakers, **params)
+        elif isinstance(item, (tuple, list)) and len(item) in (2, 3):
+            params = dict(item[2] or {}) if len(item) == 3 else {}
+            line = make_line(item[1], item[0], speakers, **params)
+        else:
+            raise ValueError("台词应为 (角色或语音, 台词[, 参数]) 或包含text的字典")
+        if line.text and line.text.strip():
+            lines.append(line)
+    return lines
+
+
+def _parse_params(text: str) -> Dict[str, str]:
+    """解析 key=value 参数，以逗号或空白分隔"""
+    params = {}
+    for pair in re.split(r"[,，\s]+", text.strip()):
+        if not pair:
+            continue
+        key, sep, value = pair.partition("=")
+        if not sep or not key:
+            raise ValueError(f"参数格式应为 key=value: {pair}")
+        params[key.strip()] = value.strip()
+    return params
+
+
+def parse_script(script: str, speakers: Optional[Mapping[str, Any]] = None) -> List[ScriptLine]:
+    """
+    解析标记格式的脚本
+
+    Args:
+        script: 脚本文本，格式见模块说明
+        speakers: 角色名到语音名称或语音参数字典的映射，脚本中的 @speaker 声明会覆盖同名角色
+
+    Returns:
+        List[ScriptLine]: 各条台词
+    """
+    speakers = dict(speakers or {})
+    lines: List[ScriptLine] = []
+    speaker: Optional[str] = None
+    for number, raw in enumerate(script.splitlines(), 1):
+        row = raw.strip()
+        if not row or row.startswith("#"):
+            continue
+        try:
+            if row.startswith("@"):
+                command, _, rest = row[1:].partition(" ")
+                if command == "speaker":
+                    name, _, params = rest.strip().partition(" ")
+                    if not name:
+                        raise ValueError("@speaker 缺少角色名")
+                    profile = _parse_params(params)
+                    _speaker_profile(name, {name: profile})
+                    speakers[name] = profile
+                elif command == "pause":
+                    if not lines:
+                        raise ValueError("@pause 之前没有台词")
+                    lines[-1] = lines[-1]._replace(pause=float(rest))
+                else:
+                    raise ValueError(f"未知指令 @{command}")
+                continue
+            match = _LINE_PATTERN.match(row)
+            if match and (match.group(1) in speakers or is_voice_name(match.group(1))):
+                speaker = match.group(1)
+                params = _parse_params(match.group(2)) if match.group(2) else {}
+                text = match.group(3)
+            else:
+                params = {}
+                text = row
+            if text.strip():
+                lines.append(make_line(text, speaker, speakers, **params))
+        except ValueError as e:
+            raise ValueError(f"脚本第 {number} 行: {e}") from None
+    return lines
+
+
+def parse(script: Union[str, Iterable[Any]], speakers: Optional[Mapping[str, Any]] = None) -> List[ScriptLine]:
+    """标记格式的字符串按parse_script解析，其余按parse_lines解析"""
+    if isinstance(script, str):
+        return parse_script(script, speakers)
+    return parse_lines(script, speakers)
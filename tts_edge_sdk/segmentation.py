@@ -0,0 +1,254 @@
+"""
+流式分段 - 首段短、后续段按几何级数增长
+
+均匀分段时第一段音频要等一整段合成完才能输出。流式场景下首字节时间更重要：
+第一段只取一个短句或分句，尽快产出音频，后面的段逐段放大到 chunk_size，
+在后面的段合成期间前面的音频已经在播放，同时上游调用次数只比均匀分段多几次。
+
+    首段 ≈ first_chunk_size，第n段 ≈ first_chunk_size × growth^n，上限 max_chunk_size
+
+StreamingSegmenter 按同样的规则对边到达边输入的文本增量分段，只缓存还没切出去的尾部，
+segment_stream 在此基础上增量解码字节流（正确处理跨块的多字节UTF-8字符）。
+"""
+
+import codecs
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Sequence, Union
+
+# 句末标点，优先在这里切分
+SENTENCE_END_MARKS = ("。", "！", "？", "；", ".", "!", "?", ";")
+# 分句标点，首段找不到句末时退而在这里切分
+CLAUSE_MARKS = ("，", "、", "：", ",", ":", "\n")
+
+
+class SegmentRamp:
+    """首段短、逐段增长的分段参数"""
+
+    def __init__(
+        self,
+        first_chunk_size: int = 40,
+        growth: float = 2.0,
+        max_chunk_size: Optional[int] = None,
+        min_chunk_size: int = 8
+    ):
+        """
+        Args:
+            first_chunk_size: 首段的目标字符数，只需够一个短句或分句
+            growth: 每段相对上一段的增长倍数，不小于1
+            max_chunk_size: 段长上限，None表示使用调用方传入的chunk_size
+            min_chunk_size: 切分点前至少保留的字符数，避免切出只有一两个字的段
+        """
+        if first_chunk_size < 1:
+            raise ValueError("first_chunk_size 必须大于0")
+        if growth < 1:
+            raise ValueError("growth 不能小于1")
+        self.first_chunk_size = first_chunk_size
+        self.growth = growth
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = max(1, min(min_chunk_size, first_chunk_size))
+
+    def sizes(self, max_chunk_size: Optional[int] = None) -> Iterator[int]:
+        """依次产出每一段的目标字符数，无限序列"""
+        limit = self.max_chunk_size or max_chunk_size or self.first_chunk_size
+        limit = max(limit, self.first_chunk_size)
+        size = float(self.first_chunk_size)
+        while True:
+            yield int(min(size, limit))
+            size *= self.growth
+
+    def split(self, text: str, max_chunk_size: Optional[int] = None) -> List[str]:
+        """按逐段增长的目标长度切分文本，拼接各段即为原文"""
+        return split_ramped(text, self, max_chunk_size)
+
+    def __repr__(self) -> str:
+        return (f"SegmentRamp(first_chunk_size={self.first_chunk_size}, growth={self.growth}, "
+                f"max_chunk_size={self.max_chunk_size})")
+
+
+def _last_mark(text: str, start: int, end: int, marks: Sequence[str]) -> int:
+    """返回 [start, end) 内最后一个标点之后的位置，没有时返回-1"""
+    for i in range(min(end, len(text)) - 1, start - 1, -1):
+        if text[i] in marks:
+            return i + 1
+    return -1
+
+
+def _first_mark(text: str, start: int, end: int, marks: Sequence[str]) -> int:
+    """返回 [start, end) 内第一个标点之后的位置，没有时返回-1"""
+    for i in range(start, min(end, len(text))):
+        if text[i] in marks:
+            return i + 1
+    return -1
+
+
+def _cut_point(text: str, start: int, target: int, limit: int, min_length: int) -> int:
+    """
+    为从start开始、目标长度为target的段选择结束位置
+
+    依次尝试：目标长度内最后一个句末标点、最后一个分句标点（都要求至少达到目标的一半），
+    目标之后不超过一倍目标长度的第一个句末或分句标点，目标长度内最后一个空白，
+    最后在目标长度处硬切。段长不会超过limit。
+    """
+    floor = start + max(min_length, target // 2)
+    end = start + target
+    for marks in (SENTENCE_END_MARKS, CLAUSE_MARKS):
+        cut = _last_mark(text, floor, end, marks)
+        if cut > 0:
+            return cut
+    cut = _first_mark(text, end, start + min(target * 2, limit), SENTENCE_END_MARKS + CLAUSE_MARKS)
+    if cut > 0:
+        return cut
+    cut = _last_mark(text, floor, end, (" ", "\t"))
+    if cut > 0:
+        return cut
+    return min(end, len(text))
+
+
+def split_ramped(text: str, ramp: SegmentRamp, max_chunk_size: Optional[int] = None) -> List[str]:
+    """
+    按SegmentRamp切分文本
+
+    Args:
+        text: 要切分的文本
+        ramp: 分段参数
+        max_chunk_size: ramp未指定上限时使用的段长上限，通常是请求的chunk_size
+
+    Returns:
+        List[str]: 各段文本，短文本返回只有一段的列表
+    """
+    # 不到首段1.5倍的文本切开也省不了多少时间
+    if len(text) < ramp.first_chunk_size * 1.5:
+        return [text]
+    segmenter = StreamingSegmenter(ramp, max_chunk_size)
+    return segmenter.feed(text) + segmenter.finish()
+
+
+def split_sentences(text: str) -> List[str]:
+    """按句末标点和换行切分句子，标点留在句尾，连续的标点归入同一句，去掉空白句"""
+    sentences = []
+    start = 0
+    length = len(text)
+    for i, char in enumerate(text):
+        if char not in SENTENCE_END_MARKS and char != "\n":
+            continue
+        following = text[i + 1] if i + 1 < length else ""
+        if following in SENTENCE_END_MARKS and following:
+            continue
+        # 英文句点后面不是空白时是小数点或缩写
+        if char == "." and following and not following.isspace():
+            continue
+        sentence = text[start:i + 1].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = i + 1
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class StreamingSegmenter:
+    """
+    增量分段：文本分块输入，凑够判断切分点所需的长度就切出一段
+
+    切分结果与对完整文本调用split_ramped相同，缓存的只有还没切出去的尾部，
+    大小与段长上限和单次输入的块大小相关，与文本总长度无关。
+    """
+
+    def __init__(self, ramp: SegmentRamp, max_chunk_size: Optional[int] = None):
+        """
+        Args:
+            ramp: 分段参数
+            max_chunk_size: ramp未指定上限时使用的段长上限
+        """
+        self.ramp = ramp
+        self._sizes = ramp.sizes(max_chunk_size)
+        first = next(self._sizes)
+        self._target = first
+        self._limit = max(ramp.max_chunk_size or max_chunk_size or first, first)
+        self._buffer = ""
+        self.segments = 0
+        self.chars = 0
+
+    @property
+    def buffered(self) -> int:
+        """缓存中还没切出去的字符数"""
+        return len(self._buffer)
+
+    def _emit(self, chunk: str) -> str:
+        self.segments += 1
+        self.chars += len(chunk)
+        self._target = next(self._sizes)
+        return chunk
+
+    def feed(self, text: str) -> List[str]:
+        """输入一块文本，返回可以确定的新段"""
+        buffer = self._buffer + text if self._buffer else text
+        chunks = []
+        start = 0
+        while True:
+            # 剩余不到目标1.5倍时可能是尾段，切分点还要看到目标之后的标点，都要等更多输入
+            lookahead = max(self._target * 1.5, min(self._target * 2, self._limit))
+            if len(buffer) - start < lookahead:
+                break
+            cut = _cut_point(buffer, start, self._target, self._limit, self.ramp.min_chunk_size)
+            chunks.append(self._emit(buffer[start:cut]))
+            start = cut
+        self._buffer = buffer[start:] if start else buffer
+        return chunks
+
+    def finish(self) -> List[str]:
+        """输入结束，切分剩余的文本"""
+        text, self._buffer = self._buffer, ""
+        chunks = []
+        start = 0
+        while start < len(text):
+            remaining = len(text) - start
+            target = self._target
+            # 剩余部分不到目标的1.5倍时整体作为最后一段，避免切出过短的尾段
+            if remaining < target * 1.5:
+                if remaining <= self._limit:
+                    chunks.append(self._emit(text[start:]))
+                    break
+                # 超过上限时分成大致相等的两段
+                target = (remaining + 1) // 2
+            cut = _cut_point(text, start, target, self._limit, self.ramp.min_chunk_size)
+            chunks.append(self._emit(text[start:cut]))
+            start = cut
+        return chunks
+
+
+async def segment_stream(
+    pieces: Union[AsyncIterable[Union[str, bytes]], Iterable[Union[str, bytes]]],
+    ramp: SegmentRamp,
+    max_chunk_size: Optional[int] = None,
+    encoding: str = "utf-8",
+    errors: str = "strict"
+) -> AsyncIterator[str]:
+    """
+    对分块到达的文本或字节流增量分段，每凑够一段立即产出
+
+    Args:
+        pieces: 文本块或字节块，可以是异步可迭代对象（例如HTTP请求体）
+        ramp: 分段参数
+        max_chunk_size: ramp未指定上限时使用的段长上限
+        encoding: 字节块的编码，多字节字符可以跨块
+        errors: 解码错误处理方式，同bytes.decode
+
+    Yields:
+        str: 各段文本，拼接即为原文
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    segmenter = StreamingSegmenter(ramp, max_chunk_size)
+    if hasattr(pieces, "__aiter__"):
+        async for piece in pieces:
+            text = piece if isinstance(piece, str) else decoder.decode(piece)
+            for chunk in segmenter.feed(text):
+                yield chunk
+    else:
+        for piece in pieces:
+            text = piece if isinstance(piece, str) else decoder.decode(piece)
+            for chunk in segmenter.feed(text):
+                yield chunk
+    # 末尾不完整的多字节字符在这里报错（或按errors处理）
+    for chunk in segmenter.feed(decoder.decode(b"", final=True)) + segmenter.finish():
+        yield chunk
@@ -0,0 +1,338 @@
+"""
+顺序播放会话 - 按播放进度提前合成后面的句子
+
+逐句请求的播放端每播完一句才请求下一句，每个句子边界都要等一次完整的上游往返。
+PlaybackSession 在创建时登记全部文本，取第n句时同时在后台合成第n+1到n+lookahead句：
+
+- 当前请求的句子按 interactive 优先级合成，预取的句子按 default 优先级排队
+- 播放端跳转（取的句子不在预取窗口内）时，取消窗口外还没完成的预取任务
+- 内存中只保留窗口内的结果，配置了磁盘缓存时已合成的句子在回放时直接命中缓存
+
+SessionManager 按会话ID管理多个会话，超过 ttl 秒没有访问的会话视为被放弃，取消其预取任务。
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from . import tracing
+from .metrics import MetricsRegistry, default_registry
+from .scheduler import PRIORITY_DEFAULT, PRIORITY_INTERACTIVE, priority_context
+from .segmentation import split_sentences
+
+logger = logging.getLogger("tts-sdk")
+
+
+class SessionNotFound(KeyError):
+    """会话不存在或已过期"""
+
+
+class SentenceCancelled(Exception):
+    """等待中的句子因会话关闭或跳转到别处被取消"""
+
+
+def _consume_exception(task: asyncio.Future) -> None:
+    """预取任务可能在没有人等待时失败，取出异常避免"exception was never retrieved"日志"""
+    if not task.cancelled():
+        task.exception()
+
+
+class PlaybackSession:
+    """登记全部句子，按播放位置提前合成后面的句子"""
+
+    def __init__(
+        self,
+        client: Any,
+        sentences: Iterable[str],
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        lookahead: int = 2,
+        session_id: Optional[str] = None,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            client: TTSClient
+            sentences: 按播放顺序排列的句子，可以用 segmentation.split_sentences 从全文切分
+            voice: 语音名称，如不指定则使用客户端默认语音
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            lookahead: 在当前句之后提前合成的句数，0表示不预取
+            session_id: 会话ID，不指定则随机生成
+            metrics_registry: 指标注册表
+        """
+        self.client = client
+        self.sentences: List[str] = [s for s in sentences if s and s.strip()]
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+        self.pitch = pitch
+        self.lookahead = max(0, lookahead)
+        self.id = session_id or uuid.uuid4().hex
+        self.cursor = 0
+        self.closed = False
+        self.last_access = time.monotonic()
+        self._tasks: Dict[int, asyncio.Future] = {}
+
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._requests = registry.counter(
+            "tts_session_sentences_total",
+            "会话中被请求的句子数，result为hit（已预取完成）、pending（预取中）或miss（未预取）",
+            ["result"]
+        )
+        self._cancelled = registry.counter("tts_session_lookahead_cancelled_total", "因跳转或会话结束被取消的预取任务数")
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def _check_index(self, index: int) -> None:
+        if self.closed:
+            raise RuntimeError(f"会话 {self.id} 已关闭")
+        if not 0 <= index < len(self.sentences):
+            raise IndexError(f"句子序号 {index} 超出范围 [0, {len(self.sentences)})")
+
+    def _start(self, index: int, priority: str) -> asyncio.Future:
+        """开始合成第index句，已在合成或已成功完成时直接返回原任务"""
+        task = self._tasks.get(index)
+        if task is not None and not (task.done() and (task.cancelled() or task.exception() is not None)):
+            return task
+        # 合成任务属于会话而不是触发它的那次请求：不挂到该请求的追踪上，也不计入它的Server-Timing
+        with priority_context(priority), tracing.detached():
+            task = asyncio.ensure_future(self.client.text_to_speech(
+                self.sentences[index], self.voice, self.rate, self.volume, self.pitch
+            ))
+        task.add_done_callback(_consume_exception)
+        self._tasks[index] = task
+        return task
+
+    def seek(self, index: int) -> None:
+        """
+        把播放位置移到第index句：取消预取窗口外的任务，开始合成窗口内的句子
+
+        窗口为 [index, index + lookahead]，窗口外已完成的结果也一并丢弃。
+        """
+        self._check_index(index)
+        self.cursor = index
+        self.last_access = time.monotonic()
+        end = min(len(self.sentences), index + 1 + self.lookahead)
+        for i in list(self._tasks):
+            if index <= i < end:
+                continue
+            task = self._tasks.pop(i)
+            if not task.done():
+                task.cancel()
+                self._cancelled.inc()
+        self._start(index, PRIORITY_INTERACTIVE)
+        for i in range(index + 1, end):
+            self._start(i, PRIORITY_DEFAULT)
+
+    async def get(self, index: int) -> bytes:
+        """
+        取第index句的音频，同时把播放位置移到这里并预取后面的句子
+
+        调用方取消等待时（例如客户端断开）不会取消该句的合成，结果留给下一次请求。
+        等待期间会话被关闭或跳转到别处时抛出 SentenceCancelled。
+        """
+        self._check_index(index)
+        task = self._tasks.get(index)
+        if task is None:
+            result = "miss"
+        elif task.done() and not task.cancelled() and task.exception() is None:
+            result = "hit"
+        else:
+            result = "pending"
+        self._requests.inc(result=result)
+        self.seek(index)
+        task = self._tasks[index]
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # 调用方被取消，合成继续
+                raise
+            # 会话被关闭或跳转到别处，合成任务被取消
+            if self._tasks.get(index) is task:
+                self._tasks.pop(index, None)
+            raise SentenceCancelled(f"会话 {self.id} 第 {index} 句的合成已取消") from None
+        except Exception:
+            # 失败的任务不保留，下次请求重新合成
+            if self._tasks.get(index) is task:
+                self._tasks.pop(index, None)
+            raise
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """从当前播放位置开始按顺序产出各句音频"""
+        for index in range(self.cursor, len(self.sentences)):
+            yield await self.get(index)
+
+    def stats(self) -> Dict[str, Any]:
+        ready = [i for i, task in self._tasks.items() if task.done() and not task.cancelled() and task.exception() is None]
+        return {
+            "session_id": self.id,
+            "sentences": len(self.sentences),
+            "cursor": self.cursor,
+            "lookahead": self.lookahead,
+            "ready": sorted(ready),
+            "pending": sorted(i for i, task in self._tasks.items() if not task.done()),
+            "idle_seconds": round(time.monotonic() - self.last_access, 1),
+        }
+
+    async def close(self) -> None:
+        """取消所有还没完成的合成任务"""
+        self.closed = True
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+            self._cancelled.inc()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def __aenter__(self) -> "PlaybackSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+
+class SessionManager:
+    """按ID管理播放会话，过期或超出数量上限的会话被关闭"""
+
+    def __init__(
+        self,
+        client: Any,
+        ttl: float = 300.0,
+        max_sessions: int = 1000,
+        default_lookahead: int = 2,
+        sweep_interval: Optional[float] = None,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            client: TTSClient
+            ttl: 会话超过这么多秒没有访问即视为被放弃
+            max_sessions: 会话数上限，超出时关闭最久没有访问的会话
+            default_lookahead: 创建会话时未指定预取句数时使用的值
+            sweep_interval: start() 后每隔这么多秒清理一次过期会话，默认为 ttl/4，最长30秒
+            metrics_registry: 指标注册表
+        """
+        self.client = client
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self.default_lookahead = default_lookahead
+        self.metrics_registry = metrics_registry
+        self.sweep_interval = sweep_interval if sweep_interval is not None else min(30.0, max(1.0, ttl / 4))
+        self._task: Optional[asyncio.Task] = None
+        # 会话ID -> (会话, 所有者)，按最近访问排序
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._active = registry.gauge("tts_sessions", "当前的播放会话数")
+        self._expired = registry.counter("tts_sessions_expired_total", "因长时间没有访问或超出数量上限被关闭的会话数")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def start(self) -> None:
+        """启动后台清理，没有新请求时被放弃的会话也会按时关闭；需要在事件循环中调用"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.expire()
+            except Exception as e:
+                logger.warning("清理过期播放会话失败: %s", e)
+
+    async def create(
+        self,
+        text: Optional[str] = None,
+        sentences: Optional[Iterable[str]] = None,
+        owner: Optional[str] = None,
+        lookahead: Optional[int] = None,
+        **voice_options: Any
+    ) -> PlaybackSession:
+        """
+        创建会话并开始预取开头的句子
+
+        Args:
+            text: 全文，按句末标点切分成句子
+            sentences: 或直接给出句子列表
+            owner: 会话所有者（例如租户），get/close时必须一致
+            lookahead: 提前合成的句数
+            **voice_options: voice、rate、volume、pitch
+        """
+        await self.expire()
+        if sentences is None:
+            sentences = split_sentences(text or "")
+        session = PlaybackSession(
+            self.client, sentences,
+            lookahead=self.default_lookahead if lookahead is None else lookahead,
+            metrics_registry=self.metrics_registry,
+            **voice_options
+        )
+        if not len(session):
+            raise ValueError("会话中没有可合成的句子")
+        while len(self._sessions) >= self.max_sessions:
+            _, (oldest, _) = self._sessions.popitem(last=False)
+            self._expired.inc()
+            await oldest.close()
+        self._sessions[session.id] = (session, owner)
+        self._active.set(len(self._sessions))
+        # 从开头预取，第一次请求第0句时通常已经在合成中
+        session.seek(0)
+        return session
+
+    def get(self, session_id: str, owner: Optional[str] = None) -> PlaybackSession:
+        """按ID取会话，不存在、已过期或所有者不一致时抛出SessionNotFound"""
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[1] != owner or self._is_expired(entry[0]):
+            raise SessionNotFound(session_id)
+        self._sessions.move_to_end(session_id)
+        entry[0].last_access = time.monotonic()
+        return entry[0]
+
+    async def close(self, session_id: str, owner: Optional[str] = None) -> None:
+        """关闭会话并取消其预取任务"""
+        session = self.get(session_id, owner)
+        del self._sessions[session_id]
+        self._active.set(len(self._sessions))
+        await session.close()
+
+    def _is_expired(self, session: PlaybackSession) -> bool:
+        return time.monotonic() - session.last_access > self.ttl
+
+    async def expire(self) -> int:
+        """关闭所有过期的会话，返回关闭的数量"""
+        expired = [sid for sid, (session, _) in self._sessions.items() if self._is_expired(session)]
+        for sid in expired:
+            session, _ = self._sessions.pop(sid)
+            self._expired.inc()
+            logger.info("播放会话 %s 已过期，取消预取任务", sid)
+            await session.close()
+        if expired:
+            self._active.set(len(self._sessions))
+        return len(expired)
+
+    async def close_all(self) -> None:
+        """停止后台清理并关闭所有会话"""
+        await self.stop()
+        sessions = [session for session, _ in self._sessions.values()]
+        self._sessions.clear()
+        self._active.set(0)
+        for session in sessions:
+            await session.close()
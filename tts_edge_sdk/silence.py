@@ -0,0 +1,201 @@
+"""
+段边界静音裁剪
+
+上游每段音频的开头和结尾都带有一段静音，分段合成的几十段拼接后会多出数秒空白和
+几十KB无用的帧。这里不解码音频，只读取每帧的side info：一帧中哈夫曼编码数据的总比特数
+（part2_3_length）近似反映该帧的能量，静音帧几乎不占比特。段与段之间：
+
+- 前一段结尾只保留 gap 秒的静音帧（至少一帧，保留最后一个有声帧的MDCT重叠部分）
+- 后一段开头的静音帧全部去掉，但第一个有声帧通过比特池（main_data_begin）引用的
+  前面几帧会保留，保证它能正确解码
+
+第一段的开头和最后一段的结尾保持不变。
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+from .metrics import MetricsRegistry, default_registry
+from .mp3 import FrameHeader, is_xing_frame, iter_frames, parse_frame_header
+
+# main_data_begin 最大可以向前引用的字节数（MPEG-1为9位）
+_MAX_RESERVOIR = 511
+
+
+def side_info(data: bytes, offset: int, header: FrameHeader) -> Tuple[int, int, int]:
+    """
+    读取一帧的side info
+
+    Returns:
+        Tuple[int, int, int]: (main_data_begin, 各颗粒各声道part2_3_length之和, 颗粒数×声道数)
+    """
+    crc = 2 if header.raw[1] & 0x1 == 0 else 0
+    start = offset + 4 + crc
+    length = header.side_info_length
+    bits = int.from_bytes(data[start:start + length], "big")
+    total = length * 8
+    position = 0
+
+    def read(width: int) -> int:
+        nonlocal position
+        value = (bits >> (total - position - width)) & ((1 << width) - 1)
+        position += width
+        return value
+
+    channels = 1 if header.channel_mode == 3 else 2
+    if header.version == 3:
+        main_data_begin = read(9)
+        read(5 if channels == 1 else 3)  # private bits
+        read(4 * channels)                # scfsi
+        granules, granule_bits = 2, 59
+    else:
+        main_data_begin = read(8)
+        read(channels)                    # private bits
+        granules, granule_bits = 1, 63
+    coded_bits = 0
+    for _ in range(granules * channels):
+        coded_bits += read(12)            # part2_3_length
+        read(granule_bits - 12)
+    return main_data_begin, coded_bits, granules * channels
+
+
+def silence_frames(header: FrameHeader, seconds: float) -> bytes:
+    """
+    生成与header同格式、时长约为seconds的静音帧
+
+    帧头去掉CRC和填充位，side info和主数据全为0：所有颗粒的编码比特数为0，解码结果为数字静音。
+    """
+    count = int(round(seconds / header.duration))
+    if count <= 0:
+        return b""
+    raw = bytes((header.raw[0], header.raw[1] | 0x01, header.raw[2] & ~0x02 & 0xFF, header.raw[3]))
+    frame_length = parse_frame_header(raw).frame_length
+    return (raw + bytes(frame_length - 4)) * count
+
+
+class _Frame:
+    __slots__ = ("offset", "length", "duration", "main_data_begin", "area_start", "coded_bits", "silent")
+
+    def __init__(
+        self, offset: int, length: int, duration: float, main_data_begin: int,
+        area_start: int, coded_bits: int, silent: bool
+    ):
+        self.offset = offset
+        self.length = length
+        self.duration = duration
+        self.main_data_begin = main_data_begin
+        # 该帧主数据区在整段主数据流中的起始位置
+        self.area_start = area_start
+        self.coded_bits = coded_bits
+        self.silent = silent
+
+
+class SilenceTrimmer:
+    """裁剪段边界的静音帧，段与段之间保留固定长度的停顿"""
+
+    def __init__(
+        self,
+        gap: float = 0.15,
+        max_bits: int = 8,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            gap: 段与段之间保留的静音秒数
+            max_bits: 平均每个颗粒每个声道编码比特数不超过该值的帧视为静音，
+                数字静音为0，调大会把更弱的底噪也当作静音
+            metrics_registry: 指标注册表
+        """
+        if gap < 0:
+            raise ValueError("gap 不能为负数")
+        self.gap = gap
+        self.max_bits = max_bits
+        registry = metrics_registry if metrics_registry is not None else default_registry
+        self._trimmed_seconds = registry.counter("tts_silence_trimmed_seconds_total", "段边界裁剪掉的静音时长")
+        self._trimmed_bytes = registry.counter("tts_silence_trimmed_bytes_total", "段边界裁剪掉的静音帧字节数")
+
+    def _frames(self, data: bytes) -> List[_Frame]:
+        frames = []
+        area_position = 0
+        for offset, header in iter_frames(data):
+            if not frames and is_xing_frame(data, offset, header):
+                continue
+            main_data_begin, coded_bits, channels = side_info(data, offset, header)
+            crc = 2 if header.raw[1] & 0x1 == 0 else 0
+            area = header.frame_length - 4 - crc - header.side_info_length
+            frames.append(_Frame(
+                offset, header.frame_length, header.duration, main_data_begin,
+                area_position, coded_bits, coded_bits <= self.max_bits * channels
+            ))
+            area_position += area
+        return frames
+
+    @staticmethod
+    def _safe_start(frames: Sequence[_Frame], first_loud: int) -> int:
+        """从first_loud往前找到最晚的起点，使保留下来的帧通过比特池引用的数据都在保留范围内"""
+        start = first_loud
+        while start > 0:
+            floor = frames[start].area_start
+            needed = floor
+            for frame in frames[start:]:
+                if frame.area_start - _MAX_RESERVOIR >= floor:
+                    break
+                # 不含编码数据的帧不读取比特池
+                if frame.coded_bits:
+                    needed = min(needed, frame.area_start - frame.main_data_begin)
+            if needed >= floor:
+                break
+            while start > 0 and frames[start].area_start > needed:
+                start -= 1
+        return start
+
+    def trim(self, data: bytes, leading: bool = True, trailing: bool = True) -> bytes:
+        """
+        裁剪一段音频开头和/或结尾的静音帧
+
+        Args:
+            data: 一段MP3音频
+            leading: 是否裁剪开头（不用于第一段）
+            trailing: 是否裁剪结尾，保留gap秒（不用于最后一段）
+
+        Returns:
+            bytes: 裁剪后的音频帧，不含标签和Xing帧；全是静音时原样返回
+        """
+        frames = self._frames(data)
+        loud = [i for i, frame in enumerate(frames) if not frame.silent]
+        if not loud:
+            return data
+        start = self._safe_start(frames, loud[0]) if leading else 0
+        end = len(frames)
+        if trailing:
+            keep = 0
+            kept_seconds = 0.0
+            # 至少保留一帧静音，最后一个有声帧的尾音在下一帧中重叠输出
+            for frame in frames[loud[-1] + 1:]:
+                if keep > 0 and kept_seconds + frame.duration > self.gap + 1e-9:
+                    break
+                keep += 1
+                kept_seconds += frame.duration
+            end = loud[-1] + 1 + keep
+        if start == 0 and end == len(frames) and frames[0].offset == 0 and \
+                frames[-1].offset + frames[-1].length == len(data):
+            return data
+        kept = frames[start:end]
+        trimmed_seconds = sum(frame.duration for frame in frames) - sum(frame.duration for frame in kept)
+        trimmed = bytes(data[kept[0].offset:kept[-1].offset + kept[-1].length])
+        if len(trimmed) != sum(frame.length for frame in kept):
+            # 帧之间有无效字节时逐帧拼接
+            trimmed = b"".join(data[frame.offset:frame.offset + frame.length] for frame in kept)
+        self._trimmed_seconds.inc(trimmed_seconds)
+        self._trimmed_bytes.inc(max(0, len(data) - len(trimmed)))
+        return trimmed
+
+    def trim_segments(self, segments: Sequence[bytes]) -> List[bytes]:
+        """裁剪相邻段之间的静音，第一段开头和最后一段结尾保持不变"""
+        last = len(segments) - 1
+        return [
+            self.trim(segment, leading=index > 0, trailing=index < last) if segment else segment
+            for index, segment in enumerate(segments)
+        ]
+
+    def __repr__(self) -> str:
+        return f"SilenceTrimmer(gap={self.gap}, max_bits={self.max_bits})"
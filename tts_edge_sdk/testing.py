@@ -0,0 +1,192 @@
+"""
+本地上游替身服务
+
+FakeEdgeServer 在本机启动一个WebSocket服务，按Edge朗读服务相同的帧格式
+响应 speech.config / ssml 请求：先发 turn.start，再发 WordBoundary 元数据和
+静音MP3帧，最后发 turn.end。握手延迟、首字节延迟和每字符合成耗时都可配置，
+用于在没有外网的环境下验证连接池、分段策略和基准测试。
+
+    async with FakeEdgeServer(first_byte_delay=0.2) as server:
+        pool = UpstreamPool(url=server.url)
+        client = TTSClient(connection_pool=pool)
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+
+from .pool import parse_headers
+
+# audio-24khz-48kbitrate-mono-mp3 的静音帧：MPEG-2 Layer III，每帧144字节，24毫秒
+SILENT_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+FRAME_DURATION_TICKS = 240_000  # 24毫秒，单位为100纳秒
+
+_SSML_TEXT = re.compile(r"<prosody[^>]*>(.*)</prosody>", re.S)
+_WORD = re.compile(r"[一-鿿]|[^\s一-鿿]+")
+
+
+def _unescape(text: str) -> str:
+    return (text.replace("&lt;", "<").replace("&gt;", ">")
+            .replace("&quot;", '"').replace("&apos;", "'").replace("&amp;", "&"))
+
+
+class FakeEdgeServer:
+    """说Edge朗读协议的本地WebSocket替身服务"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        handshake_delay: float = 0.0,
+        first_byte_delay: float = 0.05,
+        seconds_per_char: float = 0.0005,
+        frames_per_char: int = 8,
+        frames_per_message: int = 16,
+        concurrency_penalty: float = 0.0
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            handshake_delay: 每次新建连接的额外延迟，模拟TLS握手
+            first_byte_delay: 每轮请求到第一个音频帧之间的延迟
+            seconds_per_char: 每个字符的合成耗时，按帧均匀分摊
+            frames_per_char: 每个字符生成的音频帧数（每帧24毫秒）
+            frames_per_message: 每条二进制消息携带的帧数
+            concurrency_penalty: 每多一个同时进行的请求，首字节和每字符耗时增加的比例，
+                模拟上游在高并发下变慢
+        """
+        self.host = host
+        self.port = port
+        self.handshake_delay = handshake_delay
+        self.first_byte_delay = first_byte_delay
+        self.seconds_per_char = seconds_per_char
+        self.frames_per_char = frames_per_char
+        self.frames_per_message = frames_per_message
+        self.concurrency_penalty = concurrency_penalty
+        self.active_turns = 0
+        self.connections = 0
+        self.turns = 0
+        self.texts: List[str] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._sockets: List[web.WebSocketResponse] = []
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/consumer/speech/synthesize/readaloud/edge/v1?TrustedClientToken=test"
+
+    async def start(self) -> "FakeEdgeServer":
+        app = web.Application()
+        app.router.add_get("/consumer/speech/synthesize/readaloud/edge/v1", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def drop_connections(self) -> None:
+        """关闭所有已建立的连接，模拟服务端回收空闲连接"""
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def __aenter__(self) -> "FakeEdgeServer":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
+
+    def word_boundaries(self, text: str) -> List[Tuple[int, int, str]]:
+        """返回文本中每个词的 (offset, duration, text)，时间单位为100纳秒"""
+        result = []
+        offset = 0
+        for match in _WORD.finditer(text):
+            word = match.group(0)
+            duration = len(word) * self.frames_per_char * FRAME_DURATION_TICKS
+            result.append((offset, duration, word))
+            offset += duration
+        return result
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self._sockets.append(ws)
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                raw = message.data.encode("utf-8")
+                sep = raw.find(b"\r\n\r\n")
+                headers = parse_headers(raw[:sep])
+                if headers.get(b"Path") != b"ssml":
+                    continue
+                match = _SSML_TEXT.search(raw[sep + 4:].decode("utf-8"))
+                text = _unescape(match.group(1)) if match else ""
+                await self._turn(ws, headers[b"X-RequestId"].decode(), text)
+        finally:
+            self._sockets.remove(ws)
+        return ws
+
+    async def _send_text(self, ws: web.WebSocketResponse, request_id: str, path: str, body: Any) -> None:
+        await ws.send_str(
+            f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{json.dumps(body, ensure_ascii=False)}"
+        )
+
+    async def _turn(self, ws: web.WebSocketResponse, request_id: str, text: str) -> None:
+        self.active_turns += 1
+        try:
+            await self._run_turn(ws, request_id, text, 1 + self.concurrency_penalty * (self.active_turns - 1))
+        finally:
+            self.active_turns -= 1
+
+    async def _run_turn(self, ws: web.WebSocketResponse, request_id: str, text: str, slowdown: float) -> None:
+        self.turns += 1
+        self.texts.append(text)
+        await self._send_text(ws, request_id, "turn.start", {"context": {"serviceTag": "fake"}})
+        await asyncio.sleep(self.first_byte_delay * slowdown)
+
+        boundaries = self.word_boundaries(text)
+        metadata = [
+            {"Type": "WordBoundary", "Data": {"Offset": offset, "Duration": duration, "text": {"Text": word}}}
+            for offset, duration, word in boundaries
+        ]
+        total_frames = max(1, len(text) * self.frames_per_char)
+        header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+        prefix = len(header).to_bytes(2, "big") + header
+        per_frame = self.seconds_per_char * slowdown / self.frames_per_char if self.frames_per_char else 0.0
+
+        sent = 0
+        next_meta = 0
+        while sent < total_frames:
+            count = min(self.frames_per_message, total_frames - sent)
+            # 元数据在对应音频之前发出，与真实服务一致
+            end_ticks = (sent + count) * FRAME_DURATION_TICKS
+            batch = []
+            while next_meta < len(metadata) and metadata[next_meta]["Data"]["Offset"] < end_ticks:
+                batch.append(metadata[next_meta])
+                next_meta += 1
+            if batch:
+                await self._send_text(ws, request_id, "audio.metadata", {"Metadata": batch})
+            if per_frame:
+                await asyncio.sleep(per_frame * count)
+            await ws.send_bytes(prefix + SILENT_FRAME * count)
+            sent += count
+
+        await self._send_text(ws, request_id, "turn.end", {})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connections": self.connections, "turns": self.turns, "open": len(self._sockets)}
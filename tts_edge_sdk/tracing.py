@@ -0,0 +1,265 @@
+"""
+轻量级请求追踪 - 记录每个请求各阶段耗时的span树
+
+SDK在排队、分段、上游首字节、上游流式接收、合并、编码等阶段打点，
+API服务据此生成 Server-Timing 响应头；导出器接口与OpenTelemetry的
+SpanExporter保持一致，可以直接对接OTel或在测试中用内存收集器检查。
+"""
+
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("tts-sdk")
+
+# 当前活动的span，asyncio任务创建时会自动复制上下文
+_current_span: contextvars.ContextVar = contextvars.ContextVar("tts_current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    """一个计时区间，可以嵌套子span"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent", "attributes", "children",
+        "_start", "_end", "_anchor_ns", "_anchor_perf"
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes: Any):
+        self.name = name
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.children: List["Span"] = []
+        self.span_id = _new_id(8)
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        if parent is None:
+            self.trace_id = _new_id(16)
+            self._anchor_ns = time.time_ns()
+            self._anchor_perf = self._start
+        else:
+            self.trace_id = parent.trace_id
+            self._anchor_ns = parent._anchor_ns
+            self._anchor_perf = parent._anchor_perf
+            parent.children.append(self)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def finish(self) -> None:
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def finished(self) -> bool:
+        return self._end is not None
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒），未结束的span按当前时间计算"""
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    @property
+    def start_time_unix_nano(self) -> int:
+        return self._anchor_ns + int((self._start - self._anchor_perf) * 1e9)
+
+    @property
+    def end_time_unix_nano(self) -> int:
+        end = self._end if self._end is not None else time.perf_counter()
+        return self._anchor_ns + int((end - self._anchor_perf) * 1e9)
+
+    def walk(self) -> Iterator["Span"]:
+        """深度优先遍历自身及所有子span"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为便于JSON序列化的树结构，时间单位为毫秒"""
+        result: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self._start - self._anchor_perf) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.attributes:
+            result["attributes"] = dict(self.attributes)
+        if self.children:
+            result["children"] = [child.to_dict() for child in self.children]
+        return result
+
+    def to_otel_dict(self) -> Dict[str, Any]:
+        """按OTLP字段命名输出单个span（不含子span）"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "attributes": dict(self.attributes),
+        }
+
+
+class SpanExporter:
+    """span导出器基类，接口与OpenTelemetry SpanExporter一致"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """把导出的span保存在内存中，主要用于测试"""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class OpenTelemetrySpanExporter(SpanExporter):
+    """把span树重放到OpenTelemetry tracer中，需要安装opentelemetry-api"""
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError as e:
+            raise ImportError("使用OpenTelemetrySpanExporter需要安装opentelemetry-api") from e
+        self._otel_trace = otel_trace
+        self._tracer = tracer or otel_trace.get_tracer("tts_edge_sdk")
+
+    def export(self, spans: List[Span]) -> None:
+        otel_spans: Dict[str, Any] = {}
+        for span in spans:
+            context = None
+            if span.parent is not None and span.parent.span_id in otel_spans:
+                context = self._otel_trace.set_span_in_context(otel_spans[span.parent.span_id])
+            otel_span = self._tracer.start_span(
+                span.name,
+                context=context,
+                attributes={k: v for k, v in span.attributes.items() if v is not None},
+                start_time=span.start_time_unix_nano
+            )
+            otel_spans[span.span_id] = otel_span
+        for span in reversed(spans):
+            otel_spans[span.span_id].end(end_time=span.end_time_unix_nano)
+
+
+class Trace:
+    """一次请求的追踪记录，持有根span"""
+
+    def __init__(self, name: str, exporter: Optional[SpanExporter] = None, **attributes: Any):
+        self.root = Span(name, **attributes)
+        self.exporter = exporter
+
+    def finish(self) -> None:
+        self.root.finish()
+        if self.exporter is not None:
+            try:
+                self.exporter.export(list(self.root.walk()))
+            except Exception as e:
+                logger.error("导出追踪数据失败: %s", e)
+
+    def phase_durations(self) -> List[Tuple[str, float]]:
+        """
+        计算每个阶段名的墙钟耗时（秒）
+
+        并行文本段的同名span按时间区间取并集，因此结果表示
+        "至少有一个文本段处于该阶段"的时间，不会超过请求总耗时。
+        """
+        intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for span in self.root.walk():
+            if span is self.root or span.children:
+                continue
+            end = span._end if span._end is not None else time.perf_counter()
+            intervals.setdefault(span.name, []).append((span._start, end))
+        result = []
+        for name, spans in intervals.items():
+            spans.sort()
+            total = 0.0
+            cur_start, cur_end = spans[0]
+            for start, end in spans[1:]:
+                if start > cur_end:
+                    total += cur_end - cur_start
+                    cur_start, cur_end = start, end
+                else:
+                    cur_end = max(cur_end, end)
+            total += cur_end - cur_start
+            result.append((name, total))
+        return result
+
+    def server_timing(self) -> str:
+        """生成 Server-Timing 响应头的值"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phase_durations()]
+        entries.append(f"total;dur={self.root.duration * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.root.to_dict()
+
+
+def current_span() -> Optional[Span]:
+    """返回当前上下文中的span，没有活动追踪时返回None"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, exporter: Optional[SpanExporter] = None, **attributes: Any) -> Iterator[Trace]:
+    """开始一次追踪，代码块内SDK的打点都会挂到这棵span树上"""
+    trace = Trace(name, exporter, **attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """在代码块内清除当前span，用于创建不属于当前请求、可能比它活得更久的后台任务"""
+    token = _current_span.set(None)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """在当前span下记录一个子阶段；没有活动追踪时不做任何事"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """创建一个不进入上下文的叶子span，需要调用方手动finish"""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(name, parent, **attributes)
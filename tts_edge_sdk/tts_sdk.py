@@ -1,100 +1,161 @@
 import edge_tts
 import asyncio
 import base64
-from typing import Optional, Dict, List, Any, Union, Callable
+from typing import Optional, Dict, List, Any, Union, Callable, Iterable, AsyncIterable, AsyncIterator, Iterator, Tuple
 import logging
-from pydub import AudioSegment
-import io
 import time
-import tempfile
 import os
-import sys
-import subprocess
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+import uuid
+import atexit
+import threading
+import functools
+from collections import deque
+import contextvars
+from contextlib import contextmanager
+
+from . import tracing
+from . import deadline
+from .events import EventEmitter, Subscription
+from .cache import DiskCache
+from .checkpoint import ChunkCheckpoint
+from .mp3 import Mp3StreamWriter, audio_frames
+from .autotune import Autotuner, AUTO, OBJECTIVE_TTFB, OBJECTIVE_WALL
+from .segmentation import SegmentRamp, segment_stream, split_sentences
+from .silence import SilenceTrimmer, silence_frames
+from . import script as script_format
+from .session import PlaybackSession
+from .batching import MicroBatcher
+from .deadline import DeadlineExceeded, deadline_context
+from .breaker import CircuitBreaker, CircuitOpenError
+from .scheduler import FairScheduler, current_priority, priority_context, PRIORITY_DEFAULT, PRIORITY_BULK
+from .bulk import (
+    BulkItemResult, BulkResult, parse_item, is_valid_audio_file, atomic_write, atomic_copy,
+    STATUS_OK, STATUS_SKIPPED, STATUS_FAILED
 )
+from .pool import UpstreamPool
+from .metrics import MetricsRegistry, TTSMetrics
+from .tracing import SpanExporter
+from .logging_utils import CHUNK_LOGGER_NAME
+
+# SDK只获取logger，不修改全局日志配置；应用可通过 logging_utils.setup_logging 配置异步日志
 logger = logging.getLogger("tts-sdk")
+# 逐段日志单独使用子logger，便于采样和限速
+chunk_logger = logging.getLogger(CHUNK_LOGGER_NAME)
 
-# 添加事件通知系统
-class EventEmitter:
-    """简单的事件发射器，用于通知外部监听器SDK内部事件"""
-    
-    def __init__(self):
-        self._listeners = {}
-    
-    def on(self, event: str, callback: Callable) -> None:
-        """注册事件监听器"""
-        if event not in self._listeners:
-            self._listeners[event] = []
-        self._listeners[event].append(callback)
-    
-    def emit(self, event: str, *args, **kwargs) -> None:
-        """触发事件，并调用所有监听该事件的回调函数"""
-        if event in self._listeners:
-            for callback in self._listeners[event]:
-                try:
-                    callback(*args, **kwargs)
-                except Exception as e:
-                    logger.error(f"事件回调执行错误: {str(e)}")
+# 当前请求ID，随asyncio任务上下文传递给各文本段
+_request_id: contextvars.ContextVar = contextvars.ContextVar("tts_request_id", default="")
 
-# 创建全局事件发射器
+# 全局事件发射器，仅供模块级 on_merge_start/on_merge_end 兼容使用，
+# 新代码应通过 TTSClient.on 订阅客户端自己的事件
 events = EventEmitter()
 
-# 检查pydub和ffmpeg是否可用
-PYDUB_AVAILABLE = False
-FFMPEG_AVAILABLE = False
-
-try:
-    import pydub
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-    
-    # 检查ffmpeg是否可用
-    try:
-        subprocess.run(
-            ["ffmpeg", "-version"], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            check=False,
-            timeout=2
-        )
-        FFMPEG_AVAILABLE = True
-    except (FileNotFoundError, subprocess.SubprocessError, subprocess.TimeoutExpired):
-        logger.warning("警告: 未找到ffmpeg，部分音频处理功能将受限")
-        logger.warning("如需完整功能，请安装ffmpeg: https://ffmpeg.org/download.html")
-except ImportError:
-    logger.warning("警告: 未安装pydub，无法使用高级音频处理功能")
-    logger.warning("如需完整功能，请安装pydub: pip install pydub")
 
 class TTSClient:
     """文字转语音SDK客户端"""
     
-    def __init__(self, default_voice: str = "zh-CN-XiaoxiaoNeural"):
+    def __init__(
+        self,
+        default_voice: str = "zh-CN-XiaoxiaoNeural",
+        max_retries: int = 0,
+        metrics_registry: Optional[MetricsRegistry] = None,
+        span_exporter: Optional[SpanExporter] = None,
+        cache: Optional[DiskCache] = None,
+        connection_pool: Optional[UpstreamPool] = None,
+        checkpoint_dir: Optional[str] = None,
+        autotuner: Optional[Autotuner] = None,
+        segment_ramp: Optional[SegmentRamp] = None,
+        micro_batcher: Optional[MicroBatcher] = None,
+        scheduler: Optional[FairScheduler] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        silence_trimmer: Optional[SilenceTrimmer] = None
+    ):
         """
         初始化TTS客户端
         
         Args:
             default_voice: 默认语音，如不指定则使用中文女声
+            max_retries: 单个文本段上游合成失败后的最大重试次数
+            metrics_registry: 指标注册表，不指定则使用全局默认注册表
+            span_exporter: 追踪导出器，调用方没有开启追踪时由SDK为每个请求生成span树并导出
+            cache: 磁盘音频缓存，相同文本和语音参数的请求直接返回缓存结果
+            connection_pool: 上游WebSocket连接池，指定后各文本段复用保温的连接，
+                不指定则每段新建一条连接（edge_tts默认行为）
+            checkpoint_dir: 分段检查点目录，指定后分段合成的每一段完成即写入磁盘，
+                同一请求失败后重新执行只合成缺失的段
+            autotuner: chunk_size或concurrency传入"auto"时使用的调优器，不指定则自动创建，
+                并发上限取连接池大小（没有连接池时为8）
+            segment_ramp: stream()使用的分段参数，首段短、后续段逐段增长，不指定则使用默认值
+            micro_batcher: 短文本微批处理器，指定后短时间内到达的、参数相同的短文本合并成
+                一次上游合成再按词边界切回各自的音频，不指定则每段单独合成
+            scheduler: 上游槽位调度器，指定后每次上游调用先按优先级和租户加权公平排队，
+                租户和优先级通过 scheduler.tenant_context / priority_context 指定
+            breaker: 上游熔断器，指定后上游失败率或慢调用比例过高时直接拒绝新的上游调用，
+                缓存命中的请求不受影响，get_voices 返回最近一次成功获取的语音列表
+            silence_trimmer: 段边界静音裁剪，指定后分段合成和流式输出时去掉相邻段之间多余的
+                静音帧，段间只保留固定长度的停顿，各段按帧直接拼接
         """
         self.default_voice = default_voice
-        logger.info(f"TTS客户端初始化，默认语音: {default_voice}")
+        self.max_retries = max(0, max_retries)
+        self.metrics = TTSMetrics(metrics_registry)
+        self.span_exporter = span_exporter
+        self.cache = cache
+        self.connection_pool = connection_pool
+        self.checkpoint_dir = checkpoint_dir
+        self.autotuner = autotuner or Autotuner(
+            max_concurrency=connection_pool.max_size if connection_pool is not None else 8
+        )
+        self.segment_ramp = segment_ramp or SegmentRamp()
+        self.micro_batcher = micro_batcher
+        self.scheduler = scheduler
+        self.breaker = breaker
+        self.silence_trimmer = silence_trimmer
+        # 最近一次成功获取的语音列表，上游不可用时返回它
+        self._last_voices: Optional[List[Dict[str, Any]]] = None
+        self.events = EventEmitter()
+        logger.info("TTS客户端初始化，默认语音: %s", default_voice)
+    
+    def on(self, event: str, callback: Callable) -> Subscription:
+        """
+        订阅客户端事件
+        
+        Args:
+            event: 事件名，如 merge_start、merge_end、chunk_start、chunk_end、retry、cache_hit
+            callback: 回调函数，可以是普通函数或异步函数
+            
+        Returns:
+            Subscription: 订阅句柄，调用unsubscribe()或退出with代码块即取消订阅
+        """
+        return self.events.on(event, callback)
+    
+    def _emit(self, event: str, *args, **kwargs) -> None:
+        """向客户端监听器以及兼容用的全局监听器发出事件"""
+        self.events.emit(event, *args, **kwargs)
+        events.emit(event, *args, **kwargs)
     
     async def get_voices(self) -> List[Dict[str, Any]]:
         """
         获取所有可用的语音列表
         
+        上游不可用或熔断时返回最近一次成功获取的列表，从未获取成功时抛出异常。
+        
         Returns:
             List[Dict[str, Any]]: 语音列表
         """
         try:
-            voices = await edge_tts.list_voices()
-            logger.info(f"获取到 {len(voices)} 个可用语音")
+            if self.breaker is not None:
+                async with self.breaker.guard():
+                    voices = await edge_tts.list_voices()
+            else:
+                voices = await edge_tts.list_voices()
+            logger.info("获取到 %d 个可用语音", len(voices))
+            self._last_voices = voices
             return voices
         except Exception as e:
-            logger.error(f"获取语音列表失败: {str(e)}")
+            if self._last_voices is not None:
+                logger.warning("获取语音列表失败，返回上次获取的 %d 个语音: %s", len(self._last_voices), e)
+                return self._last_voices
+            logger.error("获取语音列表失败: %s", e)
             raise e
     
     async def _process_text_chunk(
@@ -103,23 +164,153 @@ class TTSClient:
         voice: str,
         rate: str = "+0%",
         volume: str = "+0%",
-        pitch: str = "+0Hz"
+        pitch: str = "+0Hz",
+        index: int = 0
     ) -> bytes:
-        """处理单个文本段"""
-        communicate = edge_tts.Communicate(
-            text=text,
-            voice=voice,
-            rate=rate,
-            volume=volume,
-            pitch=pitch
-        )
-        # 使用临时文件来处理音频数据
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-            await communicate.save(temp_file.name)
-            with open(temp_file.name, 'rb') as f:
-                audio_data = f.read()
-            os.unlink(temp_file.name)  # 删除临时文件
-            return audio_data
+        """处理单个文本段，失败时按max_retries重试"""
+        request_id = _request_id.get()
+        self._emit("chunk_start", request_id, index, len(text))
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            # 每次分发和重试前检查剩余预算，来不及完成的段不再发出上游调用
+            deadline.check("dispatch" if attempt == 0 else "retry", self._estimate_chunk_seconds(len(text)))
+            try:
+                if self.micro_batcher is not None and self.micro_batcher.accepts(text):
+                    audio_data = await self.micro_batcher.submit(
+                        text, voice, rate, volume, pitch, self._synthesize_upstream
+                    )
+                else:
+                    audio_data = await self._synthesize_upstream(text, voice, rate, volume, pitch)
+                break
+            except asyncio.CancelledError:
+                self.metrics.cancelled_chunks.inc()
+                chunk_logger.info("文本段 %d 的合成已取消", index)
+                raise
+            except (DeadlineExceeded, CircuitOpenError):
+                # 预算耗尽或上游熔断时重试也不会成功
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.metrics.retries.inc()
+                self._emit("retry", request_id, index, attempt, e)
+                chunk_logger.warning("文本段 %d 合成失败，第%d次重试: %s", index, attempt, e)
+        self._emit("chunk_end", request_id, index, len(audio_data), time.perf_counter() - start_time)
+        return audio_data
+    
+    def _estimate_chunk_seconds(self, chars: int) -> float:
+        """有截止时间时按延迟模型预测一段的上游耗时，模型观测不足时不做预测"""
+        if deadline.current_deadline() is None:
+            return 0.0
+        inflight = int(self.metrics.upstream_inflight.value()) + 1
+        return self.autotuner.estimate(chars, inflight) or 0.0
+    
+    async def probe(self, text: str = "你好", voice: Optional[str] = None, timeout: float = 10.0) -> float:
+        """
+        直接调用一次上游合成，用于健康检查
+        
+        不经过缓存、微批处理、调度器和熔断器，反映上游本身是否可用。
+        
+        Returns:
+            float: 合成耗时（秒）
+        """
+        start_time = time.perf_counter()
+        with deadline_context(timeout):
+            audio = await self._call_upstream(text, voice or self.default_voice, "+0%", "+0%", "+0Hz", None)
+        if not audio:
+            raise RuntimeError("上游探测没有返回音频数据")
+        return time.perf_counter() - start_time
+    
+    async def _synthesize_upstream(
+        self,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        boundaries: Optional[List[Tuple[int, int, str]]] = None
+    ) -> bytes:
+        """调用上游服务合成一个文本段，直接在内存中收集音频流；boundaries不为None时收集词边界"""
+        if self.breaker is not None:
+            # 熔断时在排队之前就直接失败，不占用上游槽位
+            self.breaker.before_call()
+        if self.scheduler is not None:
+            # 先按租户公平排队拿到上游槽位
+            try:
+                with tracing.span("upstream_slot"):
+                    await self.scheduler.acquire(len(text))
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release_probe()
+                raise
+        try:
+            if self.breaker is not None:
+                # 只统计上游调用本身的耗时，排队时间不算慢调用
+                async with self.breaker.observe():
+                    return await self._call_upstream(text, voice, rate, volume, pitch, boundaries)
+            return await self._call_upstream(text, voice, rate, volume, pitch, boundaries)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release()
+    
+    async def _call_upstream(
+        self,
+        text: str,
+        voice: str,
+        rate: str,
+        volume: str,
+        pitch: str,
+        boundaries: Optional[List[Tuple[int, int, str]]]
+    ) -> bytes:
+        if self.connection_pool is not None:
+            stream = self.connection_pool.stream(text, voice, rate, volume, pitch)
+        else:
+            stream = edge_tts.Communicate(
+                text=text,
+                voice=voice,
+                rate=rate,
+                volume=volume,
+                pitch=pitch
+            ).stream()
+        audio_parts = []
+        start_time = time.perf_counter()
+        first_byte = False
+        ttfb = None
+        phase = tracing.start_span("upstream_ttfb", chars=len(text))
+        self.metrics.upstream_inflight.inc()
+        inflight = self.metrics.upstream_inflight.value()
+        
+        async def receive() -> None:
+            nonlocal first_byte, ttfb, phase
+            async for message in stream:
+                if message["type"] == "audio":
+                    if not first_byte:
+                        first_byte = True
+                        ttfb = time.perf_counter() - start_time
+                        self.metrics.upstream_ttfb.observe(ttfb)
+                        if phase is not None:
+                            phase.finish()
+                            phase = tracing.start_span("upstream_stream")
+                    audio_parts.append(message["data"])
+                elif message["type"] == "WordBoundary" and boundaries is not None:
+                    boundaries.append((message["offset"], message["duration"], message["text"]))
+        
+        try:
+            # 有截止时间时上游合成最多只等剩余的预算
+            await deadline.wait_for(receive(), "upstream")
+        finally:
+            # 出错或被取消时立即关闭流，连接池据此及时收回连接
+            await stream.aclose()
+            self.metrics.upstream_inflight.dec()
+            if phase is not None:
+                phase.finish()
+        elapsed = time.perf_counter() - start_time
+        self.metrics.upstream_latency.observe(elapsed)
+        self.metrics.chunks.inc()
+        self.autotuner.observe(len(text), inflight, elapsed, ttfb)
+        return b"".join(audio_parts)
     
     async def _process_long_text(
         self,
@@ -132,165 +323,163 @@ class TTSClient:
         concurrency: int = 3
     ) -> bytes:
         """分段并行处理长文本"""
-        # 按标点符号分段
-        chunks = []
-        current_chunk = ""
-        
-        # 常见中文和英文标点符号
-        sentence_end_marks = ["。", "！", "？", "；", ".", "!", "?", ";"]
+        with tracing.span("segment"):
+            chunks = self._split_text(text, chunk_size)
         
-        # 确保chunk_size不为0
-        chunk_size = max(chunk_size, 500)
+        logger.info("长文本被分为 %d 段进行处理，平均段长: %.1f 字符", len(chunks), len(text) / max(1, len(chunks)))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("各段长度: %s", [len(c) for c in chunks])
         
-        # 如果文本长度小于chunk_size的1.5倍，则不分段
-        if len(text) < chunk_size * 1.5:
-            chunks = [text]
-        else:
-            for char in text:
-                current_chunk += char
-                
-                # 如果遇到句末标点并且当前段长度超过最小段落大小，则考虑是否分段
-                if char in sentence_end_marks and len(current_chunk) >= min(200, chunk_size//5):
-                    # 如果当前段落长度超过了chunk_size或接近chunk_size的80%，则分段
-                    if len(current_chunk) >= chunk_size * 0.8:
-                        chunks.append(current_chunk)
-                        current_chunk = ""
-            
-            # 添加最后一段
-            if current_chunk:
-                chunks.append(current_chunk)
-        
-        logger.info(f"长文本被分为 {len(chunks)} 段进行处理，平均段长: {sum(len(c) for c in chunks)/max(1, len(chunks)):.1f} 字符")
-        logger.info(f"各段长度: {[len(c) for c in chunks]}")
+        checkpoint = None
+        restored: Dict[int, str] = {}
+        if self.checkpoint_dir and len(chunks) > 1:
+            checkpoint = ChunkCheckpoint(self.checkpoint_dir, text, chunks, voice, rate, volume, pitch)
+            restored = await self._run_blocking(checkpoint.load)
         
         # 创建一个信号量来限制并发任务数
         semaphore = asyncio.Semaphore(concurrency)
         
-        async def process_with_semaphore(chunk: str) -> bytes:
-            async with semaphore:
-                logger.info(f"开始处理段落: 长度={len(chunk)}字符, 起始={chunk[:20]}...")
-                chunk_data = await self._process_text_chunk(chunk, voice, rate, volume, pitch)
-                logger.info(f"段落处理完成: 音频大小={len(chunk_data)}字节")
+        async def process_with_semaphore(index: int, chunk: str) -> bytes:
+            if index in restored:
+                try:
+                    chunk_data = await self._run_blocking(ChunkCheckpoint.read, restored[index])
+                    self.metrics.checkpoint_restored.inc()
+                    return chunk_data
+                except OSError as e:
+                    logger.warning("读取检查点分段 %d 失败，重新合成: %s", index, e)
+            with tracing.span("chunk", index=index, chars=len(chunk)):
+                self.metrics.queue_depth.inc()
+                try:
+                    with tracing.span("queue"):
+                        await semaphore.acquire()
+                finally:
+                    self.metrics.queue_depth.dec()
+                try:
+                    chunk_logger.info("开始处理段落: 长度=%d字符, 起始=%.20s...", len(chunk), chunk)
+                    chunk_data = await self._process_text_chunk(chunk, voice, rate, volume, pitch, index)
+                    chunk_logger.info("段落处理完成: 音频大小=%d字节", len(chunk_data))
+                finally:
+                    semaphore.release()
+                if checkpoint is not None and chunk_data:
+                    await self._run_blocking(checkpoint.save, index, chunk_data)
                 return chunk_data
         
-        # 并行处理所有文本段
+        # 并行处理所有文本段；任意一段失败或请求被取消时，立即取消其余还在排队或合成的段，
+        # 不再为已经用不到的结果占用上游
         start_time = time.time()
-        tasks = [process_with_semaphore(chunk) for chunk in chunks]
-        results = await asyncio.gather(*tasks)
+        tasks = [asyncio.ensure_future(process_with_semaphore(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
         elapsed = time.time() - start_time
         
-        logger.info(f"并行处理完成: {len(chunks)} 段文本, 总时间: {elapsed:.2f}秒, 平均每段: {elapsed/max(1, len(chunks)):.2f}秒")
-        logger.info(f"各段音频大小: {[len(r) for r in results]}字节")
+        logger.info("并行处理完成: %d 段文本, 总时间: %.2f秒, 平均每段: %.2f秒", len(chunks), elapsed, elapsed / max(1, len(chunks)))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("各段音频大小: %s字节", [len(r) for r in results])
         
-        # 使用直接拼接作为后备方案
-        all_audio_data = b''
+        if self.silence_trimmer is not None and len(results) > 1:
+            with tracing.span("trim_silence"):
+                results = await self._run_blocking(self.silence_trimmer.trim_segments, results)
+        if len(results) == 1:
+            merged = results[0]
+        else:
+            with tracing.span("merge", segments=len(results)):
+                merged = await self._join_frames(results)
+        if checkpoint is not None and merged:
+            await self._run_blocking(checkpoint.discard)
+        return merged
+    
+    def _split_text(self, text: str, chunk_size: int) -> List[str]:
+        """按标点符号将长文本切分为若干段"""
+        chunks = []
+        current_chunk = ""
         
-        # 使用pydub正确合并音频片段
-        if len(results) > 1:
-            # 发出合并开始信号
-            events.emit("merge_start", len(results))
-            merge_start_time = time.time()
-            
-            # 检查是否有任何空结果
-            if any(not result for result in results):
-                logger.warning(f"警告：检测到{sum(1 for r in results if not r)}个空音频段")
-            
-            valid_results = [r for r in results if r and len(r) > 0]
-            if not valid_results:
-                logger.error("错误：所有音频段都为空，无法处理")
-                events.emit("merge_end", 0, False)  # 发出合并结束信号（失败）
-                return b''
-                
-            logger.info(f"有效音频段数量: {len(valid_results)}/{len(results)}")
-            
-            # 如果pydub和ffmpeg都可用，使用专业的音频处理
-            if PYDUB_AVAILABLE and FFMPEG_AVAILABLE:
-                try:
-                    # 为调试添加一些输出
-                    logger.info("使用pydub+ffmpeg合并音频片段...")
-                    
-                    segments = []
-                    # 处理每个非空音频数据
-                    for i, audio_data in enumerate(valid_results):
-                        try:
-                            segment = AudioSegment.from_file(io.BytesIO(audio_data), format="mp3")
-                            segments.append(segment)
-                            logger.info(f"成功加载音频段 {i+1}/{len(valid_results)}: 长度={len(segment)}ms")
-                        except Exception as e:
-                            logger.error(f"加载音频段 {i+1} 失败: {str(e)}")
-                    
-                    if segments:
-                        # 合并所有音频段
-                        logger.info(f"开始合并 {len(segments)} 个音频段...")
-                        combined = segments[0]
-                        
-                        for i, segment in enumerate(segments[1:], 1):
-                            try:
-                                combined = combined + segment
-                                logger.info(f"成功合并音频段 {i+1}/{len(segments)}")
-                            except Exception as e:
-                                logger.error(f"合并音频段 {i+1} 失败: {str(e)}")
-                        
-                        # 导出为MP3
-                        buffer = io.BytesIO()
-                        logger.info("导出合并后的MP3...")
-                        combined.export(buffer, format="mp3", bitrate="128k")
-                        all_audio_data = buffer.getvalue()
-                        
-                        # 计算合并耗时并发出合并结束信号
-                        merge_time = time.time() - merge_start_time
-                        events.emit("merge_end", merge_time, True, len(all_audio_data))
-                        
-                        logger.info(f"音频合并成功: 总大小={len(all_audio_data)}字节, 估计时长={len(combined)/1000:.2f}秒, 合并耗时={merge_time:.2f}秒")
-                        return all_audio_data
-                    else:
-                        logger.error("没有有效的音频段可以合并")
-                        events.emit("merge_end", time.time() - merge_start_time, False)
-                except Exception as e:
-                    logger.error(f"音频合并过程中发生错误: {str(e)}", exc_info=True)
-                    events.emit("merge_end", time.time() - merge_start_time, False)
-            
-            # 如果无法使用pydub+ffmpeg，使用直接字节拼接
-            logger.info("使用MP3直接字节拼接...")
+        # 常见中文和英文标点符号
+        sentence_end_marks = ["。", "！", "？", "；", ".", "!", "?", ";"]
+        
+        # 确保chunk_size不为0
+        chunk_size = max(chunk_size, 500)
+        
+        # 如果文本长度小于chunk_size的1.5倍，则不分段
+        if len(text) < chunk_size * 1.5:
+            return [text]
+        
+        for char in text:
+            current_chunk += char
             
-            # 专业合并不可用时的直接字节拼接方法
-            # 注意：MP3是基于帧的格式，可以直接拼接但可能在拼接处有轻微爆音
-            try:
-                # 为了提高字节拼接的可靠性，我们尝试处理MP3帧
-                # 一个基本的MP3文件包含文件头和帧，我们保留第一个文件的头
-                # 后续文件只使用其帧部分（跳过前几百个字节的文件头信息）
-                all_audio_data = valid_results[0]  # 完整使用第一个文件（包含文件头）
-                
-                # 对后续文件跳过大约200字节的文件头（简化处理，可能不总是准确）
-                for i, audio_data in enumerate(valid_results[1:], 1):
-                    # 我们跳过250字节以避开大多数MP3文件头信息
-                    # 这是一个简单但不完美的解决方案
-                    if len(audio_data) > 250:
-                        all_audio_data += audio_data[250:]
-                        logger.info(f"拼接音频段 {i+1}/{len(valid_results)}")
-                    else:
-                        logger.warning(f"音频段 {i+1} 太小，无法安全拼接")
-                
-                # 计算合并耗时并发出合并结束信号
-                merge_time = time.time() - merge_start_time
-                events.emit("merge_end", merge_time, True, len(all_audio_data))
-                
-                logger.info(f"字节拼接完成: 总大小={len(all_audio_data)}字节, 合并耗时={merge_time:.2f}秒")
-                return all_audio_data
-            except Exception as e:
-                logger.error(f"拼接过程中出错: {str(e)}")
-                events.emit("merge_end", time.time() - merge_start_time, False)
-                # 如果连基本拼接都失败，至少返回第一个有效结果
-                return valid_results[0]
-        
-        elif results and results[0]:
-            # 只有一个有效结果
-            logger.info(f"只有一个音频段，不需要合并: 大小={len(results[0])}字节")
-            return results[0]
+            # 如果遇到句末标点并且当前段长度超过最小段落大小，则考虑是否分段
+            if char in sentence_end_marks and len(current_chunk) >= min(200, chunk_size//5):
+                # 如果当前段落长度超过了chunk_size或接近chunk_size的80%，则分段
+                if len(current_chunk) >= chunk_size * 0.8:
+                    chunks.append(current_chunk)
+                    current_chunk = ""
+        
+        # 添加最后一段
+        if current_chunk:
+            chunks.append(current_chunk)
+        return chunks
+    
+    async def _join_frames(self, results: List[bytes]) -> bytes:
+        """
+        按帧直接拼接各段音频，不重新编码
+
+        每段去掉ID3标签和Xing/Info帧、只保留MP3帧，各段码率和采样率相同，拼接结果可以直接播放。
+        """
+        self._emit("merge_start", len(results))
+        merge_start_time = time.time()
+        empty = sum(1 for result in results if not result)
+        if empty:
+            logger.warning("检测到 %d 个空音频段", empty)
+        frames = await self._run_blocking(lambda: [audio_frames(result)[0] for result in results if result])
+        merged = b"".join(frames)
+        merge_time = time.time() - merge_start_time
+        self._emit("merge_end", merge_time, bool(merged), len(merged))
+        logger.info("按帧拼接完成: %d 段, 总大小=%d字节, 合并耗时=%.2f秒", len(frames), len(merged), merge_time)
+        return merged
+    
+    def _resolve_chunking(
+        self,
+        text: str,
+        enable_chunking: bool,
+        chunk_size: Union[int, str],
+        concurrency: Union[int, str],
+        objective: str = OBJECTIVE_WALL
+    ) -> Tuple[bool, int, int]:
+        """
+        把"auto"参数换成调优器选择的分段方案，返回 (enable_chunking, chunk_size, concurrency)
+
+        objective 为 wall 时最小化总耗时，流式输出传入 ttfb 以最小化首字节时间。
+        """
+        if chunk_size != AUTO and concurrency != AUTO:
+            return enable_chunking, chunk_size, concurrency
+        plan = self.autotuner.plan(
+            len(text),
+            chunk_size=None if chunk_size == AUTO else chunk_size,
+            concurrency=None if concurrency == AUTO else concurrency,
+            objective=objective
+        )
+        logger.info(
+            "自动分段(%s): %d 段, chunk_size=%d, concurrency=%d, 预计耗时 %.2f秒, 首字节 %.2f秒",
+            objective, plan.segments, plan.chunk_size, plan.concurrency, plan.predicted_seconds, plan.predicted_ttfb
+        )
+        return plan.enable_chunking, plan.chunk_size, plan.concurrency
+    
+    @contextmanager
+    def _trace_request(self, **attributes: Any):
+        """为一次请求打开span；调用方已开启追踪时挂在其下，否则按需生成独立的追踪"""
+        if tracing.current_span() is not None:
+            with tracing.span("tts.request", **attributes) as request_span:
+                yield request_span
+        elif self.span_exporter is not None:
+            with tracing.start_trace("tts.request", self.span_exporter, **attributes) as trace:
+                yield trace.root
         else:
-            # 没有有效结果
-            logger.error("没有生成任何有效的音频数据")
-            return b''
+            yield None
     
     async def text_to_speech(
         self, 
@@ -300,8 +489,9 @@ class TTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        timeout: Optional[float] = None
     ) -> bytes:
         """
         将文本转换为语音
@@ -313,45 +503,178 @@ class TTSClient:
             volume: 音量，范围 -50% 到 +50%
             pitch: 音调，范围 -50% 到 +50%
             enable_chunking: 是否启用分段处理
-            chunk_size: 每段文本字符数
-            concurrency: 并发处理段数
+            chunk_size: 每段文本字符数，"auto"表示由调优器根据延迟模型选择
+            concurrency: 并发处理段数，"auto"表示由调优器根据延迟模型选择
+            timeout: 请求的时间预算（秒），来不及完成时抛出DeadlineExceeded；
+                也可以用 deadline.deadline_context 为一组调用设置共同的截止时间
             
         Returns:
             bytes: 音频数据
         """
+        return await self._with_deadline(self._text_to_speech(
+            text, voice, rate, volume, pitch,
+            enable_chunking, chunk_size, concurrency,
+            as_path=False
+        ), timeout)
+    
+    async def text_to_speech_path(
+        self, 
+        text: str, 
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        enable_chunking: bool = False,
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        将文本转换为语音并返回缓存中的音频文件路径
+        
+        缓存命中时不会把音频读入内存，适合直接交给FileResponse发送。
+        需要在创建客户端时配置cache。参数同text_to_speech。
+        
+        Returns:
+            str: 缓存中的音频文件路径
+        """
+        if self.cache is None:
+            raise RuntimeError("text_to_speech_path需要在创建TTSClient时配置cache")
+        return await self._with_deadline(self._text_to_speech(
+            text, voice, rate, volume, pitch,
+            enable_chunking, chunk_size, concurrency,
+            as_path=True
+        ), timeout)
+    
+    async def _with_deadline(self, awaitable: Any, timeout: Optional[float]) -> Any:
+        """在截止时间内执行请求，到期时取消请求的所有文本段"""
+        with deadline_context(timeout):
+            try:
+                return await deadline.wait_for(awaitable, "request")
+            except DeadlineExceeded as e:
+                self.metrics.deadline_exceeded.inc(stage=e.stage)
+                logger.warning("TTS请求超出截止时间: %s", e)
+                raise
+    
+    def _observe_request(self, elapsed: float, mode: str) -> None:
+        """记录请求总耗时，同时按优先级记录，用于确认交互请求不受批量任务影响"""
+        self.metrics.request_latency.observe(elapsed, mode=mode)
+        self.metrics.priority_latency.observe(elapsed, priority=current_priority())
+    
+    async def _run_blocking(self, func: Callable, *args: Any) -> Any:
+        """在线程池中执行阻塞的文件或数据库操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+    
+    async def _cache_lookup(self, key: str) -> Optional[str]:
+        """查询磁盘缓存，出错时按未命中处理"""
         try:
-            selected_voice = voice or self.default_voice
-            logger.info(f"处理TTS请求: 文本长度 {len(text)} 字符, 语音 {selected_voice}")
-            
-            # 根据文本长度和用户选项决定是否使用分段处理
-            if enable_chunking:
-                # 文本较长或显式启用分段
-                logger.info(f"使用分段并行处理: chunk_size={chunk_size}, concurrency={concurrency}")
-                audio_data = await self._process_long_text(
-                    text=text,
-                    voice=selected_voice,
-                    rate=rate,
-                    volume=volume,
-                    pitch=pitch,
-                    chunk_size=chunk_size,
-                    concurrency=concurrency
-                )
-            else:
-                # 使用普通处理方式
-                logger.info("使用普通处理方式")
-                audio_data = await self._process_text_chunk(
-                    text=text,
-                    voice=selected_voice,
-                    rate=rate,
-                    volume=volume,
-                    pitch=pitch
-                )
-            
-            logger.info(f"TTS请求处理成功: 生成音频大小 {len(audio_data)} 字节")
-            return audio_data
+            path = await self._run_blocking(self.cache.lookup, key)
         except Exception as e:
-            logger.error(f"TTS请求处理失败: {str(e)}")
-            raise e
+            logger.warning("查询音频缓存失败: %s", e)
+            path = None
+        if path is None:
+            self.metrics.cache_misses.inc()
+        else:
+            self.metrics.cache_hits.inc()
+            self._emit("cache_hit", _request_id.get(), key)
+        return path
+    
+    async def _text_to_speech(
+        self,
+        text: str,
+        voice: Optional[str],
+        rate: str,
+        volume: str,
+        pitch: str,
+        enable_chunking: bool,
+        chunk_size: Union[int, str],
+        concurrency: Union[int, str],
+        as_path: bool
+    ) -> Union[bytes, str]:
+        """text_to_speech与text_to_speech_path的公共实现"""
+        enable_chunking, chunk_size, concurrency = self._resolve_chunking(
+            text, enable_chunking, chunk_size, concurrency
+        )
+        start_time = time.perf_counter()
+        mode = "chunked" if enable_chunking else "single"
+        request_id = uuid.uuid4().hex[:12]
+        token = _request_id.set(request_id)
+        with self._trace_request(chars=len(text), mode=mode, request_id=request_id):
+            try:
+                selected_voice = voice or self.default_voice
+                logger.info("处理TTS请求: 文本长度 %d 字符, 语音 %s", len(text), selected_voice)
+                
+                audio_data = None
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = DiskCache.make_key(text, selected_voice, rate, volume, pitch)
+                    with tracing.span("cache_lookup"):
+                        cached_path = await self._cache_lookup(cache_key)
+                    if cached_path is not None:
+                        if as_path:
+                            self._observe_request(time.perf_counter() - start_time, "cached")
+                            return cached_path
+                        try:
+                            audio_data = await self._run_blocking(DiskCache.read_path, cached_path)
+                            mode = "cached"
+                            # 读取成功后才记为缓存命中；条目在查找和读取之间被淘汰时按未命中重新合成
+                            self._observe_request(time.perf_counter() - start_time, "cached")
+                        except FileNotFoundError:
+                            audio_data = None
+                
+                if audio_data is None:
+                    # 根据文本长度和用户选项决定是否使用分段处理
+                    if enable_chunking:
+                        # 文本较长或显式启用分段
+                        logger.info("使用分段并行处理: chunk_size=%d, concurrency=%d", chunk_size, concurrency)
+                        audio_data = await self._process_long_text(
+                            text=text,
+                            voice=selected_voice,
+                            rate=rate,
+                            volume=volume,
+                            pitch=pitch,
+                            chunk_size=chunk_size,
+                            concurrency=concurrency
+                        )
+                    else:
+                        # 使用普通处理方式
+                        logger.info("使用普通处理方式")
+                        audio_data = await self._process_text_chunk(
+                            text=text,
+                            voice=selected_voice,
+                            rate=rate,
+                            volume=volume,
+                            pitch=pitch
+                        )
+                    self.metrics.audio_bytes.inc(len(audio_data))
+                    self._observe_request(time.perf_counter() - start_time, mode)
+                
+                    if cache_key is not None and audio_data:
+                        try:
+                            with tracing.span("cache_store"):
+                                path = await self._run_blocking(self.cache.put, cache_key, audio_data)
+                            if as_path:
+                                return path
+                        except Exception as e:
+                            if as_path:
+                                raise
+                            logger.warning("写入音频缓存失败: %s", e)
+                
+                if as_path:
+                    raise RuntimeError("没有生成任何有效的音频数据")
+                logger.info("TTS请求处理成功: 生成音频大小 %d 字节", len(audio_data))
+                return audio_data
+            except asyncio.CancelledError:
+                self.metrics.cancelled_requests.inc(mode=mode)
+                logger.info("TTS请求已取消: 文本长度 %d 字符", len(text))
+                raise
+            except Exception as e:
+                self.metrics.errors.inc(type=type(e).__name__)
+                logger.error("TTS请求处理失败: %s", e)
+                raise e
+            finally:
+                _request_id.reset(token)
     
     async def text_to_speech_base64(
         self, 
@@ -361,8 +684,9 @@ class TTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        timeout: Optional[float] = None
     ) -> str:
         """
         将文本转换为base64编码的语音
@@ -374,17 +698,364 @@ class TTSClient:
             volume: 音量，范围 -50% 到 +50%
             pitch: 音调，范围 -50% 到 +50%
             enable_chunking: 是否启用分段处理
-            chunk_size: 每段文本字符数
-            concurrency: 并发处理段数
+            chunk_size: 每段文本字符数，"auto"表示由调优器根据延迟模型选择
+            concurrency: 并发处理段数，"auto"表示由调优器根据延迟模型选择
+            timeout: 请求的时间预算（秒）
             
         Returns:
             str: base64编码的音频数据
         """
         audio_data = await self.text_to_speech(
             text, voice, rate, volume, pitch,
-            enable_chunking, chunk_size, concurrency
+            enable_chunking, chunk_size, concurrency, timeout
+        )
+        with tracing.span("encode"):
+            return base64.b64encode(audio_data).decode()
+    
+    async def synthesize_script(
+        self,
+        script: Union[str, Iterable[Any]],
+        speakers: Optional[Dict[str, Any]] = None,
+        pause: float = 0.3,
+        concurrency: int = 3,
+        chunk_size: int = 500,
+        trim_silence: bool = True,
+        timeout: Optional[float] = None
+    ) -> bytes:
+        """
+        合成多角色脚本，返回一段完整的音频
+        
+        各条台词按自己的语音和韵律参数并行合成（总并发数为concurrency，每条台词单独使用缓存），
+        去掉台词首尾的静音后按帧拼接，台词之间插入pause秒的静音帧，不需要重新编码。
+        
+        Args:
+            script: 标记格式的脚本文本，或台词列表，格式见 tts_edge_sdk.script
+            speakers: 角色名到语音名称或语音参数字典（voice、rate、volume、pitch）的映射
+            pause: 台词之间默认的停顿秒数，台词自己的pause优先
+            concurrency: 同时合成的台词段数
+            chunk_size: 超过该长度的台词按句切分后并行合成
+            trim_silence: 是否去掉每条台词首尾的静音，使停顿时长准确
+            timeout: 请求的时间预算（秒），来不及完成时抛出DeadlineExceeded
+            
+        Returns:
+            bytes: 音频数据
+        """
+        lines = script_format.parse(script, speakers)
+        if not lines:
+            raise ValueError("脚本中没有可合成的台词")
+        return await self._with_deadline(self._synthesize_script(
+            lines, pause, concurrency, chunk_size, trim_silence
+        ), timeout)
+    
+    def playback_session(
+        self,
+        text: Union[str, Iterable[str]],
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        lookahead: int = 2
+    ) -> PlaybackSession:
+        """
+        创建顺序播放会话：按播放位置提前合成后面lookahead句，句与句之间不用等待上游
+        
+        需要在事件循环中调用；会话用完后调用close()（或使用 async with）取消还没完成的预取。
+        
+        Args:
+            text: 全文（按句末标点切分）或句子列表
+            voice: 语音名称，如不指定则使用默认语音
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            lookahead: 在当前句之后提前合成的句数
+            
+        Returns:
+            PlaybackSession: 用 get(index) 取各句音频，或 async for 按顺序遍历
+        """
+        sentences = split_sentences(text) if isinstance(text, str) else list(text)
+        session = PlaybackSession(
+            self, sentences, voice, rate, volume, pitch,
+            lookahead=lookahead, metrics_registry=self.metrics.registry
+        )
+        if not len(session):
+            raise ValueError("没有可合成的句子")
+        session.seek(0)
+        return session
+    
+    async def _synthesize_script(
+        self,
+        lines: List[script_format.ScriptLine],
+        pause: float,
+        concurrency: int,
+        chunk_size: int,
+        trim_silence: bool
+    ) -> bytes:
+        start_time = time.perf_counter()
+        self.metrics.script_lines.observe(len(lines))
+        # 长台词按句切分，所有台词的各段共用一个并发上限
+        pieces = [(index, piece) for index, line in enumerate(lines) for piece in self._split_text(line.text, chunk_size)]
+        logger.info("合成多角色脚本: %d 条台词, %d 段, 并发 %d", len(lines), len(pieces), concurrency)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def synthesize(index: int, text: str) -> bytes:
+            line = lines[index]
+            with tracing.span("line", index=index, chars=len(text)):
+                async with semaphore:
+                    return await self._text_to_speech(
+                        text, line.voice, line.rate, line.volume, line.pitch,
+                        False, chunk_size, 1, as_path=False
+                    )
+        
+        tasks = [asyncio.ensure_future(synthesize(index, text)) for index, text in pieces]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+        
+        with tracing.span("merge", segments=len(results)):
+            audio = await self._run_blocking(self._join_script, lines, pieces, results, pause, trim_silence)
+        self._observe_request(time.perf_counter() - start_time, "script")
+        return audio
+    
+    def _join_script(
+        self,
+        lines: List[script_format.ScriptLine],
+        pieces: List[Tuple[int, str]],
+        results: List[bytes],
+        pause: float,
+        trim_silence: bool
+    ) -> bytes:
+        """按帧拼接各条台词，台词之间插入静音帧"""
+        per_line: List[List[bytes]] = [[] for _ in lines]
+        header = None
+        for (index, _), audio in zip(pieces, results):
+            frames, first, _ = audio_frames(audio)
+            per_line[index].append(frames)
+            header = header or first
+        trimmer = None
+        if trim_silence:
+            # 只去掉台词首尾的静音，停顿全部由pause决定
+            trimmer = SilenceTrimmer(
+                gap=0.0,
+                max_bits=self.silence_trimmer.max_bits if self.silence_trimmer is not None else 8,
+                metrics_registry=self.metrics.registry
+            )
+        output = []
+        previous_pause = None
+        for index, (line, parts) in enumerate(zip(lines, per_line)):
+            if trimmer is not None and parts:
+                parts[0] = trimmer.trim(parts[0], leading=True, trailing=False)
+                parts[-1] = trimmer.trim(parts[-1], leading=False, trailing=True)
+            audio = b"".join(parts)
+            if not audio:
+                logger.warning("台词 %d 没有音频: %.20s", index + 1, line.text)
+                continue
+            if output:
+                output.append(silence_frames(header, pause if previous_pause is None else previous_pause))
+            output.append(audio)
+            previous_pause = line.pause
+        return b"".join(output)
+    
+    async def stream(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        ramp: Optional[SegmentRamp] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        流式合成文本，按顺序逐段产出音频
+        
+        第一段只取一个短句或分句，后续段按ramp逐段增长到chunk_size，
+        第一段音频可以很快输出，后面的段在前面的音频播放期间合成。
+        
+        Args:
+            text: 要转换的文本
+            voice: 语音名称，如不指定则使用默认语音
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            chunk_size: 段长上限，"auto"表示由调优器根据延迟模型选择
+            concurrency: 并发合成段数，"auto"表示由调优器根据延迟模型选择
+            ramp: 分段参数，不指定则使用客户端的segment_ramp
+            
+        Yields:
+            bytes: 各段的MP3音频数据，直接拼接即为完整音频
+        """
+        start_time = time.perf_counter()
+        _, chunk_size, concurrency = self._resolve_chunking(text, True, chunk_size, concurrency, OBJECTIVE_TTFB)
+        chunks = (ramp or self.segment_ramp).split(text, chunk_size)
+        self.metrics.stream_segments.observe(len(chunks))
+        logger.info(
+            "流式合成: %d 段, 首段 %d 字符, 并发 %d",
+            len(chunks), len(chunks[0]) if chunks else 0, concurrency
         )
-        return base64.b64encode(audio_data).decode()
+        first = True
+        audio_stream = self.stream_segments(chunks, voice, rate, volume, pitch, concurrency)
+        try:
+            async for audio in audio_stream:
+                if first:
+                    first = False
+                    self.metrics.first_audio.observe(time.perf_counter() - start_time)
+                self.metrics.audio_bytes.inc(len(audio))
+                yield audio
+        except (asyncio.CancelledError, GeneratorExit):
+            self.metrics.cancelled_requests.inc(mode="stream")
+            raise
+        except Exception as e:
+            self.metrics.errors.inc(type=type(e).__name__)
+            raise
+        finally:
+            # 消费方取消或提前关闭生成器时立即关闭stream_segments，取消还未完成的段；
+            # 不能等垃圾回收时的异步生成器终结器
+            await audio_stream.aclose()
+        self._observe_request(time.perf_counter() - start_time, "stream")
+    
+    async def stream_text(
+        self,
+        text_stream: Union[Iterable[Union[str, bytes]], AsyncIterable[Union[str, bytes]]],
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        chunk_size: int = 500,
+        concurrency: int = 3,
+        ramp: Optional[SegmentRamp] = None,
+        encoding: str = "utf-8"
+    ) -> AsyncIterator[bytes]:
+        """
+        流式合成分块到达的文本，输入还没结束就开始合成前面的段
+        
+        文本边到达边增量分段（分段规则同stream），凑够一段立即提交合成。只有在并发合成的段
+        没有全部完成时才继续读取输入，内存占用取决于并发段数和段长，与文本总长度无关。
+        
+        Args:
+            text_stream: 文本块或字节块，可以是异步可迭代对象（例如上传的请求体或按块读取的文件）
+            voice: 语音名称，如不指定则使用默认语音
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            chunk_size: 段长上限
+            concurrency: 并发合成段数
+            ramp: 分段参数，不指定则使用客户端的segment_ramp
+            encoding: 字节块的编码，多字节字符可以跨块
+            
+        Yields:
+            bytes: 各段的MP3音频数据，直接拼接即为完整音频
+        """
+        start_time = time.perf_counter()
+        segments = segment_stream(text_stream, ramp or self.segment_ramp, chunk_size, encoding)
+        count = 0
+        
+        async def counted() -> AsyncIterator[str]:
+            nonlocal count
+            async for segment in segments:
+                count += 1
+                yield segment
+        
+        first = True
+        audio_stream = self.stream_segments(counted(), voice, rate, volume, pitch, concurrency)
+        try:
+            async for audio in audio_stream:
+                if first:
+                    first = False
+                    self.metrics.first_audio.observe(time.perf_counter() - start_time)
+                self.metrics.audio_bytes.inc(len(audio))
+                yield audio
+        except (asyncio.CancelledError, GeneratorExit):
+            self.metrics.cancelled_requests.inc(mode="stream")
+            raise
+        except Exception as e:
+            self.metrics.errors.inc(type=type(e).__name__)
+            raise
+        finally:
+            await audio_stream.aclose()
+            await segments.aclose()
+        self.metrics.stream_segments.observe(count)
+        logger.info("流式文本合成完成: %d 段", count)
+        self._observe_request(time.perf_counter() - start_time, "stream")
+    
+    async def stream_segments(
+        self,
+        segments: Union[Iterable[str], AsyncIterable[str]],
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        concurrency: int = 3
+    ) -> AsyncIterator[bytes]:
+        """
+        并行合成一系列文本段，按输入顺序逐段产出音频
+        
+        同一时间最多有 concurrency 段在合成，最前面的一段完成后立即产出，
+        适合边读边合成、边合成边输出的管道场景。segments可以是异步可迭代对象。
+        
+        Args:
+            segments: 文本段序列，空白段会被跳过
+            voice: 语音名称，如不指定则使用默认语音
+            rate: 语速
+            volume: 音量
+            pitch: 音调
+            concurrency: 并发合成段数
+            
+        Yields:
+            bytes: 各段的MP3音频数据，直接拼接即为完整音频；客户端配置了silence_trimmer时
+                已去掉段与段之间多余的静音
+        """
+        selected_voice = voice or self.default_voice
+        is_async = hasattr(segments, "__aiter__")
+        source = segments.__aiter__() if is_async else iter(segments)
+        pending: deque = deque()
+        exhausted = False
+        index = 0
+        yielded = 0
+        
+        async def pull() -> None:
+            """从输入中取出下一个非空段开始合成，输入读完时设置exhausted"""
+            nonlocal exhausted, index
+            while True:
+                try:
+                    segment = await source.__anext__() if is_async else next(source)
+                except (StopIteration, StopAsyncIteration):
+                    exhausted = True
+                    return
+                if segment and segment.strip():
+                    break
+            pending.append(asyncio.ensure_future(self._process_text_chunk(
+                segment, selected_voice, rate, volume, pitch, index
+            )))
+            index += 1
+        
+        try:
+            while True:
+                # 最前面一段已完成时先产出，否则在并发上限内继续拉取新段
+                while not exhausted and len(pending) < max(1, concurrency) and not (pending and pending[0].done()):
+                    await pull()
+                if not pending:
+                    break
+                audio = await pending.popleft()
+                if self.silence_trimmer is not None and audio:
+                    if not pending and not exhausted:
+                        # 先取出下一段，确定这一段是不是最后一段
+                        await pull()
+                    audio = self.silence_trimmer.trim(
+                        audio, leading=yielded > 0, trailing=not (exhausted and not pending)
+                    )
+                yielded += 1
+                yield audio
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
     
     async def save_to_file(
         self, 
@@ -395,8 +1066,8 @@ class TTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3
     ) -> None:
         """
         将文本转换为语音并保存到文件
@@ -409,37 +1080,335 @@ class TTSClient:
             volume: 音量，范围 -50% 到 +50%
             pitch: 音调，范围 -50% 到 +50%
             enable_chunking: 是否启用分段处理
-            chunk_size: 每段文本字符数
-            concurrency: 并发处理段数
+            chunk_size: 每段文本字符数，"auto"表示由调优器根据延迟模型选择
+            concurrency: 并发处理段数，"auto"表示由调优器根据延迟模型选择
+            
+        各段音频按顺序边合成边写入磁盘（先写临时文件，完成后原子替换），内存中
+        最多只保留 concurrency 段，峰值内存与输出文件长度无关。启用检查点时
+        沿用先合并再写入的方式。
         """
         try:
-            audio_data = await self.text_to_speech(
-                text, voice, rate, volume, pitch,
-                enable_chunking, chunk_size, concurrency
-            )
-            with open(output_file, "wb") as f:
-                f.write(audio_data)
-            logger.info(f"音频已保存到文件: {output_file}")
+            if self.checkpoint_dir and enable_chunking:
+                audio_data = await self.text_to_speech(
+                    text, voice, rate, volume, pitch,
+                    enable_chunking, chunk_size, concurrency
+                )
+                await self._run_blocking(atomic_write, output_file, audio_data)
+            else:
+                await self._save_streaming(
+                    text, output_file, voice, rate, volume, pitch,
+                    enable_chunking, chunk_size, concurrency
+                )
+            logger.info("音频已保存到文件: %s", output_file)
         except Exception as e:
-            logger.error(f"保存音频到文件失败: {str(e)}")
+            logger.error("保存音频到文件失败: %s", e)
             raise e
+    
+    async def _save_streaming(
+        self,
+        text: str,
+        output_file: str,
+        voice: Optional[str],
+        rate: str,
+        volume: str,
+        pitch: str,
+        enable_chunking: bool,
+        chunk_size: Union[int, str],
+        concurrency: Union[int, str]
+    ) -> None:
+        """按顺序把各段音频流式写入文件，结束时回填MP3头部"""
+        enable_chunking, chunk_size, concurrency = self._resolve_chunking(
+            text, enable_chunking, chunk_size, concurrency
+        )
+        start_time = time.perf_counter()
+        mode = "chunked" if enable_chunking else "single"
+        request_id = uuid.uuid4().hex[:12]
+        token = _request_id.set(request_id)
+        with self._trace_request(chars=len(text), mode=mode, request_id=request_id):
+            try:
+                selected_voice = voice or self.default_voice
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = DiskCache.make_key(text, selected_voice, rate, volume, pitch)
+                    with tracing.span("cache_lookup"):
+                        cached_path = await self._cache_lookup(cache_key)
+                    if cached_path is not None:
+                        await self._run_blocking(atomic_copy, cached_path, output_file)
+                        self._observe_request(time.perf_counter() - start_time, "cached")
+                        return
+                
+                with tracing.span("segment"):
+                    chunks = self._split_text(text, chunk_size) if enable_chunking else [text]
+                logger.info("流式写入文件: %d 段, 并发 %d", len(chunks), concurrency)
+                
+                writer = Mp3StreamWriter(output_file)
+                merge_start_time = time.time()
+                if len(chunks) > 1:
+                    self._emit("merge_start", len(chunks))
+                try:
+                    async for audio in self.stream_segments(
+                        chunks, selected_voice, rate, volume, pitch, concurrency
+                    ):
+                        await writer.write(audio)
+                    with tracing.span("merge", segments=len(chunks)):
+                        size = await writer.close()
+                except BaseException:
+                    await writer.abort()
+                    if len(chunks) > 1:
+                        self._emit("merge_end", time.time() - merge_start_time, False)
+                    raise
+                if len(chunks) > 1:
+                    self._emit("merge_end", time.time() - merge_start_time, True, size)
+                
+                self.metrics.audio_bytes.inc(size)
+                self._observe_request(time.perf_counter() - start_time, mode)
+                logger.info("流式写入完成: %d 帧, %.2f秒, %d 字节", writer.frames, writer.duration, size)
+                
+                if cache_key is not None:
+                    try:
+                        with tracing.span("cache_store"):
+                            await self._run_blocking(self.cache.put_file, cache_key, output_file)
+                    except Exception as e:
+                        logger.warning("写入音频缓存失败: %s", e)
+            except asyncio.CancelledError:
+                self.metrics.cancelled_requests.inc(mode=mode)
+                logger.info("流式写入已取消，临时文件已删除: %s", output_file)
+                raise
+            except Exception as e:
+                self.metrics.errors.inc(type=type(e).__name__)
+                raise
+            finally:
+                _request_id.reset(token)
+    
+    async def _save_item(self, index: int, item: Any, skip_existing: bool, defaults: Dict[str, Any]) -> BulkItemResult:
+        """处理批量任务中的一项，错误记录在结果中而不抛出"""
+        start_time = time.perf_counter()
+        output_path = None
+        try:
+            text, output_path, params = parse_item(item)
+            if skip_existing and await self._run_blocking(is_valid_audio_file, output_path):
+                return BulkItemResult(index, output_path, STATUS_SKIPPED, chars=len(text))
+            options = dict(defaults)
+            options.update(params)
+            await self.save_to_file(text, output_path, **options)
+            audio_bytes = await self._run_blocking(os.path.getsize, output_path)
+            return BulkItemResult(
+                index, output_path, STATUS_OK, len(text), audio_bytes,
+                time.perf_counter() - start_time
+            )
+        except Exception as e:
+            logger.error("批量任务第 %d 项处理失败: %s", index, e)
+            return BulkItemResult(index, output_path, STATUS_FAILED, elapsed=time.perf_counter() - start_time, error=e)
+    
+    async def map(
+        self,
+        items: Union[Iterable[Any], AsyncIterable[Any]],
+        workers: int = 4,
+        skip_existing: bool = True,
+        **defaults: Any
+    ) -> AsyncIterator[BulkItemResult]:
+        """
+        批量生成音频文件，按完成顺序逐项产出结果
+        
+        任务项按需从items中拉取，同一时间最多只有 workers 项在处理或等待调用方取走结果，
+        因此items可以是读取大型清单文件的生成器，内存占用不随任务总数增长。
+        
+        Args:
+            items: (text, output_path[, params]) 元组或字典组成的可迭代对象，也可以是异步可迭代对象
+            workers: 同时处理的任务项数
+            skip_existing: 输出文件已存在且是有效MP3时跳过
+            **defaults: 所有任务项共用的text_to_speech参数，会被任务项自己的params覆盖
+            
+        使用调度器时，各项默认按bulk优先级排队；调用方已通过priority_context设置了
+        其他优先级时沿用调用方的设置。
+            
+        Yields:
+            BulkItemResult: 单项结果，失败的项也会产出，error字段记录异常
+        """
+        is_async = hasattr(items, "__aiter__")
+        iterator = items.__aiter__() if is_async else iter(items)
+        pull_lock = asyncio.Lock()
+        # 正在处理或等待调用方取走结果的项数上限，调用方消费慢时暂停拉取新任务
+        slots = asyncio.Semaphore(max(1, workers))
+        results: asyncio.Queue = asyncio.Queue()
+        counter = [0]
+        done = object()
+        
+        async def pull():
+            async with pull_lock:
+                try:
+                    item = await iterator.__anext__() if is_async else next(iterator)
+                except (StopIteration, StopAsyncIteration):
+                    return None
+                index = counter[0]
+                counter[0] += 1
+                return index, item
+        
+        async def worker():
+            while True:
+                await slots.acquire()
+                pulled = await pull()
+                if pulled is None:
+                    slots.release()
+                    return
+                results.put_nowait(await self._save_item(pulled[0], pulled[1], skip_existing, defaults))
+        
+        async def run_workers():
+            tasks = [asyncio.ensure_future(worker()) for _ in range(max(1, workers))]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                results.put_nowait(done)
+        
+        if current_priority() == PRIORITY_DEFAULT:
+            # 批量任务默认按bulk优先级排队，不影响同一进程中的交互请求
+            with priority_context(PRIORITY_BULK):
+                runner = asyncio.ensure_future(run_workers())
+        else:
+            runner = asyncio.ensure_future(run_workers())
+        try:
+            while True:
+                result = await results.get()
+                if result is done:
+                    break
+                yield result
+                slots.release()
+            # 迭代源抛出的异常在这里向上传递
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+    
+    async def save_many(
+        self,
+        items: Union[Iterable[Any], AsyncIterable[Any]],
+        workers: int = 4,
+        skip_existing: bool = True,
+        **defaults: Any
+    ) -> BulkResult:
+        """
+        批量生成音频文件并返回汇总结果
+        
+        参数与map相同；返回的BulkResult包含按输入顺序排列的单项结果，
+        以及成功/跳过/失败数量和每秒处理项数、字符数。
+        """
+        summary = BulkResult()
+        async for result in self.map(items, workers, skip_existing, **defaults):
+            summary.add(result)
+        summary.finish()
+        logger.info(
+            "批量生成完成: 成功 %d, 跳过 %d, 失败 %d, 耗时 %.2f秒, %.1f 字符/秒",
+            summary.succeeded, summary.skipped, summary.failed, summary.elapsed, summary.chars_per_second
+        )
+        return summary
+
+class _LoopThread:
+    """
+    在后台线程中长期运行的事件循环
+
+    同步接口把协程提交到这个循环执行，而不是每次调用都asyncio.run新建循环，
+    因此连接池等绑定在循环上的资源可以跨调用复用，调用方所在线程是否已有
+    运行中的事件循环（如Jupyter）也不受影响。
+    """
+
+    def __init__(self, name: str = "tts-sdk-loop"):
+        self._loop = asyncio.new_event_loop()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台循环中执行协程并阻塞等待结果，可从任意线程调用"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在SDK后台事件循环线程内调用同步接口，请改用TTSClient")
+        with self._lock:
+            if self._closed:
+                coro.close()
+                raise RuntimeError("SyncTTSClient已关闭")
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """停止事件循环并等待后台线程退出，可重复调用"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
 
 # 同步接口封装
 class SyncTTSClient:
-    """同步的文字转语音SDK客户端"""
+    """
+    同步的文字转语音SDK客户端
+
+    所有调用都提交到客户端自己的后台事件循环线程执行，可以被多个线程同时使用。
+    用完后调用close()或使用with语句释放后台线程。
+    """
     
-    def __init__(self, default_voice: str = "zh-CN-XiaoxiaoNeural"):
+    def __init__(self, default_voice: str = "zh-CN-XiaoxiaoNeural", **client_options):
         """
         初始化同步TTS客户端
         
         Args:
             default_voice: 默认语音，如不指定则使用中文女声
+            **client_options: 传给TTSClient的其他参数，如max_retries、cache、connection_pool
         """
-        self._async_client = TTSClient(default_voice)
+        self._async_client = TTSClient(default_voice, **client_options)
+        self._loop_thread = _LoopThread()
+    
+    def __enter__(self) -> "SyncTTSClient":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """关闭连接池（如有）并停止后台事件循环，可重复调用"""
+        if self._loop_thread.closed:
+            return
+        pool = self._async_client.connection_pool
+        if pool is not None:
+            try:
+                self._loop_thread.run(pool.close())
+            except Exception as e:
+                logger.warning("关闭连接池失败: %s", e)
+        self._loop_thread.close()
+    
+    def _run(self, coro):
+        return self._loop_thread.run(coro)
     
     def get_voices(self) -> List[Dict[str, Any]]:
         """获取所有可用的语音列表"""
-        return asyncio.run(self._async_client.get_voices())
+        return self._run(self._async_client.get_voices())
     
     def text_to_speech(
         self, 
@@ -449,13 +1418,14 @@ class SyncTTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        timeout: Optional[float] = None
     ) -> bytes:
-        """将文本转换为语音"""
-        return asyncio.run(self._async_client.text_to_speech(
+        """将文本转换为语音，timeout为请求的时间预算（秒）"""
+        return self._run(self._async_client.text_to_speech(
             text, voice, rate, volume, pitch,
-            enable_chunking, chunk_size, concurrency
+            enable_chunking, chunk_size, concurrency, timeout
         ))
     
     def text_to_speech_base64(
@@ -466,13 +1436,14 @@ class SyncTTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        timeout: Optional[float] = None
     ) -> str:
-        """将文本转换为base64编码的语音"""
-        return asyncio.run(self._async_client.text_to_speech_base64(
+        """将文本转换为base64编码的语音，timeout为请求的时间预算（秒）"""
+        return self._run(self._async_client.text_to_speech_base64(
             text, voice, rate, volume, pitch,
-            enable_chunking, chunk_size, concurrency
+            enable_chunking, chunk_size, concurrency, timeout
         ))
     
     def save_to_file(
@@ -484,14 +1455,94 @@ class SyncTTSClient:
         volume: str = "+0%",
         pitch: str = "+0Hz",
         enable_chunking: bool = False,
-        chunk_size: int = 500,
-        concurrency: int = 3
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3
     ) -> None:
         """将文本转换为语音并保存到文件"""
-        asyncio.run(self._async_client.save_to_file(
+        self._run(self._async_client.save_to_file(
             text, output_file, voice, rate, volume, pitch,
             enable_chunking, chunk_size, concurrency
         ))
+    
+    def stream(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        rate: str = "+0%",
+        volume: str = "+0%",
+        pitch: str = "+0Hz",
+        chunk_size: Union[int, str] = 500,
+        concurrency: Union[int, str] = 3,
+        ramp: Optional[SegmentRamp] = None
+    ) -> Iterator[bytes]:
+        """流式合成文本，按顺序逐段返回音频，参数见TTSClient.stream"""
+        segments = self._async_client.stream(text, voice, rate, volume, pitch, chunk_size, concurrency, ramp)
+        try:
+            while True:
+                try:
+                    yield self._run(segments.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self._loop_thread.closed:
+                self._run(segments.aclose())
+    
+    def synthesize_script(
+        self,
+        script: Union[str, Iterable[Any]],
+        speakers: Optional[Dict[str, Any]] = None,
+        pause: float = 0.3,
+        concurrency: int = 3,
+        chunk_size: int = 500,
+        trim_silence: bool = True,
+        timeout: Optional[float] = None
+    ) -> bytes:
+        """合成多角色脚本，参数见TTSClient.synthesize_script"""
+        return self._run(self._async_client.synthesize_script(
+            script, speakers, pause, concurrency, chunk_size, trim_silence, timeout
+        ))
+    
+    def save_many(
+        self,
+        items: Iterable[Any],
+        workers: int = 4,
+        skip_existing: bool = True,
+        **defaults: Any
+    ) -> BulkResult:
+        """批量生成音频文件并返回汇总结果，参数见TTSClient.save_many"""
+        return self._run(self._async_client.save_many(items, workers, skip_existing, **defaults))
+    
+    def map(
+        self,
+        items: Iterable[Any],
+        workers: int = 4,
+        skip_existing: bool = True,
+        **defaults: Any
+    ) -> Iterator[BulkItemResult]:
+        """批量生成音频文件，按完成顺序逐项返回结果，参数见TTSClient.map"""
+        results = self._async_client.map(items, workers, skip_existing, **defaults)
+        try:
+            while True:
+                try:
+                    yield self._run(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self._loop_thread.closed:
+                self._run(results.aclose())
+
+# 模块级text_to_speech共用的同步客户端，首次调用时创建
+_shared_client: Optional[SyncTTSClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def _get_shared_client() -> SyncTTSClient:
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = SyncTTSClient()
+            atexit.register(_shared_client.close)
+        return _shared_client
 
 # 快速使用的函数
 async def async_text_to_speech(
@@ -521,17 +1572,19 @@ def text_to_speech(
     chunk_size: int = 500,
     concurrency: int = 3
 ) -> bytes:
-    """同步快速将文本转换为语音"""
-    return asyncio.run(async_text_to_speech(
+    """同步快速将文本转换为语音，多次调用共用同一个后台事件循环"""
+    return _get_shared_client().text_to_speech(
         text, voice, rate, volume, pitch,
         enable_chunking, chunk_size, concurrency
-    ))
+    )
 
 # 添加一些辅助函数，允许外部代码监听事件
-def on_merge_start(callback: Callable) -> None:
+# 注意：这里注册的是全局监听器，会收到所有客户端的事件；
+# 用完后请调用返回句柄的unsubscribe()，或改用 TTSClient.on 订阅单个客户端
+def on_merge_start(callback: Callable) -> Subscription:
     """注册音频合并开始事件监听器"""
-    events.on("merge_start", callback)
+    return events.on("merge_start", callback)
 
-def on_merge_end(callback: Callable) -> None:
+def on_merge_end(callback: Callable) -> Subscription:
     """注册音频合并结束事件监听器"""
-    events.on("merge_end", callback) 
\ No newline at end of file
+    return events.on("merge_end", callback) 
\ No newline at end of file